@@ -0,0 +1,126 @@
+"""A stand in for the sensor character device which emits synthetic 16 byte records.
+
+Run with ``python -m benchmarks.fake_device /tmp/rdp_fifo --rate 10000 --types 8`` and point
+RDP_DEVICES at the FIFO to feed a running api. The records have the device layout, see
+rdp.sensor.record: one record per value type and second, the time counting up from --start.
+"""
+import argparse
+import os
+import stat
+import threading
+import time
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from rdp.sensor import RECORD_DTYPE
+
+
+def synthetic_records(first: int, count: int, types: int = 4, start: int = 1700000000) -> np.ndarray:
+    """Records number first to first + count of the synthetic series as a RECORD_DTYPE array
+
+    Record i holds value type i % types at time start + i // types, its value is a sine of
+    the time shifted by the type, so every type is a series of its own.
+    """
+    index = np.arange(first, first + count, dtype=np.uint64)
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    records["time"] = start + index // types
+    records["type"] = index % types
+    records["value"] = np.sin((index // types).astype(np.float64) / 60.0 + index % types)
+    return records
+
+
+def synthetic_chunks(
+    count: int, types: int = 4, start: int = 1700000000, chunk_size: int = 100000
+) -> Iterator[List[Tuple[int, int, float]]]:
+    """The first count synthetic records as (time, type, value) chunks, e.g. for Crud.bulk_load"""
+    for first in range(0, count, chunk_size):
+        yield synthetic_records(first, min(chunk_size, count - first), types, start).tolist()
+
+
+class FakeDevice:
+    """Write synthetic records to a FIFO or a file on a thread of its own
+
+    A missing path is created as a FIFO. Opening a FIFO for writing blocks until a reader
+    opens it, so the device can be started before the Reader.
+
+    Args:
+        path (str): the FIFO or file.
+        count (int): number of records to write.
+        rate (float, optional): records per second, 0 writes as fast as the reader drains. Defaults to 0.
+        types (int, optional): number of value types. Defaults to 4.
+        start (int, optional): time stamp of the first record. Defaults to 1700000000.
+        block (int, optional): records per write. Defaults to 1024.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        count: int,
+        rate: float = 0,
+        types: int = 4,
+        start: int = 1700000000,
+        block: int = 1024,
+    ):
+        self.path = path
+        self.count = count
+        self.rate = rate
+        self.types = types
+        self.start_time = start
+        self.block = block
+        self.written = 0
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+        if not os.path.exists(path):
+            os.mkfifo(path)
+
+    @property
+    def is_fifo(self) -> bool:
+        return stat.S_ISFIFO(os.stat(self.path).st_mode)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="fake-device %s" % self.path, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self.join()
+
+    def join(self, timeout: float = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        began = time.perf_counter()
+        with open(self.path, "wb" if self.is_fifo else "ab", buffering=0) as f:
+            while self.written < self.count and not self._stopping.is_set():
+                size = min(self.block, self.count - self.written)
+                f.write(synthetic_records(self.written, size, self.types, self.start_time).tobytes())
+                self.written += size
+                if self.rate:
+                    # sleep until the schedule of the rate catches up with the records written
+                    delay = began + self.written / self.rate - time.perf_counter()
+                    if delay > 0:
+                        self._stopping.wait(delay)
+
+
+def main_(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="FIFO or file to write, a missing path is created as FIFO")
+    parser.add_argument("--count", type=int, default=1000000, help="records to write")
+    parser.add_argument("--rate", type=float, default=1000, help="records per second, 0 for unthrottled")
+    parser.add_argument("--types", type=int, default=4, help="number of value types")
+    parser.add_argument("--start", type=int, default=int(time.time()), help="time stamp of the first record")
+    args = parser.parse_args(argv)
+
+    device = FakeDevice(args.path, args.count, args.rate, args.types, args.start)
+    device.start()
+    try:
+        device.join()
+    except KeyboardInterrupt:
+        device.stop()
+    print("wrote %d records" % device.written)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,88 @@
+"""Latency of GET /value/ under concurrent clients, sync Crud in the threadpool against AsyncCrud.
+
+Run with ``python -m benchmarks.load_api --clients 200``. The api is served in process through
+the ASGI transport of httpx, so the numbers contain no network overhead.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from rdp.api import main
+from rdp.crud import AsyncCrud, Crud, create_async_engine, create_engines
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "p50_ms": cuts[49] * 1000,
+        "p90_ms": cuts[89] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def sync_app(crud: Crud) -> FastAPI:
+    """the GET /value/ handler as it was before AsyncCrud: a def endpoint in the threadpool"""
+    app = FastAPI()
+
+    @app.get("/value/")
+    def get_values(type_id: int = None, start: int = None, end: int = None, limit: int = None):
+        return [main.value_to_dict(value) for value in crud.get_values(type_id, start, end, None, limit)]
+
+    return app
+
+
+async def run_clients(app: FastAPI, clients: int, requests: int, params: dict) -> List[float]:
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            for _ in range(requests):
+                begin = time.perf_counter()
+                response = await client.get("/value/", params=params)
+                latencies.append(time.perf_counter() - begin)
+                response.raise_for_status()
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return latencies
+
+
+def main_(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=100, help="values per response")
+    parser.add_argument("--pool-size", type=int, default=20, help="async read connections")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = "sqlite:///%s" % (Path(directory) / "bench.db")
+        engine, read_engine = create_engines(url)
+        crud = Crud(engine, read_engine=read_engine)
+        crud.add_values((t, t % 4, float(t)) for t in range(args.rows))
+        async_engine = create_async_engine(url, pool_size=args.pool_size)
+        main.crud = crud
+        main.async_crud = AsyncCrud(async_engine, crud)
+
+        params = {"type_id": 1, "start": args.rows // 2, "limit": args.limit}
+        result = {"clients": args.clients, "rows": args.rows}
+        for name, app in (("sync", sync_app(crud)), ("async", main.app)):
+            latencies = asyncio.run(run_clients(app, args.clients, args.requests, params))
+            result[name] = percentiles(latencies)
+        asyncio.run(async_engine.dispose())
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main_()
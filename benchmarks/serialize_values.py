@@ -0,0 +1,71 @@
+"""Rows per second of fetching and serializing values for GET /value/, before and after the orjson fast path.
+
+Run with ``python -m benchmarks.serialize_values --rows 200000``. Every variant fetches the
+same rows from a file database and produces the response body:
+
+- orm_pydantic: ORM Value objects, validated as List[ApiTypes.Value] and encoded with json,
+  which is what the endpoint did before.
+- rows_orjson: plain Core row tuples encoded with orjson, the default json format now.
+- rows_orjson_columns: the same rows as a column oriented orjson payload (format=columns).
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import orjson
+from pydantic import TypeAdapter
+
+from rdp.api import api_types as ApiTypes
+from rdp.api import main
+from rdp.crud import Crud, create_engines
+
+
+def orm_pydantic(crud: Crud) -> bytes:
+    values = crud.get_values()
+    adapter = TypeAdapter(List[ApiTypes.Value])
+    models = adapter.validate_python([main.value_to_dict(value) for value in values])
+    return json.dumps(adapter.dump_python(models, mode="json")).encode()
+
+
+def rows_orjson(crud: Crud) -> bytes:
+    return orjson.dumps([main.row_to_dict(row) for row in crud.get_value_rows()])
+
+
+def rows_orjson_columns(crud: Crud) -> bytes:
+    columns = list(zip(*crud.get_value_rows()))
+    return orjson.dumps(dict(zip(("id", "time", "value_type_id", "value"), columns)))
+
+
+def measure(function: Callable[[Crud], bytes], crud: Crud, rows: int, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        body = function(crud)
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": best, "rows_per_second": rows / best, "bytes": len(body)}
+
+
+def main_(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant, the best one counts")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = "sqlite:///%s" % (Path(directory) / "bench.db")
+        engine, read_engine = create_engines(url)
+        crud = Crud(engine, read_engine=read_engine)
+        crud.add_values((t, t % 4, t / 8) for t in range(args.rows))
+
+        result = {"rows": args.rows}
+        for function in (orm_pydantic, rows_orjson, rows_orjson_columns):
+            result[function.__name__] = measure(function, crud, args.rows, args.repeat)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,225 @@
+"""Benchmark suite of ingest, inserts and api latencies, written as JSON to compare releases.
+
+Run with ``python -m benchmarks.suite --rows 1000000 --output bench.json``, and with
+``--baseline old.json`` to report every rate or latency which got worse by more than
+--tolerance, the exit status is 1 then. All sections run against a fresh file database:
+
+- ingest: a FakeDevice FIFO feeds a Reader, records per second from the first write until
+  the last record is committed, plus the commit latencies of the writer.
+- insert: values per second of Crud.add_value (one transaction each), Crud.add_values in
+  batches and Crud.bulk_load.
+- api: the dataset of --rows values (1M to 100M) is bulk loaded, then GET /value/ and
+  GET /type/ are timed through the FastAPI test client, reported as latency percentiles.
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from rdp.api import main
+from rdp.crud import AsyncCrud, Crud, create_async_engine, create_engines
+from rdp.sensor import Hub, Reader, RecentValues
+
+from .fake_device import FakeDevice, synthetic_chunks, synthetic_records
+from .load_api import percentiles
+
+START = 1700000000
+
+
+def open_crud(directory: str, name: str) -> Crud:
+    engine, read_engine = create_engines("sqlite:///%s" % (Path(directory) / name))
+    return Crud(engine, read_engine=read_engine)
+
+
+def rate(count: int, seconds: float) -> Dict[str, float]:
+    return {"values": count, "seconds": seconds, "values_per_second": count / seconds if seconds else None}
+
+
+def bench_ingest(directory: str, records: int, device_rate: float, types: int, timeout: float) -> Dict:
+    crud = open_crud(directory, "ingest.db")
+    fifo = str(Path(directory) / "rdp_fifo")
+    device = FakeDevice(fifo, records, device_rate, types, START)
+    reader = Reader(crud, devices=[fifo], batch_size=1024, commit_size=10000, commit_interval=0.1)
+    reader.start()
+    began = time.perf_counter()
+    device.start()
+    deadline = began + timeout
+    while reader.stats.committed + reader.stats.duplicates < records and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - began
+    reader.stop()
+    device.stop()
+    stats = reader.stats
+    result = rate(stats.committed, elapsed)
+    result.update(
+        {
+            "device_rate": device_rate,
+            "types": types,
+            "complete": stats.committed == records,
+            "commits": stats.commits,
+            "mean_commit_ms": stats.commit_seconds / stats.commits * 1000 if stats.commits else None,
+            "max_commit_ms": stats.max_commit_seconds * 1000,
+            "max_queue_depth": stats.max_depth,
+        }
+    )
+    return result
+
+
+def bench_insert(directory: str, single: int, batched: int, bulk: int, types: int) -> Dict:
+    crud = open_crud(directory, "insert.db")
+    began = time.perf_counter()
+    for value_time, value_type, value in synthetic_records(0, single, types, START).tolist():
+        crud.add_value(value_time, value_type, value)
+    result = {"add_value": rate(single, time.perf_counter() - began)}
+
+    crud = open_crud(directory, "insert_batched.db")
+    began = time.perf_counter()
+    for chunk in synthetic_chunks(batched, types, START, 1000):
+        crud.add_values(chunk)
+    result["add_values"] = rate(batched, time.perf_counter() - began)
+
+    crud = open_crud(directory, "insert_bulk.db")
+    began = time.perf_counter()
+    crud.bulk_load(synthetic_chunks(bulk, types, START))
+    result["bulk_load"] = rate(bulk, time.perf_counter() - began)
+    return result
+
+
+def time_requests(client: TestClient, requests: List[str]) -> Dict[str, float]:
+    latencies = []
+    for url in requests:
+        begin = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - begin)
+        response.raise_for_status()
+    return percentiles(latencies)
+
+
+def bench_api(directory: str, rows: int, types: int, requests: int, limit: int) -> Dict:
+    url = "sqlite:///%s" % (Path(directory) / "api.db")
+    engine, read_engine = create_engines(url)
+    crud = Crud(engine, read_engine=read_engine)
+    began = time.perf_counter()
+    crud.bulk_load(synthetic_chunks(rows, types, START))
+    result = {"rows": rows, "types": types, "load": rate(rows, time.perf_counter() - began)}
+
+    async_engine = create_async_engine(url)
+    main.crud = crud
+    main.async_crud = AsyncCrud(async_engine, crud)
+    main.hub = Hub()
+    # an empty recent buffer, every request goes to the database
+    main.recent = RecentValues()
+    client = TestClient(main.app)
+
+    seconds = rows // types
+    generator = random.Random(0)
+    windows = [
+        (generator.randrange(types), START + generator.randrange(max(seconds - limit, 1)))
+        for _ in range(requests)
+    ]
+    queries = {
+        "value_window": ["/value/?type_id=%d&start=%d&limit=%d" % (t, s, limit) for t, s in windows],
+        "value_window_columns": [
+            "/value/?type_id=%d&start=%d&limit=%d&format=columns" % (t, s, limit) for t, s in windows
+        ],
+        "value_newest": ["/value/?type_id=%d&start=%d" % (t, START + seconds - limit) for t, _ in windows],
+        "type_list": ["/type/"] * requests,
+        "type_one": ["/type/%d/" % t for t, _ in windows],
+    }
+    for name, urls in queries.items():
+        result[name] = time_requests(client, urls)
+    client.close()
+    return result
+
+
+def flatten(result: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def regressions(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """The rates which dropped and the latencies which rose by more than tolerance against baseline"""
+    found = []
+    current, previous = flatten(result), flatten(baseline)
+    for key, old in previous.items():
+        new = current.get(key)
+        if new is None or not old:
+            continue
+        if key.endswith("_per_second") and new < old * (1 - tolerance):
+            found.append("%s: %.1f -> %.1f" % (key, old, new))
+        elif key.endswith("_ms") and new > old * (1 + tolerance):
+            found.append("%s: %.3f -> %.3f" % (key, old, new))
+    return found
+
+
+def main_(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="values in the api dataset")
+    parser.add_argument("--types", type=int, default=4, help="number of value types")
+    parser.add_argument("--ingest-records", type=int, default=200000)
+    parser.add_argument(
+        "--device-rate", type=float, default=0, help="records per second of the fake device, 0 for unthrottled"
+    )
+    parser.add_argument("--ingest-timeout", type=float, default=300, help="seconds to wait for the ingest")
+    parser.add_argument("--single", type=int, default=2000, help="values written with add_value")
+    parser.add_argument("--batched", type=int, default=200000, help="values written with add_values")
+    parser.add_argument("--bulk", type=int, default=1000000, help="values written with bulk_load")
+    parser.add_argument("--requests", type=int, default=200, help="requests per api query")
+    parser.add_argument("--limit", type=int, default=1000, help="values per /value/ response")
+    parser.add_argument("--sections", default="ingest,insert,api", help="comma separated sections to run")
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as regression")
+    parser.add_argument("--directory", help="directory of the databases, a temporary one by default")
+    args = parser.parse_args(argv)
+    sections = {section.strip() for section in args.sections.split(",")}
+
+    result = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "arguments": vars(args),
+        }
+    }
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        if "ingest" in sections:
+            result["ingest"] = bench_ingest(
+                directory, args.ingest_records, args.device_rate, args.types, args.ingest_timeout
+            )
+        if "insert" in sections:
+            result["insert"] = bench_insert(directory, args.single, args.batched, args.bulk, args.types)
+        if "api" in sections:
+            result["api"] = bench_api(directory, args.rows, args.types, args.requests, args.limit)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        found = regressions(result, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in found:
+            print("regression %s" % line, file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
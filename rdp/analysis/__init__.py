@@ -0,0 +1,3 @@
+from .align import align, align_many
+from .downsample import lttb
+from .stats import rolling, summarize
@@ -0,0 +1,66 @@
+from typing import Dict
+
+import numpy as np
+
+METHODS = ("locf", "linear")
+
+
+def align(
+    times: np.ndarray,
+    values: np.ndarray,
+    grid: np.ndarray,
+    method: str = "locf",
+    tolerance: int = None,
+) -> np.ndarray:
+    """As-of join of one series onto a time grid
+
+    "locf" carries the last observation at or before every grid time forward, "linear"
+    interpolates between the observations around it. Grid times without a usable observation
+    are NaN.
+
+    Args:
+        times (np.ndarray): ascending time stamps of the series.
+        values (np.ndarray): values of the series, same length as times.
+        grid (np.ndarray): ascending grid times.
+        method (str, optional): "locf" or "linear". Defaults to "locf".
+        tolerance (int, optional): If set, observations further than this many seconds from a grid
+            time are not used. Defaults to None.
+
+    Raises:
+        ValueError: Thrown on an unknown method
+
+    Returns:
+        np.ndarray: float64 value per grid time
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method: %s" % method)
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    grid = np.asarray(grid, dtype=np.int64)
+    if not len(times):
+        return np.full(len(grid), np.nan)
+    before = np.searchsorted(times, grid, side="right") - 1
+    if method == "locf":
+        result = values[np.maximum(before, 0)]
+        result[before < 0] = np.nan
+        if tolerance is not None:
+            result[grid - times[np.maximum(before, 0)] > tolerance] = np.nan
+        return result
+    result = np.interp(grid, times, values, left=np.nan, right=np.nan)
+    if tolerance is not None:
+        after = np.minimum(before + 1, len(times) - 1)
+        # exact hits need no neighbours
+        exact = (before >= 0) & (times[np.maximum(before, 0)] == grid)
+        gap = (grid - times[np.maximum(before, 0)] > tolerance) | (times[after] - grid > tolerance)
+        result[gap & ~exact] = np.nan
+    return result
+
+
+def align_many(
+    series: Dict[int, tuple], grid: np.ndarray, method: str = "locf", tolerance: int = None
+) -> Dict[int, np.ndarray]:
+    """Align several (times, values) series onto one grid, see align"""
+    return {
+        key: align(times, values, grid, method, tolerance)
+        for key, (times, values) in series.items()
+    }
@@ -0,0 +1,53 @@
+from typing import Sequence
+
+import numpy as np
+
+
+def lttb(times: Sequence[float], values: Sequence[float], threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling
+
+    Selects at most threshold points of a time series which keep its visual shape. The first
+    and the last point are always part of the result. The bucket bounds and averages are
+    computed for all buckets at once, every selection depends on the previous one, so only
+    the triangle areas of one bucket are computed per step.
+
+    Args:
+        times (Sequence[float]): ascending time stamps of the series.
+        values (Sequence[float]): values of the series, same length as times.
+        threshold (int): maximum number of points to select, at least 3.
+
+    Raises:
+        ValueError: Thrown if threshold is smaller than 3
+
+    Returns:
+        np.ndarray: ascending indices of the selected points.
+    """
+    if threshold < 3:
+        raise ValueError("threshold must be at least 3")
+    length = len(times)
+    if threshold >= length:
+        return np.arange(length)
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    # bucket i holds the points edges[i] to edges[i + 1] - 1, the last bucket is the last point
+    every = (length - 2) / (threshold - 2)
+    edges = np.minimum((np.arange(threshold) * every).astype(np.int64) + 1, length)
+    # average point of the following bucket is the third corner of the triangle
+    counts = np.diff(edges[1:])
+    avg_times = np.add.reduceat(times, edges[1:-1]) / counts
+    avg_values = np.add.reduceat(values, edges[1:-1]) / counts
+
+    edges = edges.tolist()
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = point = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        areas = np.abs(
+            (times[point] - avg_times[i]) * (values[start:end] - values[point])
+            - (times[point] - times[start:end]) * (avg_values[i] - values[point])
+        )
+        point = start + int(areas.argmax())
+        selected[i + 1] = point
+    selected[-1] = length - 1
+    return selected
@@ -0,0 +1,99 @@
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+def summarize(
+    values: np.ndarray,
+    percentiles: Sequence[float] = (50, 90, 99),
+    bins: int = 10,
+    histogram_range: Sequence[float] = None,
+) -> Dict:
+    """Descriptive statistics of a series
+
+    Args:
+        values (np.ndarray): the values.
+        percentiles (Sequence[float], optional): percentiles between 0 and 100 to compute. Defaults
+            to (50, 90, 99).
+        bins (int, optional): number of equally wide histogram bins. Defaults to 10.
+        histogram_range (Sequence[float], optional): (lower, upper) edge of the histogram. Defaults
+            to the minimum and maximum value.
+
+    Raises:
+        ValueError: Thrown if a percentile is outside of 0 to 100 or bins is below one
+
+    Returns:
+        Dict: count, min, max, mean, std (population standard deviation), percentiles by
+        percentile and histogram with bin edges and counts. Statistics of an empty series are None.
+    """
+    percentiles = [float(percentile) for percentile in percentiles]
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise ValueError("percentiles must be between 0 and 100")
+    if bins < 1:
+        raise ValueError("bins must be at least one")
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {
+            "count": 0,
+            "min": None,
+            "max": None,
+            "mean": None,
+            "std": None,
+            "percentiles": {percentile: None for percentile in percentiles},
+            "histogram": {"edges": [], "counts": []},
+        }
+    counts, edges = np.histogram(values, bins=bins, range=histogram_range)
+    computed = np.percentile(values, percentiles) if percentiles else []
+    return {
+        "count": len(values),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "percentiles": dict(zip(percentiles, computed.tolist() if len(computed) else [])),
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+def rolling(
+    times: np.ndarray, values: np.ndarray, window: int, at: np.ndarray = None
+) -> Dict[str, np.ndarray]:
+    """Statistics over a sliding time window
+
+    For every evaluation time t the window holds the values with t - window < time <= t.
+    The window bounds are found with searchsorted and the sums come from cumulative sums,
+    so the cost does not depend on the window width.
+
+    Args:
+        times (np.ndarray): ascending time stamps of the series.
+        values (np.ndarray): values of the series, same length as times.
+        window (int): width of the window in seconds, at least one.
+        at (np.ndarray, optional): ascending evaluation times. Defaults to the time stamps of the
+            series.
+
+    Raises:
+        ValueError: Thrown if window is below one
+
+    Returns:
+        Dict[str, np.ndarray]: time, count, mean and std (population standard deviation)
+        per evaluation time, mean and std are NaN for empty windows.
+    """
+    if window < 1:
+        raise ValueError("window must be at least one second")
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    at = times if at is None else np.asarray(at, dtype=np.int64)
+    # shifting by the mean keeps the sum of squares from cancelling out
+    shifted = values - values.mean() if len(values) else values
+    sums = np.concatenate(([0.0], np.cumsum(shifted)))
+    squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    upper = np.searchsorted(times, at, side="right")
+    lower = np.searchsorted(times, at - window, side="right")
+    count = upper - lower
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[upper] - sums[lower]) / count
+        variance = (squares[upper] - squares[lower]) / count - mean * mean
+    std = np.sqrt(np.maximum(variance, 0.0))
+    if len(values):
+        mean = mean + values.mean()
+    return {"time": at, "count": count, "mean": mean, "std": std}
@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic import BaseModel
 
 class ValueTypeNoID(BaseModel):
@@ -15,6 +17,47 @@ class ValueNoID(BaseModel):
 class Value(ValueNoID):
     id: int
 
+class AggregatedValue(BaseModel):
+    value_type_id: int
+    time: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    count: Optional[int] = None
+    last: Optional[float] = None
+
+class Histogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+class ValueStats(BaseModel):
+    value_type_id: int
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+    histogram: Histogram
+
+class RollingStats(BaseModel):
+    value_type_id: int
+    window: int
+    time: List[int]
+    count: List[int]
+    mean: List[Optional[float]]
+    std: List[Optional[float]]
+
+class AlignedValues(BaseModel):
+    method: str
+    time: List[int]
+    values: Dict[str, List[Optional[float]]]
+
+class ProfilerState(BaseModel):
+    running: bool
+    interval: float
+    samples: int
+
 class ApiDescription(BaseModel):
     description : str = "This is the Api"
     value_type_link : str = "/type"
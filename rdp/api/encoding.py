@@ -0,0 +1,107 @@
+import io
+import struct
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PACKED_MEDIA_TYPE = "application/x-rdp-values"
+
+ROW_DTYPE = np.dtype([("id", "<i8"), ("time", "<i8"), ("value_type_id", "<u4"), ("value", "<f8")])
+
+# magic, format version, bytes per value (4 or 8), number of values
+PACKED_HEADER = struct.Struct("<4sHHQ")
+PACKED_MAGIC = b"RDPV"
+PACKED_VERSION = 1
+PACKED_PRECISIONS = {"float32": "<f4", "float64": "<f8"}
+
+
+def rows_to_columns(rows: Sequence[Tuple[int, int, int, float]]) -> np.ndarray:
+    """Turn (id, time, value type id, value) rows into a structured array, one field per column"""
+    return np.array(rows, dtype=ROW_DTYPE)
+
+
+def encode_packed(columns: np.ndarray, precision: str = "float64") -> bytes:
+    """Encode value columns into the packed binary format.
+
+    A 16 byte header (magic "RDPV", uint16 version, uint16 bytes per value, uint64 count n)
+    is followed by the columns, all little endian: n int64 times, n int64 ids, n float32 or
+    float64 values and n uint32 value type ids. Every column starts aligned to its item size,
+    so a client can view it with numpy.frombuffer at the offset.
+
+    Args:
+        columns (np.ndarray): array with ROW_DTYPE fields, see rows_to_columns.
+        precision (str, optional): "float32" or "float64". Defaults to "float64".
+
+    Returns:
+        bytes: the encoded values
+    """
+    value_dtype = np.dtype(PACKED_PRECISIONS[precision])
+    header = PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, value_dtype.itemsize, len(columns))
+    return b"".join(
+        (
+            header,
+            np.ascontiguousarray(columns["time"]).tobytes(),
+            np.ascontiguousarray(columns["id"]).tobytes(),
+            columns["value"].astype(value_dtype).tobytes(),
+            np.ascontiguousarray(columns["value_type_id"]).tobytes(),
+        )
+    )
+
+
+def decode_packed(buffer) -> Dict[str, np.ndarray]:
+    """Decode the packed binary format without copying, see encode_packed
+
+    Raises:
+        ValueError: Thrown if the buffer is not in the packed format
+
+    Returns:
+        Dict[str, np.ndarray]: the time, id, value and value_type_id columns
+    """
+    if len(buffer) < PACKED_HEADER.size:
+        raise ValueError("buffer too short")
+    magic, version, value_size, count = PACKED_HEADER.unpack_from(buffer)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError("not a packed value buffer")
+    value_dtype = "<f%d" % value_size
+    offset = PACKED_HEADER.size
+    columns = {}
+    for name, dtype in (
+        ("time", "<i8"),
+        ("id", "<i8"),
+        ("value", value_dtype),
+        ("value_type_id", "<u4"),
+    ):
+        columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        offset += columns[name].nbytes
+    return columns
+
+
+def encode_arrow(columns: np.ndarray) -> bytes:
+    """Encode value columns as an Arrow IPC stream with one record batch
+
+    Raises:
+        RuntimeError: Thrown if pyarrow is not installed
+
+    Returns:
+        bytes: the stream
+    """
+    if pyarrow is None:
+        raise RuntimeError("the arrow format needs pyarrow")
+    batch = pyarrow.record_batch(
+        [
+            pyarrow.array(np.ascontiguousarray(columns[name]))
+            for name in ("id", "time", "value_type_id", "value")
+        ],
+        names=["id", "time", "value_type_id", "value"],
+    )
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
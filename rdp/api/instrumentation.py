@@ -0,0 +1,124 @@
+import time
+from typing import List
+
+from rdp.crud.cache import ValueTypeCache
+from rdp.metrics import FAST_BUCKETS, Counter, Gauge, Histogram, Metric
+from rdp.sensor import Reader
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware observing the duration of every http request
+
+    The durations are labelled by method, route template (e.g. /type/{id}/) and status, so
+    the number of time series does not grow with the requested ids. A streamed response
+    counts until its last chunk is sent.
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self._histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self._histogram.observe(
+                time.perf_counter() - started, (scope["method"], route, str(status))
+            )
+
+
+def ingest_role_metrics(reader: Reader) -> List[Metric]:
+    """Whether this process has ingest duty, for deployments with several workers"""
+    leader = Gauge("rdp_ingest_leader", "1 if this process reads the sensor devices, else 0")
+    leader.set(0 if reader is None else 1)
+    return [leader]
+
+
+def value_type_cache_metrics(cache: ValueTypeCache) -> List[Metric]:
+    """The lookups and the size of the value type cache, see ValueTypeCache.stats"""
+    if cache is None:
+        return []
+    stats = cache.stats()
+    lookups = Counter(
+        "rdp_value_type_cache_lookups_total", "Lookups of the value type cache", ("result",)
+    )
+    lookups.inc(stats["hits"], ("hit",))
+    lookups.inc(stats["misses"], ("miss",))
+    size = Gauge("rdp_value_type_cache_size", "Value types held by the value type cache")
+    size.set(stats["size"])
+    return [lookups, size]
+
+
+def reader_metrics(reader: Reader) -> List[Metric]:
+    """The counters and histograms of a sensor reader as metrics, built at scrape time"""
+    if reader is None:
+        return []
+    stats = reader.stats
+    records = Counter("rdp_ingest_records_total", "Records by what became of them", ("state",))
+    for state, count in (
+        ("enqueued", stats.enqueued),
+        ("committed", stats.committed),
+        ("duplicate", stats.duplicates),
+        ("skipped", stats.skipped),
+        ("dropped", stats.dropped),
+        ("spilled", stats.spilled),
+        ("failed", stats.failed),
+    ):
+        records.inc(count, (state,))
+    commits = Counter("rdp_ingest_commits_total", "Transactions of the writer")
+    commits.inc(stats.commits)
+    retries = Counter(
+        "rdp_ingest_commit_retries_total", "Transactions of the writer repeated after a failure"
+    )
+    retries.inc(stats.retries)
+    blocked = Counter(
+        "rdp_ingest_blocked_seconds_total", "Time the devices waited for room in the queue"
+    )
+    blocked.inc(stats.blocked_seconds)
+    depth = Gauge("rdp_ingest_queue_depth", "Records waiting for the writer")
+    depth.set(stats.depth)
+    commit_latency = Histogram(
+        "rdp_ingest_commit_duration_seconds", "Duration of the writer transactions"
+    )
+    commit_latency.attach(stats.commit_latency)
+
+    device_records = Counter("rdp_device_records_total", "Records read from a device", ("device",))
+    device_bytes = Counter("rdp_device_read_bytes_total", "Bytes read from a device", ("device",))
+    device_errors = Counter(
+        "rdp_device_errors_total", "Failed opens or reads of a device", ("device",)
+    )
+    decode_latency = Histogram(
+        "rdp_device_decode_duration_seconds",
+        "Time to decode the records of one read",
+        ("device",),
+        FAST_BUCKETS,
+    )
+    for device, device_stats in reader.device_stats.items():
+        device_records.inc(device_stats.records, (device,))
+        device_bytes.inc(device_stats.bytes, (device,))
+        device_errors.inc(device_stats.errors, (device,))
+        decode_latency.attach(device_stats.decode_latency, (device,))
+    return [
+        records,
+        commits,
+        retries,
+        blocked,
+        depth,
+        commit_latency,
+        device_records,
+        device_bytes,
+        device_errors,
+        decode_latency,
+    ]
@@ -1,15 +1,73 @@
-from typing import Union, List
+import asyncio
+from typing import Literal, Optional, Union, List, Tuple
 
-from fastapi import FastAPI, HTTPException
+import numpy as np
+import orjson
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-from rdp.sensor import Reader
-from rdp.crud import create_engine, Crud
+from rdp.analysis import align_many, rolling, summarize
+from rdp.config import Config
+from rdp.sensor import Follower, Hub, IngestLock, IngestService, Reader, RecentValues
+from rdp.crud import AsyncCrud, create_async_engine, create_engines, Crud, MonthlyPartitions
+from rdp.metrics import CONTENT_TYPE, Histogram, Registry, SamplingProfiler, instrument_engine
 from . import api_types as ApiTypes
+from . import encoding
+from .instrumentation import (
+    RequestMetricsMiddleware,
+    ingest_role_metrics,
+    reader_metrics,
+    value_type_cache_metrics,
+)
 import logging
 
 logger = logging.getLogger("rdp.api")
 app = FastAPI()
 
+config = Config.from_env()
+DATABASE_URL = config.database_url
+SSE_KEEPALIVE = 15.0
+MAX_POINTS = 1000000
+
+hub = Hub()
+recent = RecentValues(default_capacity=config.recent_capacity, capacities=config.recent_capacities)
+crud: Crud = None
+async_crud: AsyncCrud = None
+reader: Reader = None
+follower: Follower = None
+ingest_service: IngestService = None
+
+metrics = Registry()
+request_seconds = metrics.add(
+    Histogram(
+        "rdp_http_request_duration_seconds",
+        "Duration of the http requests",
+        ("method", "route", "status"),
+    )
+)
+query_seconds = metrics.add(
+    Histogram(
+        "rdp_db_query_duration_seconds",
+        "Duration of the database statements",
+        ("engine", "statement"),
+    )
+)
+metrics.add_collector(lambda: reader_metrics(ingest_reader()))
+metrics.add_collector(lambda: ingest_role_metrics(ingest_reader()))
+metrics.add_collector(
+    lambda: value_type_cache_metrics(None if crud is None else crud.value_type_cache)
+)
+profiler = SamplingProfiler()
+app.add_middleware(RequestMetricsMiddleware, histogram=request_seconds)
+
 @app.get("/")
 def read_root() -> ApiTypes.ApiDescription:
     """This url returns a simple description of the api
@@ -20,17 +78,17 @@ def read_root() -> ApiTypes.ApiDescription:
     return ApiTypes.ApiDescription()
 
 @app.get("/type/")
-def read_types() -> List[ApiTypes.ValueType]:
+async def read_types() -> List[ApiTypes.ValueType]:
     """Implements the get of all value types
 
     Returns:
         List[ApiTypes.ValueType]: list of available valuetypes. 
     """    
-    global crud
-    return crud.get_value_types()
+    global async_crud
+    return await async_crud.get_value_types()
 
 @app.get("/type/{id}/")
-def read_type(id: int) -> ApiTypes.ValueType:
+async def read_type(id: int) -> ApiTypes.ValueType:
     """returns an explicit value type identified by id
 
     Args:
@@ -42,15 +100,15 @@ def read_type(id: int) -> ApiTypes.ValueType:
     Returns:
         ApiTypes.ValueType: the desired value type 
     """
-    global crud
+    global async_crud
     try:
-         return crud.get_value_type(id)
-    except crud.NoResultFound:
+         return await async_crud.get_value_type(id)
+    except async_crud.NoResultFound:
         raise HTTPException(status_code=404, detail="Item not found") 
     return value_type 
 
 @app.put("/type/{id}/")
-def put_type(id, value_type: ApiTypes.ValueTypeNoID) -> ApiTypes.ValueType:
+def put_type(id: int, value_type: ApiTypes.ValueTypeNoID) -> ApiTypes.ValueType:
     """PUT request to a special valuetype. This api call is used to change a value type object.
 
     Args:
@@ -66,49 +124,592 @@ def put_type(id, value_type: ApiTypes.ValueTypeNoID) -> ApiTypes.ValueType:
     global crud
     try:
         crud.add_or_update_value_type(id, value_type_name=value_type.type_name, value_type_unit=value_type.type_unit)
-        return read_type(id)
+        return crud.get_value_type(id)
     except crud.NoResultFound:
         raise HTTPException(status_code=404, detail="Item not found")
 
+def parse_cursor(cursor: str) -> Tuple[int, int]:
+    """Parse a keyset cursor of the form "<time>,<id>"
+
+    Raises:
+        HTTPException: Thrown if the cursor is malformed
+    """
+    try:
+        value_time, value_id = cursor.split(",")
+        return int(value_time), int(value_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def value_to_dict(value) -> dict:
+    return {
+        "id": value.id,
+        "time": value.time,
+        "value": value.value,
+        "value_type_id": value.value_type_id,
+    }
+
+
+def row_to_dict(row) -> dict:
+    value_id, value_time, value_type, value = row
+    return {"id": value_id, "time": value_time, "value": value, "value_type_id": value_type}
+
+
+async def check_backfill() -> None:
+    """Let the recent value buffers stop covering the values backfilled since the last check"""
+    backfill, end_time = await async_crud.get_backfill()
+    if backfill != recent.backfill:
+        recent.invalidate(backfill, end_time)
+
+
+async def get_value_rows(
+    type_id: int = None,
+    start: int = None,
+    end: int = None,
+    cursor: Tuple[int, int] = None,
+    limit: int = None,
+) -> List[Tuple[int, int, int, float]]:
+    """(id, time, value type id, value) rows from the recent value buffer if it covers the range,
+    else from the database"""
+    if type_id is not None and start is not None:
+        await check_backfill()
+        if recent.covers(type_id, start):
+            rows = recent.get(type_id, start, end)
+            if cursor is not None:
+                rows = [row for row in rows if (row[1], row[0]) > cursor]
+            return rows[:limit]
+    return await async_crud.get_value_rows(type_id, start, end, cursor, limit)
+
+
 @app.get("/value/")
-def get_values(type_id:int=None, start:int=None, end:int=None) -> List[ApiTypes.Value]:
+async def get_values(
+    type_id: int = None,
+    start: int = None,
+    end: int = None,
+    after: str = None,
+    limit: int = Query(None, gt=0),
+    output_format: Literal["json", "columns", "ndjson", "arrow", "packed"] = Query(
+        "json", alias="format"
+    ),
+    precision: Literal["float32", "float64"] = "float64",
+) -> List[ApiTypes.Value]:
     """Get values from the database. The default is to return all available values. This result can be filtered.
 
+    The values are ordered by time and id. Large results can be paged through with limit and after,
+    the cursor for the next page is returned in the X-Next-Cursor header. With format=ndjson the
+    values are streamed as newline delimited json instead of being collected into one list.
+    format=columns returns one json object with an array per field instead of an object per value.
+    format=arrow returns an Arrow IPC stream and format=packed the columns as little endian
+    arrays behind a small header (see rdp.api.encoding.encode_packed), both are built from
+    plain rows without per value objects. Ranges of one type which lie within the recent
+    value buffer are answered from memory.
+
     Args:
         type_id (int, optional): If set, only values of this type are returned. Defaults to None.
         start (int, optional): If set, only values at least as new are returned. Defaults to None.
         end (int, optional): If set, only values not newer than this are returned. Defaults to None.
+        after (str, optional): Keyset cursor "<time>,<id>", if set only values after it are
+            returned. Defaults to None.
+        limit (int, optional): If set, at most this many values are returned. Defaults to None.
+        output_format (Literal["json", "columns", "ndjson", "arrow", "packed"], optional): response
+            format. Defaults to "json".
+        precision (Literal["float32", "float64"], optional): width of the values in the packed
+            format. Defaults to "float64".
+
+    Raises:
+        HTTPException: Thrown if the cursor is malformed or pyarrow is missing for the arrow format
+
+    Returns:
+        List[ApiTypes.Value]: the requested values
+    """
+    global async_crud
+    cursor = parse_cursor(after) if after is not None else None
+    if output_format == "ndjson":
+        lines = (
+            orjson.dumps(value_to_dict(value)) + b"\n"
+            async for value in async_crud.iter_values(type_id, start, end, cursor, limit)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    if output_format == "arrow" and encoding.pyarrow is None:
+        raise HTTPException(status_code=501, detail="The arrow format needs pyarrow")
+    rows = await get_value_rows(type_id, start, end, cursor, limit)
+    headers = {}
+    if limit is not None and len(rows) == limit:
+        headers["X-Next-Cursor"] = "%d,%d" % (rows[-1][1], rows[-1][0])
+    if output_format == "json":
+        # same schema as List[ApiTypes.Value], but without building and validating a model per
+        # value
+        content = orjson.dumps([row_to_dict(row) for row in rows])
+        return Response(content, media_type="application/json", headers=headers)
+    if output_format == "columns":
+        columns = list(zip(*rows)) or [(), (), (), ()]
+        content = orjson.dumps(dict(zip(("id", "time", "value_type_id", "value"), columns)))
+        return Response(content, media_type="application/json", headers=headers)
+    columns = encoding.rows_to_columns(rows)
+    if output_format == "arrow":
+        return Response(
+            encoding.encode_arrow(columns), media_type=encoding.ARROW_MEDIA_TYPE, headers=headers
+        )
+    return Response(
+        encoding.encode_packed(columns, precision),
+        media_type=encoding.PACKED_MEDIA_TYPE,
+        headers=headers,
+    )
+
+
+@app.get("/value/latest")
+async def get_latest_values(type_id: int = None) -> List[ApiTypes.Value]:
+    """Get the newest value of one or of every value type.
+
+    Served from the recent value buffer, the database is only asked for types which are not
+    buffered.
+
+    Args:
+        type_id (int, optional): If set, only the newest value of this type is returned. Defaults
+            to None.
+
+    Returns:
+        List[ApiTypes.Value]: at most one value per type, ordered by type
+    """
+    global async_crud
+    if type_id is None:
+        type_ids = [value_type.id for value_type in await async_crud.get_value_types()]
+    else:
+        type_ids = [type_id]
+    await check_backfill()
+    values = []
+    for value_type_id in type_ids:
+        rows = recent.latest(value_type_id)
+        if rows and recent.covers(value_type_id, rows[0][1]):
+            values.append(row_to_dict(rows[0]))
+        else:
+            values.extend(
+                value_to_dict(value) for value in await async_crud.get_recent_values(value_type_id)
+            )
+    return values
+
+@app.get("/value/aggregate", response_model_exclude_none=True)
+async def get_aggregated_values(
+    type_id: int = None,
+    start: int = None,
+    end: int = None,
+    bucket: int = Query(60, gt=0),
+    agg: str = "min,max,mean,count,last",
+) -> List[ApiTypes.AggregatedValue]:
+    """Get values aggregated into time buckets, e.g. for downsampled charts.
+
+    Args:
+        type_id (int, optional): If set, only values of this type are aggregated. Defaults to None.
+        start (int, optional): If set, only values at least as new are aggregated. Defaults to
+            None.
+        end (int, optional): If set, only values not newer than this are aggregated. Defaults to
+            None.
+        bucket (int, optional): bucket width in seconds. Defaults to 60.
+        agg (str, optional): comma separated list of min, max, mean, count and last. Defaults to
+            all of them.
 
     Raises:
-        HTTPException: _description_
+        HTTPException: Thrown on an unknown aggregate
 
     Returns:
-        List[ApiTypes.Value]: _description_
+        List[ApiTypes.AggregatedValue]: one entry per value type and bucket
+    """
+    global async_crud
+    aggregates = [name.strip() for name in agg.split(",") if name.strip()]
+    try:
+        return await async_crud.get_aggregated_values(type_id, start, end, bucket, aggregates)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+@app.get("/value/lttb")
+def get_values_lttb(
+    type_id: int, start: int = None, end: int = None, points: int = Query(1000, ge=3)
+) -> List[ApiTypes.ValueNoID]:
+    """Get at most points visually representative values of one value type
+    (Largest-Triangle-Three-Buckets).
+
+    The selection is CPU bound, so this endpoint stays synchronous and runs in the threadpool.
+
+    Args:
+        type_id (int): the value type of the series.
+        start (int, optional): If set, only values at least as new are used. Defaults to None.
+        end (int, optional): If set, only values not newer than this are used. Defaults to None.
+        points (int, optional): maximum number of returned values. Defaults to 1000.
+
+    Returns:
+        List[ApiTypes.ValueNoID]: the selected values ordered by time
     """
     global crud
+    times, values = crud.get_values_lttb(type_id, start, end, points)
+    return [
+        {"value_type_id": type_id, "time": value_time, "value": value}
+        for value_time, value in zip(times.tolist(), values.tolist())
+    ]
+
+def parse_percentiles(percentiles: str) -> List[float]:
+    """Parse a comma separated list of percentiles
+
+    Raises:
+        HTTPException: Thrown if an entry is not a number
+    """
     try:
-        values = crud.get_values(type_id, start, end)
-        return values
-    except crud.NoResultFound:
-        raise HTTPException(status_code=404, deltail="Item not found")
+        return [float(percentile) for percentile in percentiles.split(",") if percentile.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid percentiles")
+
+
+def nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
+
+
+@app.get("/value/stats")
+def get_value_stats(
+    type_id: int,
+    start: int = None,
+    end: int = None,
+    percentiles: str = "50,90,99",
+    bins: int = Query(10, ge=1, le=10000),
+    hist_min: float = None,
+    hist_max: float = None,
+) -> ApiTypes.ValueStats:
+    """Get descriptive statistics of one value type: count, min, max, mean, standard deviation,
+    percentiles and a histogram.
+
+    The values are fetched as one numpy column and the statistics computed next to the data, this
+    endpoint is CPU bound and stays synchronous.
+
+    Args:
+        type_id (int): the value type of the series.
+        start (int, optional): If set, only values at least as new are used. Defaults to None.
+        end (int, optional): If set, only values not newer than this are used. Defaults to None.
+        percentiles (str, optional): comma separated percentiles between 0 and 100. Defaults to
+            "50,90,99".
+        bins (int, optional): number of equally wide histogram bins. Defaults to 10.
+        hist_min (float, optional): lower edge of the histogram. Defaults to the minimum value.
+        hist_max (float, optional): upper edge of the histogram. Defaults to the maximum value.
+
+    Raises:
+        HTTPException: Thrown on invalid percentiles or histogram edges
+
+    Returns:
+        ApiTypes.ValueStats: the statistics, percentiles are keyed by the percentile as given
+    """
+    global crud
+    requested = parse_percentiles(percentiles)
+    _, values = crud.get_series(type_id, start, end)
+    histogram_range = None
+    if len(values) and (hist_min is not None or hist_max is not None):
+        histogram_range = (
+            hist_min if hist_min is not None else float(values.min()),
+            hist_max if hist_max is not None else float(values.max()),
+        )
+    try:
+        stats = summarize(values, requested, bins, histogram_range)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    stats["percentiles"] = {
+        "%g" % percentile: value for percentile, value in stats["percentiles"].items()
+    }
+    return ApiTypes.ValueStats(value_type_id=type_id, **stats)
+
+@app.get("/value/rolling")
+def get_rolling_stats(
+    type_id: int,
+    window: int = Query(..., ge=1),
+    start: int = None,
+    end: int = None,
+    step: int = Query(None, ge=1),
+) -> ApiTypes.RollingStats:
+    """Get count, mean and standard deviation over a sliding time window of one value type.
+
+    Every window covers the window seconds up to and including its time. Without step there is one
+    window per stored value, with step the windows end on a grid from start to end.
+
+    Args:
+        type_id (int): the value type of the series.
+        window (int): width of the window in seconds.
+        start (int, optional): If set, only windows ending at least this new are returned. Defaults
+            to None.
+        end (int, optional): If set, only windows ending not after this are returned. Defaults to
+            None.
+        step (int, optional): If set, distance of the window ends in seconds. Defaults to None.
+
+    Raises:
+        HTTPException: Thrown if the grid would exceed MAX_POINTS windows
+
+    Returns:
+        ApiTypes.RollingStats: one entry per window in every list, mean and std are null for empty
+            windows
+    """
+    global crud
+    # the first windows reach back before start
+    times, values = crud.get_series(type_id, None if start is None else start - window + 1, end)
+    at = None
+    if step is not None:
+        first = start if start is not None else (int(times[0]) if len(times) else 0)
+        last = end if end is not None else (int(times[-1]) if len(times) else first - 1)
+        if (last - first) // step + 1 > MAX_POINTS:
+            raise HTTPException(status_code=400, detail="More than %d windows" % MAX_POINTS)
+        at = np.arange(first, last + 1, step, dtype=np.int64)
+    elif start is not None:
+        at = times[times >= start]
+    result = rolling(times, values, window, at)
+    return ApiTypes.RollingStats(
+        value_type_id=type_id,
+        window=window,
+        time=result["time"].tolist(),
+        count=result["count"].tolist(),
+        mean=nan_to_none(result["mean"]),
+        std=nan_to_none(result["std"]),
+    )
+
+@app.get("/value/aligned")
+def get_aligned_values(
+    type_ids: str,
+    step: int = Query(..., ge=1),
+    start: int = None,
+    end: int = None,
+    method: Literal["locf", "linear"] = "locf",
+    tolerance: int = Query(None, ge=0),
+) -> ApiTypes.AlignedValues:
+    """Get several value types on one common time grid, e.g. to correlate them.
+
+    Every series is joined onto the grid as of each grid time: "locf" carries the last value
+    forward, "linear" interpolates between the values around the grid time. Values from just
+    outside of start and end are used to fill the borders. CPU bound, stays synchronous.
+
+    Args:
+        type_ids (str): comma separated value type ids.
+        step (int): distance of the grid times in seconds.
+        start (int, optional): first grid time. Defaults to the oldest value of the types.
+        end (int, optional): last grid time at most. Defaults to the newest value of the types.
+        method (Literal["locf", "linear"], optional): how grid times between values are filled.
+            Defaults to "locf".
+        tolerance (int, optional): If set, values further than this many seconds from a grid time
+            are not used. Defaults to None.
+
+    Raises:
+        HTTPException: Thrown on invalid type ids or if the grid would exceed MAX_POINTS times
+
+    Returns:
+        ApiTypes.AlignedValues: the grid times and per value type one value per grid time, null
+            where there is none
+    """
+    global crud
+    try:
+        ids = [int(type_id) for type_id in type_ids.split(",") if type_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid type ids")
+    if not ids:
+        raise HTTPException(status_code=400, detail="No type ids")
+    series = {type_id: crud.get_series(type_id, start, end, neighbors=True) for type_id in ids}
+    first, last = start, end
+    if first is None or last is None:
+        times = [series_times for series_times, _ in series.values() if len(series_times)]
+        if first is None:
+            first = min((int(series_times[0]) for series_times in times), default=0)
+        if last is None:
+            last = max((int(series_times[-1]) for series_times in times), default=first - 1)
+    if last >= first and (last - first) // step + 1 > MAX_POINTS:
+        raise HTTPException(status_code=400, detail="More than %d grid times" % MAX_POINTS)
+    grid = np.arange(first, last + 1, step, dtype=np.int64)
+    aligned = align_many(series, grid, method, tolerance)
+    content = {
+        "method": method,
+        "time": grid,
+        "values": {str(type_id): values for type_id, values in aligned.items()},
+    }
+    # orjson writes the numpy arrays directly, NaN becomes null
+    return Response(
+        orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json"
+    )
+
+def stream_message(values, dropped: int) -> dict:
+    return {
+        "dropped": dropped,
+        "values": [row_to_dict(row) for row in values],
+    }
+
+@app.websocket("/value/stream")
+async def stream_values_websocket(
+    websocket: WebSocket,
+    type_id: int = None,
+    queue_size: int = Query(1000, gt=0),
+    policy: Literal["drop", "coalesce"] = "drop",
+) -> None:
+    """Push new values to a websocket client as soon as they are stored.
+
+    Every message is a json object with the new values and the number of values dropped so far
+    because the client did not keep up.
+
+    Args:
+        type_id (int, optional): If set, only values of this type are pushed. Defaults to None.
+        queue_size (int, optional): maximum number of values queued for the client. Defaults to
+            1000.
+        policy (Literal["drop", "coalesce"], optional): what to do with a full queue: drop the
+            oldest values or keep only the newest value per type. Defaults to "drop".
+    """
+    subscription = hub.subscribe(type_id, queue_size, policy)
+
+    async def closed():
+        # clients never send, a receive only returns once the connection is gone
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    closing = None
+    try:
+        await websocket.accept()
+        closing = asyncio.ensure_future(closed())
+        while True:
+            getting = asyncio.ensure_future(subscription.get())
+            await asyncio.wait((getting, closing), return_when=asyncio.FIRST_COMPLETED)
+            if closing.done():
+                getting.cancel()
+                break
+            await websocket.send_json(stream_message(getting.result(), subscription.dropped))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if closing is not None:
+            closing.cancel()
+        hub.unsubscribe(subscription)
+
+@app.get("/value/stream")
+async def stream_values_sse(
+    request: Request,
+    type_id: int = None,
+    queue_size: int = Query(1000, gt=0),
+    policy: Literal["drop", "coalesce"] = "drop",
+) -> StreamingResponse:
+    """Push new values as server-sent events as soon as they are stored.
+
+    The arguments and the event data are the same as for the websocket on this url.
+    """
+    subscription = hub.subscribe(type_id, queue_size, policy)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    values = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "data: %s\n\n" % orjson.dumps(
+                    stream_message(values, subscription.dropped)
+                ).decode()
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> Response:
+    """Metrics of the ingest, the database statements and the http requests in the Prometheus
+    text format"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/metrics/profiler")
+def start_profiler(
+    interval: float = Query(0.01, gt=0), reset: bool = True
+) -> ApiTypes.ProfilerState:
+    """Start sampling the stacks of all threads, see SamplingProfiler
+
+    Args:
+        interval (float, optional): seconds between two samples. Defaults to 0.01.
+        reset (bool, optional): If set, the samples of earlier runs are dropped. Defaults to True.
+    """
+    if not profiler.running:
+        if reset:
+            profiler.reset()
+        profiler.interval = interval
+        profiler.start()
+    return profiler_state()
+
+
+@app.delete("/metrics/profiler")
+def stop_profiler() -> ApiTypes.ProfilerState:
+    """Stop sampling, the samples stay available at GET /metrics/profiler"""
+    profiler.stop()
+    return profiler_state()
+
+@app.get("/metrics/profiler", response_class=PlainTextResponse)
+def get_profile() -> Response:
+    """The sampled stacks in the collapsed format of flame graph tools, one "stack count" line
+    each"""
+    return PlainTextResponse(profiler.collapsed())
+
+def profiler_state() -> ApiTypes.ProfilerState:
+    return ApiTypes.ProfilerState(
+        running=profiler.running, interval=profiler.interval, samples=profiler.samples
+    )
+
+def make_reader() -> Reader:
+    """Build the sensor reader of this process from the settings"""
+    return Reader.from_config(crud, config, hub, recent)
+
+def ingest_reader() -> Reader:
+    """The running reader of this process, None without ingest duty
+
+    With RDP_INGEST=elect the reader is the one of the ingest service while it leads, it is
+    gone once the service resigned or failed to start it.
+    """
+    if ingest_service is not None:
+        return ingest_service.reader if ingest_service.leader else None
+    return reader
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    """start the character device reader
-    """    
+    """start the readers of the configured character devices
+
+    With RDP_INGEST=elect only the process holding the ingest lock reads the devices, with
+    RDP_INGEST=external none does (rdp-ingest does). A process without a reader follows the
+    stored values to feed its recent value buffers and value streams.
+    """
     logger.info("STARTUP: Sensor reader!")
-    global reader, crud
-    engine = create_engine("sqlite:///rdb.test.db")
-    crud = Crud(engine)
-    reader = Reader(crud)
-    reader.start()
+    global crud, async_crud, reader, follower, ingest_service
+    engine, read_engine = create_engines(DATABASE_URL)
+    instrument_engine(engine, query_seconds, "writer")
+    instrument_engine(read_engine, query_seconds, "reader")
+    partitions = MonthlyPartitions(config.retention_months) if config.partitioning else None
+    crud = Crud(
+        engine,
+        read_engine=read_engine,
+        partitions=partitions,
+        seal_after=config.seal_after(),
+        value_type_ttl=config.value_type_ttl,
+    )
+    crud.load_value_types()
+    async_engine = create_async_engine(DATABASE_URL, pool_size=20)
+    instrument_engine(async_engine, query_seconds, "async")
+    async_crud = AsyncCrud(async_engine, crud)
+    if config.ingest == "embedded":
+        reader = make_reader()
+        reader.start()
+    else:
+        follower = Follower(crud, hub, recent)
+        follower.start()
+        if config.ingest == "elect":
+            lock = IngestLock(config.ingest_lock_path())
+            # the reader feeds the buffers of the leader, it catches up on the follower first
+            ingest_service = IngestService(
+                make_reader, lock, on_leader=follower.stop, on_resign=follower.start
+            )
+            ingest_service.start()
     logger.debug("STARTUP: Sensor reader completed!")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """stop the character device reader
     """    
-    global reader
     logger.debug("SHUTDOWN: Sensor reader!")
-    reader.stop()
+    if ingest_service is not None:
+        ingest_service.stop()
+    elif reader is not None:
+        reader.stop()
+    if follower is not None:
+        follower.stop()
     logger.info("SHUTDOWN: Sensor reader completed!")
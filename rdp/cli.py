@@ -0,0 +1,140 @@
+import argparse
+import logging
+import signal
+import threading
+import time
+
+from rdp.config import Config
+from rdp.crud import Crud, EngineProfile, MonthlyPartitions, create_engine, create_engines
+from rdp.sensor import IngestLock, IngestService, Reader
+from rdp.sensor.dump import dump_size, iter_csv_chunks, iter_dump_chunks
+
+logger = logging.getLogger("rdp.cli")
+
+DEFAULT_DATABASE = "sqlite:///rdb.test.db"
+
+
+def rebuild_rollups_main(argv=None) -> None:
+    """console entry point rdp-rebuild-rollups"""
+    parser = argparse.ArgumentParser(
+        description="Recompute the value rollups, e.g. after a backfill or once they are stale."
+    )
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="database url")
+    parser.add_argument("--start", type=int, help="first unix time to rebuild")
+    parser.add_argument("--end", type=int, help="last unix time to rebuild")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    partitions = MonthlyPartitions() if Config.from_env().partitioning else None
+    crud = Crud(create_engine(args.database), partitions=partitions)
+    crud.rebuild_rollups(args.start, args.end)
+    logger.info("Rollups rebuilt")
+
+
+class Progress:
+    """Log the progress of an import at most every interval seconds"""
+
+    def __init__(self, total: int = None, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self._started = time.monotonic()
+        self._reported = self._started
+
+    def __call__(self, read: int, stored: int) -> None:
+        now = time.monotonic()
+        if now - self._reported < self.interval and read != self.total:
+            return
+        self._reported = now
+        rate = read / max(now - self._started, 1e-9)
+        if self.total:
+            logger.info(
+                "%d/%d records read (%.1f%%), %d stored, %.0f records/s",
+                read, self.total, 100.0 * read / self.total, stored, rate,
+            )
+        else:
+            logger.info("%d records read, %d stored, %.0f records/s", read, stored, rate)
+
+
+def import_main(argv=None) -> None:
+    """console entry point rdp-import"""
+    parser = argparse.ArgumentParser(
+        description="Backfill raw dumps of the sensor device or csv exports into the database."
+    )
+    parser.add_argument("files", nargs="+", help="dump (16 byte device records) or csv files")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="database url")
+    parser.add_argument(
+        "--format",
+        choices=["auto", "dump", "csv"],
+        default="auto",
+        help="file format, auto picks csv for files ending in .csv",
+    )
+    parser.add_argument("--chunk-size", type=int, default=100000, help="records per transaction")
+    parser.add_argument(
+        "--keep-indexes",
+        action="store_true",
+        help="update the secondary indexes row by row instead of rebuilding them afterwards",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # nothing is lost if a backfill gets interrupted, it can be run again
+    partitions = MonthlyPartitions() if Config.from_env().partitioning else None
+    crud = Crud(
+        create_engine(args.database, EngineProfile(synchronous="OFF")), partitions=partitions
+    )
+    for path in args.files:
+        file_format = args.format
+        if file_format == "auto":
+            file_format = "csv" if path.lower().endswith(".csv") else "dump"
+        if file_format == "csv":
+            chunks = iter_csv_chunks(path, args.chunk_size)
+            progress = Progress()
+        else:
+            chunks = iter_dump_chunks(path, args.chunk_size)
+            progress = Progress(dump_size(path))
+        logger.info("Importing %s", path)
+        stored = crud.bulk_load(chunks, defer_indexes=not args.keep_indexes, progress=progress)
+        logger.info("%s: %d values stored", path, stored)
+
+
+def ingest_main(argv=None) -> None:
+    """console entry point rdp-ingest"""
+    parser = argparse.ArgumentParser(
+        description="Read the sensor devices into the database, for api workers started with"
+        " RDP_INGEST=external. Further instances wait as hot standby and take over once the"
+        " running one dies. The settings are read from the RDP_* environment variables."
+    )
+    parser.add_argument(
+        "--lock", help="ingest lock file, defaults to RDP_INGEST_LOCK or next to the database"
+    )
+    parser.add_argument(
+        "--retry-interval",
+        type=float,
+        default=1.0,
+        help="seconds between two attempts to take the lock",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    config = Config.from_env()
+    engine, read_engine = create_engines(config.database_url)
+    partitions = MonthlyPartitions(config.retention_months) if config.partitioning else None
+    crud = Crud(
+        engine,
+        read_engine=read_engine,
+        partitions=partitions,
+        seal_after=config.seal_after(),
+        value_type_ttl=config.value_type_ttl,
+    )
+    lock = IngestLock(args.lock or config.ingest_lock_path())
+    service = IngestService(lambda: Reader.from_config(crud, config), lock, args.retry_interval)
+
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+    service.start()
+    logger.info("Waiting for the ingest lock %s (held by pid %s)", lock.path, lock.holder())
+    while not stopping.wait(1.0):
+        pass
+    logger.info("Stopping, the queued records are stored first")
+    service.stop()
@@ -0,0 +1,143 @@
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping
+
+from sqlalchemy.engine import make_url
+
+INGEST_MODES = ("embedded", "elect", "external")
+
+
+def _list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def _capacities(value: str) -> Dict[int, int]:
+    """Parse comma separated type_id=capacity pairs, e.g. 1=50000,2=100"""
+    capacities = {}
+    for item in _list(value):
+        type_id, separator, capacity = item.partition("=")
+        if not separator:
+            raise ValueError("RDP_RECENT_CAPACITIES entries must look like type_id=capacity")
+        capacities[int(type_id)] = int(capacity)
+    return capacities
+
+
+@dataclass
+class Config:
+    """Deployment settings, read from RDP_* environment variables by from_env
+
+    Attributes:
+        database_url (str): RDP_DATABASE_URL, the database url.
+        devices (List[str]): RDP_DEVICES, comma separated paths of the sensor devices.
+        queue_size (int): RDP_QUEUE_SIZE, records waiting for the writer before backpressure
+            applies.
+        backpressure (str): RDP_BACKPRESSURE, "block", "drop-oldest" or "spill".
+        spill_path (str): RDP_SPILL_PATH, file for spilled records, a temporary file if unset.
+        commit_size (int): RDP_COMMIT_SIZE, maximum records per transaction.
+        commit_interval (float): RDP_COMMIT_INTERVAL, seconds to wait for a full transaction.
+        recent_capacity (int): RDP_RECENT_CAPACITY, newest values per value type kept in memory
+            for the latest and recent queries.
+        recent_capacities (Dict[int, int]): RDP_RECENT_CAPACITIES, comma separated type_id=capacity
+            pairs overriding recent_capacity for single value types.
+        skip_stored (bool): RDP_SKIP_STORED, drop the records replayed by the devices on startup
+            which are not newer than the newest stored value of their type (1/true/yes), off by
+            default as it loses older records of a type measured by several devices.
+        partitioning (bool): RDP_PARTITIONING, store the values in one table per month
+            (1/true/yes).
+        retention_months (int): RDP_RETENTION_MONTHS, months of values kept with partitioning, all
+            if unset.
+        seal_after_days (int): RDP_SEAL_AFTER_DAYS, values older than this many days are compressed
+            into chunks, none if unset.
+        ingest (str): RDP_INGEST, which processes read the devices: "embedded" every api process,
+            "elect" the one api process holding the ingest lock, "external" none, rdp-ingest does.
+        ingest_lock (str): RDP_INGEST_LOCK, the lock file of "elect" and rdp-ingest, next to the
+            database if unset.
+        value_type_ttl (float): RDP_VALUE_TYPE_TTL, seconds a cached value type is trusted before
+            it is reloaded, so value types added or renamed by another process show up.
+    """
+
+    database_url: str = "sqlite:///rdb.test.db"
+    devices: List[str] = field(default_factory=lambda: ["/dev/rdp_cdev"])
+    queue_size: int = 100000
+    backpressure: str = "block"
+    spill_path: str = None
+    commit_size: int = 1000
+    commit_interval: float = 0.5
+    recent_capacity: int = 10000
+    recent_capacities: Dict[int, int] = field(default_factory=dict)
+    skip_stored: bool = False
+    partitioning: bool = False
+    retention_months: int = None
+    seal_after_days: int = None
+    ingest: str = "embedded"
+    ingest_lock: str = None
+    value_type_ttl: float = 10.0
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = None) -> "Config":
+        """Build the settings from the environment, unset variables keep their defaults
+
+        Args:
+            environ (Mapping[str, str], optional): the variables. Defaults to os.environ.
+
+        Raises:
+            ValueError: Thrown if a number or a capacity cannot be parsed
+
+        Returns:
+            Config: the settings
+        """
+        environ = os.environ if environ is None else environ
+        config = cls()
+        if "RDP_DATABASE_URL" in environ:
+            config.database_url = environ["RDP_DATABASE_URL"]
+        if "RDP_DEVICES" in environ:
+            config.devices = _list(environ["RDP_DEVICES"])
+        if "RDP_QUEUE_SIZE" in environ:
+            config.queue_size = int(environ["RDP_QUEUE_SIZE"])
+        if "RDP_BACKPRESSURE" in environ:
+            config.backpressure = environ["RDP_BACKPRESSURE"]
+        if "RDP_SPILL_PATH" in environ:
+            config.spill_path = environ["RDP_SPILL_PATH"]
+        if "RDP_COMMIT_SIZE" in environ:
+            config.commit_size = int(environ["RDP_COMMIT_SIZE"])
+        if "RDP_COMMIT_INTERVAL" in environ:
+            config.commit_interval = float(environ["RDP_COMMIT_INTERVAL"])
+        if "RDP_RECENT_CAPACITY" in environ:
+            config.recent_capacity = int(environ["RDP_RECENT_CAPACITY"])
+        if "RDP_RECENT_CAPACITIES" in environ:
+            config.recent_capacities = _capacities(environ["RDP_RECENT_CAPACITIES"])
+        if "RDP_SKIP_STORED" in environ:
+            config.skip_stored = _flag(environ["RDP_SKIP_STORED"])
+        if "RDP_PARTITIONING" in environ:
+            config.partitioning = _flag(environ["RDP_PARTITIONING"])
+        if "RDP_RETENTION_MONTHS" in environ:
+            config.retention_months = int(environ["RDP_RETENTION_MONTHS"])
+        if "RDP_SEAL_AFTER_DAYS" in environ:
+            config.seal_after_days = int(environ["RDP_SEAL_AFTER_DAYS"])
+        if "RDP_INGEST" in environ:
+            config.ingest = environ["RDP_INGEST"]
+        if "RDP_INGEST_LOCK" in environ:
+            config.ingest_lock = environ["RDP_INGEST_LOCK"]
+        if "RDP_VALUE_TYPE_TTL" in environ:
+            config.value_type_ttl = float(environ["RDP_VALUE_TYPE_TTL"])
+        if config.ingest not in INGEST_MODES:
+            raise ValueError("RDP_INGEST must be one of %s" % ", ".join(INGEST_MODES))
+        return config
+
+    def seal_after(self) -> int:
+        """Age in seconds of the values to be sealed, None if sealing is off"""
+        return None if self.seal_after_days is None else self.seal_after_days * 86400
+
+    def ingest_lock_path(self) -> str:
+        """The ingest lock file, by default the database file with .ingest.lock appended"""
+        if self.ingest_lock:
+            return self.ingest_lock
+        database = make_url(self.database_url).database
+        if database in (None, "", ":memory:"):
+            return os.path.join(tempfile.gettempdir(), "rdp.ingest.lock")
+        return database + ".ingest.lock"
@@ -1,3 +1,5 @@
-from .engine import create_engine
-from .model import Base, Value, ValueType
+from .engine import EngineProfile, create_async_engine, create_engine, create_engines
+from .model import Base, Value, ValueBackfill, ValueChunk, ValueRollup, ValueRollupState, ValueType
 from .crud import IntegrityError, Crud
+from .partition import MonthlyPartitions
+from .async_crud import AsyncCrud
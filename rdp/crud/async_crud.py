@@ -0,0 +1,292 @@
+import heapq
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, NoResultFound
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .crud import AGGREGATES, ROW_KEY, VALUE_KEY, Crud, _merge, _range, _sealed_values
+from .model import Value, ValueType
+
+
+async def _chain(
+    fetch: Callable[..., Awaitable[List]], sources: Sequence, limit: int = None
+) -> List:
+    """The values of the partitions read one after another, see crud._chain"""
+    values = []
+    for source in sources:
+        values.extend(await fetch(source, None if limit is None else limit - len(values)))
+        if limit is not None and len(values) >= limit:
+            break
+    return values
+
+
+async def _stream_chain(stream: Callable, sources: Sequence, limit: int = None) -> AsyncIterator:
+    """Like _chain, streaming the values"""
+    count = 0
+    for source in sources:
+        async for value in await stream(source, None if limit is None else limit - count):
+            count += 1
+            yield value
+        if limit is not None and count >= limit:
+            return
+
+
+async def _stream_merge(key: Callable, *streams: AsyncIterator) -> AsyncIterator:
+    """heapq.merge of ordered async iterators"""
+    heap = []
+    for index, stream in enumerate(streams):
+        async for value in stream:
+            heap.append((key(value), index, value, stream))
+            break
+    heapq.heapify(heap)
+    while heap:
+        _, index, value, stream = heap[0]
+        yield value
+        async for following in stream:
+            heapq.heapreplace(heap, (key(following), index, following, stream))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+async def _stream_list(values: List) -> AsyncIterator:
+    for value in values:
+        yield value
+
+
+class AsyncCrud:
+    """asyncio variant of the Crud queries
+
+    The statements are built by the given Crud and the value type cache is shared with it,
+    writes stay with the synchronous Crud.
+    """
+
+    def __init__(self, engine: AsyncEngine, crud: Crud):
+        self._engine = engine
+        self._crud = crud
+        self.IntegrityError = IntegrityError
+        self.NoResultFound = NoResultFound
+
+    @property
+    def value_type_cache(self):
+        return self._crud.value_type_cache
+
+    async def load_value_types(self) -> List[ValueType]:
+        """(Re)load the value type cache from the database
+
+        Returns:
+            List[ValueType]: List of all ValueType objects.
+        """
+        async with AsyncSession(self._engine) as session:
+            stmt = select(ValueType).order_by(ValueType.id)
+            value_types = (await session.scalars(stmt)).all()
+        self.value_type_cache.load(value_types)
+        return value_types
+
+    async def get_value_types(self) -> List[ValueType]:
+        """Get all configured value types
+
+        Returns:
+            List[ValueType]: List of ValueType objects.
+        """
+        value_types = self.value_type_cache.all()
+        if value_types is None:
+            value_types = await self.load_value_types()
+        return value_types
+
+    async def get_value_type(self, value_type_id: int) -> ValueType:
+        """Get a special ValueType
+
+        Args:
+            value_type_id (int): the primary key of the ValueType
+
+        Returns:
+            ValueType: The ValueType object
+        """
+        db_type = self.value_type_cache.get(value_type_id)
+        if db_type is None:
+            async with AsyncSession(self._engine) as session:
+                stmt = select(ValueType).where(ValueType.id == value_type_id)
+                db_type = (await session.scalars(stmt)).one()
+            self.value_type_cache.put(db_type)
+        return db_type
+
+    async def get_values(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
+    ) -> List[Value]:
+        """Get Values from database, see Crud.get_values
+
+        Returns:
+            List[Value]: Values ordered by time and id.
+        """
+        async with AsyncSession(self._engine) as session:
+
+            async def fetch(source, remaining: int = None) -> List[Value]:
+                stmt = self._crud._values_stmt(
+                    value_type_id, start, end, after, remaining, source=source
+                )
+                return (await session.scalars(stmt)).all()
+
+            connection = await session.connection()
+            sources = await connection.run_sync(
+                self._crud._value_sources, *_range(start, end, after)
+            )
+            value_table, *partitions = sources
+            parts = [await fetch(value_table, limit), await _chain(fetch, partitions, limit)]
+            sealed = await connection.run_sync(
+                self._crud._read_sealed, value_type_id, start, end, after, limit
+            )
+        parts.append(_sealed_values(sealed))
+        return _merge(parts, VALUE_KEY, limit)
+
+    async def get_value_rows(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
+    ) -> List[Tuple[int, int, int, float]]:
+        """Get values as plain tuples, see Crud.get_value_rows
+
+        Returns:
+            List[Tuple[int, int, int, float]]: (id, time, value type id, value) tuples ordered by
+                time and id.
+        """
+        async with self._engine.connect() as connection:
+
+            async def fetch(source, remaining: int = None) -> List[Tuple[int, int, int, float]]:
+                stmt = self._crud._values_stmt(
+                    value_type_id, start, end, after, remaining, rows=True, source=source
+                )
+                return list(map(tuple, await connection.execute(stmt)))
+
+            sources = await connection.run_sync(
+                self._crud._value_sources, *_range(start, end, after)
+            )
+            value_table, *partitions = sources
+            parts = [await fetch(value_table, limit), await _chain(fetch, partitions, limit)]
+            sealed = await connection.run_sync(
+                self._crud._read_sealed, value_type_id, start, end, after, limit
+            )
+        parts.append(sealed.tolist())
+        return _merge(parts, ROW_KEY, limit)
+
+    async def iter_values(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[Value]:
+        """Iterate over Values from database without loading the whole result, see Crud.iter_values
+
+        Yields:
+            Value: Values ordered by time and id.
+        """
+        async with AsyncSession(self._engine) as session:
+
+            def stream(source, remaining: int = None):
+                stmt = self._crud._values_stmt(
+                    value_type_id, start, end, after, remaining, source=source
+                )
+                return session.stream_scalars(stmt.execution_options(yield_per=chunk_size))
+
+            connection = await session.connection()
+            sealed = await connection.run_sync(
+                self._crud._read_sealed, value_type_id, start, end, after, limit
+            )
+            sources = await connection.run_sync(
+                self._crud._value_sources, *_range(start, end, after)
+            )
+            value_table, *partitions = sources
+            merged = _stream_merge(
+                VALUE_KEY,
+                await stream(value_table, limit),
+                _stream_chain(stream, partitions, limit),
+                _stream_list(_sealed_values(sealed)),
+            )
+            count = 0
+            async for value in merged:
+                if limit is not None and count >= limit:
+                    break
+                count += 1
+                yield value
+
+    async def get_recent_values(self, value_type_id: int, count: int = 1) -> List[Value]:
+        """Get the newest Values of a value type, see Crud.get_recent_values
+
+        Returns:
+            List[Value]: the newest count Values ordered by time and id.
+        """
+        async with AsyncSession(self._engine) as session:
+
+            async def fetch(source, remaining: int = None) -> List[Value]:
+                stmt = self._crud._recent_values_stmt(value_type_id, remaining, source)
+                return (await session.scalars(stmt)).all()
+
+            connection = await session.connection()
+            value_table, *partitions = await connection.run_sync(self._crud._value_sources)
+            # newest first, the partitions from the newest month on
+            parts = [await fetch(value_table, count), await _chain(fetch, partitions[::-1], count)]
+            values = list(heapq.merge(*parts, key=VALUE_KEY, reverse=True))[:count]
+            values.reverse()
+            sealed = await connection.run_sync(
+                self._crud._recent_sealed, value_type_id, count, values
+            )
+        if len(sealed):
+            values = _merge([values, _sealed_values(sealed)], VALUE_KEY)[-count:]
+        return values
+
+    async def get_backfill(self) -> Tuple[int, int]:
+        """Get the number of backfills and the newest time any of them wrote, see
+        Crud.get_backfill"""
+        async with self._engine.connect() as connection:
+            row = (await connection.execute(self._crud._backfill_stmt())).first()
+        return (0, None) if row is None else tuple(row)
+
+    async def get_aggregated_values(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        bucket: int = 60,
+        aggregates: Sequence[str] = AGGREGATES,
+        use_rollups: bool = True,
+    ) -> List[Dict]:
+        """Get Values aggregated into time buckets, see Crud.get_aggregated_values
+
+        Raises:
+            ValueError: Thrown on an unknown aggregate or a bucket width below one second
+
+        Returns:
+            List[Dict]: one dict per value type and bucket.
+        """
+        async with self._engine.connect() as connection:
+            if use_rollups and self._crud._rollups:
+                use_rollups = await connection.run_sync(self._crud._rollups_current)
+            tables = await connection.run_sync(self._crud._value_tables, start, end)
+            stmt = self._crud._aggregated_values_stmt(
+                value_type_id, start, end, bucket, aggregates, use_rollups, tables
+            )
+            aggregated = await connection.run_sync(
+                self._crud._aggregate_sealed,
+                value_type_id,
+                start,
+                end,
+                bucket,
+                aggregates,
+                use_rollups,
+                tables,
+            )
+            if aggregated is not None:
+                return aggregated
+            return [dict(row._mapping) for row in await connection.execute(stmt)]
@@ -0,0 +1,102 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .model import ValueType
+
+
+class ValueTypeCache:
+    """In memory id -> ValueType map.
+
+    The cached objects are detached from any session. Lookups are counted as hits or misses
+    so the effectiveness of the cache can be checked at runtime. Other processes may add or
+    rename value types, with a ttl every cached ValueType and the complete list expire ttl
+    seconds after they were cached and get reloaded from the database.
+
+    Args:
+        ttl (float, optional): seconds a cached ValueType is trusted, None trusts it forever.
+            Defaults to None.
+        clock (Callable[[], float], optional): the time source. Defaults to time.monotonic.
+    """
+
+    def __init__(self, ttl: float = None, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._value_types: Dict[int, ValueType] = {}
+        self._cached_at: Dict[int, float] = {}
+        self._complete = False
+        self._loaded_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._value_types)
+
+    def __contains__(self, value_type_id) -> bool:
+        return value_type_id in self._value_types
+
+    def _expired(self, cached_at: float) -> bool:
+        return self.ttl is not None and self._clock() - cached_at >= self.ttl
+
+    def get(self, value_type_id: int) -> Optional[ValueType]:
+        """Look up a ValueType
+
+        Args:
+            value_type_id (int): the primary key of the ValueType
+
+        Returns:
+            Optional[ValueType]: the cached ValueType or None on a cache miss.
+        """
+        with self._lock:
+            value_type = self._value_types.get(value_type_id)
+            if value_type is not None and self._expired(self._cached_at[value_type_id]):
+                del self._value_types[value_type_id]
+                value_type = None
+            if value_type is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value_type
+
+    def all(self) -> Optional[List[ValueType]]:
+        """Get all ValueTypes, only possible after the cache got loaded completely
+
+        Returns:
+            Optional[List[ValueType]]: ValueTypes ordered by id or None on a cache miss.
+        """
+        with self._lock:
+            if not self._complete or self._expired(self._loaded_at):
+                self._complete = False
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [self._value_types[key] for key in sorted(self._value_types)]
+
+    def load(self, value_types: Iterable[ValueType]) -> None:
+        """Replace the cache content with all ValueTypes of the database"""
+        with self._lock:
+            self._value_types = {value_type.id: value_type for value_type in value_types}
+            self._loaded_at = self._clock()
+            self._cached_at = dict.fromkeys(self._value_types, self._loaded_at)
+            self._complete = True
+
+    def put(self, value_type: ValueType) -> None:
+        """Add or replace a single ValueType"""
+        with self._lock:
+            self._value_types[value_type.id] = value_type
+            self._cached_at[value_type.id] = self._clock()
+
+    def invalidate(self, value_type_id: int = None) -> None:
+        """Drop a single ValueType or, if value_type_id is None, the whole cache"""
+        with self._lock:
+            if value_type_id is None:
+                self._value_types = {}
+            else:
+                self._value_types.pop(value_type_id, None)
+            self._complete = False
+
+    def stats(self) -> Dict[str, int]:
+        """Get the hit and miss counters and the number of cached ValueTypes"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._value_types)}
@@ -0,0 +1,355 @@
+from typing import Dict, Iterable, Iterator, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Connection, Select, Table, delete, func, insert, select, tuple_
+
+from .model import ValueChunk
+
+# values per sealed chunk
+CHUNK_SIZE = 1024
+# chunks sealed per transaction of seal
+SEAL_CHUNKS = 64
+# sealed values as returned by read: the columns of the value table
+VALUE_DTYPE = np.dtype(
+    [("id", np.int64), ("time", np.int64), ("value_type_id", np.int64), ("value", np.float64)]
+)
+
+_COLUMNS = np.arange(8)
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """LEB128 encode unsigned integers: 7 bits per byte, the high bit set on all but the last
+    byte"""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b""
+    sizes = np.ones(len(values), dtype=np.int64)
+    for size in range(1, 10):
+        sizes += values >= np.uint64(1 << 7 * size)
+    width = int(sizes.max())
+    shifts = np.arange(width, dtype=np.uint64) * np.uint64(7)
+    groups = (values[:, None] >> shifts) & np.uint64(0x7F)
+    positions = np.arange(width)
+    groups[positions < sizes[:, None] - 1] |= np.uint64(0x80)
+    return groups[positions < sizes[:, None]].astype(np.uint8).tobytes()
+
+
+def decode_varints(data: bytes) -> np.ndarray:
+    """Decode the unsigned integers written by encode_varints"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    positions = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    groups = (data & 0x7F).astype(np.uint64) << (positions * 7).astype(np.uint64)
+    return np.bitwise_or.reduceat(groups, starts)
+
+
+def encode_integers(values: np.ndarray) -> bytes:
+    """Delta-of-delta encode integers, e.g. the times of a series
+
+    The first integer and the first delta are followed by the changes of the delta, zigzag
+    and varint encoded. Regularly sampled times take one byte each.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    deltas = np.diff(values)
+    return encode_varints(_zigzag(np.concatenate((values[:1], deltas[:1], np.diff(deltas)))))
+
+
+def decode_integers(data: bytes) -> np.ndarray:
+    """Decode the integers written by encode_integers"""
+    encoded = _unzigzag(decode_varints(data))
+    if not len(encoded):
+        return encoded
+    return encoded[0] + np.concatenate(([0], np.cumsum(np.cumsum(encoded[1:]))))
+
+
+def encode_floats(values: np.ndarray) -> bytes:
+    """XOR encode floats, the byte aligned variant of the Gorilla value compression
+
+    Every value is XORed with its predecessor. Of the XOR only the bytes between the leading
+    and the trailing zero bytes are stored, preceded by one header byte per value holding the
+    number of leading zero bytes and of stored bytes. Repeated values take only the header
+    byte, slowly changing values keep their sign and exponent bytes out of the data.
+    """
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    xors = bits ^ np.concatenate((np.zeros(1, dtype=np.uint64), bits[:-1]))
+    xor_bytes = xors.astype(">u8").view(np.uint8).reshape(-1, 8)
+    nonzero = xor_bytes != 0
+    any_nonzero = nonzero.any(axis=1)
+    leading = np.where(any_nonzero, nonzero.argmax(axis=1), 0)
+    trailing = np.where(any_nonzero, nonzero[:, ::-1].argmax(axis=1), 8)
+    lengths = 8 - leading - trailing
+    headers = (leading << 4 | lengths).astype(np.uint8)
+    stored = (_COLUMNS >= leading[:, None]) & (_COLUMNS < (leading + lengths)[:, None])
+    return headers.tobytes() + xor_bytes[stored].tobytes()
+
+
+def decode_floats(data: bytes, count: int) -> np.ndarray:
+    """Decode count floats written by encode_floats"""
+    headers = np.frombuffer(data, dtype=np.uint8, count=count)
+    leading = (headers >> 4).astype(np.int64)
+    lengths = (headers & 0x0F).astype(np.int64)
+    xor_bytes = np.zeros((count, 8), dtype=np.uint8)
+    stored = (_COLUMNS >= leading[:, None]) & (_COLUMNS < (leading + lengths)[:, None])
+    xor_bytes[stored] = np.frombuffer(data, dtype=np.uint8, offset=count)
+    xors = xor_bytes.view(">u8").reshape(count).astype(np.uint64)
+    return np.bitwise_xor.accumulate(xors).view(np.float64)
+
+
+def encode_chunk(values: np.ndarray) -> Dict:
+    """The value_chunk row of values of one value type
+
+    Args:
+        values (np.ndarray): VALUE_DTYPE values ordered by time and id.
+
+    Returns:
+        Dict: the row.
+    """
+    return {
+        "value_type_id": int(values["value_type_id"][0]),
+        "start_time": int(values["time"][0]),
+        "end_time": int(values["time"][-1]),
+        "count": len(values),
+        "id_data": encode_integers(values["id"]),
+        "time_data": encode_integers(values["time"]),
+        "value_data": encode_floats(values["value"]),
+    }
+
+
+def decode_chunk(row) -> np.ndarray:
+    """The VALUE_DTYPE values of a value_chunk row"""
+    values = np.empty(row.count, dtype=VALUE_DTYPE)
+    values["id"] = decode_integers(row.id_data)
+    values["time"] = decode_integers(row.time_data)
+    values["value_type_id"] = row.value_type_id
+    values["value"] = decode_floats(row.value_data, row.count)
+    return values
+
+
+def _filter(
+    values: np.ndarray, start: int = None, end: int = None, after: Tuple[int, int] = None
+) -> np.ndarray:
+    mask = np.ones(len(values), dtype=bool)
+    if start is not None:
+        mask &= values["time"] >= start
+    if end is not None:
+        mask &= values["time"] <= end
+    if after is not None:
+        mask &= (values["time"] > after[0]) | (
+            (values["time"] == after[0]) & (values["id"] > after[1])
+        )
+    return values[mask]
+
+
+def _sorted(parts) -> np.ndarray:
+    if not parts:
+        return np.empty(0, dtype=VALUE_DTYPE)
+    values = np.concatenate(parts)
+    return values[np.lexsort((values["id"], values["time"]))]
+
+
+def _chunks_stmt(value_type_id: int = None, start: int = None, end: int = None) -> Select:
+    """The chunks overlapping a range, ordered by their first time"""
+    chunks = ValueChunk.__table__
+    stmt = select(chunks).order_by(chunks.c.start_time)
+    if value_type_id is not None:
+        stmt = stmt.where(chunks.c.value_type_id == value_type_id)
+    if start is not None:
+        stmt = stmt.where(chunks.c.end_time >= start)
+    elif value_type_id is None:
+        # from the oldest chunk on, so the chunk index and not the table is walked
+        stmt = stmt.where(
+            chunks.c.end_time >= select(func.min(chunks.c.end_time)).scalar_subquery()
+        )
+    if end is not None:
+        stmt = stmt.where(chunks.c.start_time <= end)
+    return stmt
+
+
+def scan(
+    connection: Connection, value_type_id: int = None, start: int = None, end: int = None
+) -> Iterator[np.ndarray]:
+    """Decode the chunks overlapping a range one by one, e.g. to process all sealed values
+
+    Yields:
+        np.ndarray: the VALUE_DTYPE values of a chunk between start and end.
+    """
+    for row in connection.execute(_chunks_stmt(value_type_id, start, end)):
+        yield _filter(decode_chunk(row), start, end)
+
+
+def sealed_keys(connection: Connection, keys: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+    """The (time, value type id) keys which are sealed already, to keep the values unique
+
+    Only the chunks overlapping the time range of the keys of a type are decoded, for newly
+    measured values this is one index lookup per type.
+
+    Args:
+        connection (Connection): the connection.
+        keys (Iterable[Tuple[int, int]]): (time, value type id) keys of values to be stored.
+
+    Returns:
+        Set[Tuple[int, int]]: the keys held by a chunk.
+    """
+    keys = set(keys)
+    ranges: Dict[int, Tuple[int, int]] = {}
+    for value_time, value_type_id in keys:
+        start, end = ranges.get(value_type_id, (value_time, value_time))
+        ranges[value_type_id] = (min(start, value_time), max(end, value_time))
+    sealed = set()
+    for value_type_id, (start, end) in ranges.items():
+        for values in scan(connection, value_type_id, start, end):
+            sealed.update((value_time, value_type_id) for value_time in values["time"].tolist())
+    return sealed & keys
+
+
+def read(
+    connection: Connection,
+    value_type_id: int = None,
+    start: int = None,
+    end: int = None,
+    after: Tuple[int, int] = None,
+    limit: int = None,
+) -> np.ndarray:
+    """The sealed values between start and end, the filters are the same as for Crud.get_values
+
+    Only the chunks overlapping the range are decoded. With a limit the chunks are decoded
+    in the order of their first time, until no further chunk can hold one of the first
+    limit values.
+
+    Args:
+        connection (Connection): the connection.
+
+    Returns:
+        np.ndarray: VALUE_DTYPE values ordered by time and id.
+    """
+    if after is not None and (start is None or after[0] > start):
+        stmt = _chunks_stmt(value_type_id, after[0], end)
+    else:
+        stmt = _chunks_stmt(value_type_id, start, end)
+    parts, count, bound = [], 0, None
+    result = connection.execute(stmt)
+    try:
+        for row in result:
+            if bound is not None and row.start_time > bound:
+                break
+            values = _filter(decode_chunk(row), start, end, after)
+            parts.append(values)
+            count += len(values)
+            if limit is not None and count >= limit:
+                # the time of the limit-th value so far, later chunks starting after it add nothing
+                bound = np.partition(np.concatenate([part["time"] for part in parts]), limit - 1)[
+                    limit - 1
+                ]
+    finally:
+        result.close()
+    return _sorted(parts)[:limit]
+
+
+def read_last(
+    connection: Connection, value_type_id: int, count: int, start: int = None, end: int = None
+) -> np.ndarray:
+    """The newest count sealed values of a value type between start and end
+
+    Args:
+        connection (Connection): the connection.
+        value_type_id (int): the value type.
+        count (int): maximum number of values.
+        start (int, optional): If set, only values with a timestamp as least as big as start are
+            returned. Defaults to None.
+        end (int, optional): If set, only values with a timestamp as most as big as end are
+            returned. Defaults to None.
+
+    Returns:
+        np.ndarray: VALUE_DTYPE values ordered by time and id.
+    """
+    if count < 1:
+        return np.empty(0, dtype=VALUE_DTYPE)
+    chunks = ValueChunk.__table__
+    stmt = (
+        select(chunks)
+        .where(chunks.c.value_type_id == value_type_id)
+        .order_by(chunks.c.end_time.desc())
+    )
+    if start is not None:
+        stmt = stmt.where(chunks.c.end_time >= start)
+    if end is not None:
+        stmt = stmt.where(chunks.c.start_time <= end)
+    parts, total, bound = [], 0, None
+    result = connection.execute(stmt)
+    try:
+        for row in result:
+            newest = row.end_time if end is None else min(row.end_time, end)
+            if bound is not None and newest < bound:
+                break
+            values = _filter(decode_chunk(row), start, end)
+            parts.append(values)
+            total += len(values)
+            if total >= count:
+                times = np.concatenate([part["time"] for part in parts])
+                bound = np.partition(times, total - count)[total - count]
+    finally:
+        result.close()
+    return _sorted(parts)[-count:]
+
+
+def seal(
+    connection: Connection,
+    table: Table,
+    value_type_id: int,
+    before: int,
+    chunk_size: int = CHUNK_SIZE,
+    keep_id: int = None,
+) -> int:
+    """Move the oldest values of a type before a time from a value table into chunks
+
+    Up to SEAL_CHUNKS full chunks are written, the values left over stay in the table until
+    enough older values add up for a full chunk.
+
+    Args:
+        connection (Connection): connection with an open transaction.
+        table (Table): the value table or a partition.
+        value_type_id (int): the value type.
+        before (int): unix time stamp, only older values are sealed.
+        chunk_size (int, optional): values per chunk. Defaults to CHUNK_SIZE.
+        keep_id (int, optional): If set, the value with this id stays in the table. Defaults to
+            None.
+
+    Returns:
+        int: number of sealed values, 0 once less than a full chunk is left.
+    """
+    conditions = [table.c.value_type_id == value_type_id, table.c.time < before]
+    if keep_id is not None:
+        conditions.append(table.c.id != keep_id)
+    stmt = (
+        select(table.c.id, table.c.time, table.c.value_type_id, table.c.value)
+        .where(*conditions)
+        .order_by(table.c.time, table.c.id)
+        .limit(chunk_size * SEAL_CHUNKS)
+    )
+    values = np.fromiter(map(tuple, connection.execute(stmt)), dtype=VALUE_DTYPE)
+    values = values[: len(values) // chunk_size * chunk_size]
+    if not len(values):
+        return 0
+    connection.execute(
+        insert(ValueChunk),
+        [
+            encode_chunk(values[offset : offset + chunk_size])
+            for offset in range(0, len(values), chunk_size)
+        ],
+    )
+    last = (int(values["time"][-1]), int(values["id"][-1]))
+    connection.execute(
+        delete(table).where(*conditions, tuple_(table.c.time, table.c.id) <= tuple_(*last))
+    )
+    return len(values)
@@ -1,20 +1,229 @@
+import heapq
 import logging
-from typing import List
+import time
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
-from sqlalchemy import select
+import numpy as np
+from sqlalchemy import (
+    Select,
+    Table,
+    and_,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError, NoResultFound
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 
-from .model import Base, Value, ValueType
+from rdp.analysis import lttb
+
+from .cache import ValueTypeCache
+from .model import Base, Value, ValueBackfill, ValueChunk, ValueRollup, ValueRollupState, ValueType
+from .partition import MonthlyPartitions
+from . import chunk, rollup
+
+
+AGGREGATES = ("min", "max", "mean", "count", "last")
+# one series as fetched by Crud.get_series
+SERIES_DTYPE = np.dtype([("time", np.int64), ("value", np.float64)])
+# sort keys of values from the tables and from the sealed chunks
+VALUE_KEY = attrgetter("time", "id")
+ROW_KEY = itemgetter(1, 0)
+
+
+def _range(start: int = None, end: int = None, after: Tuple[int, int] = None) -> Tuple[int, int]:
+    """The time range read by a query, narrowed by its keyset cursor"""
+    if after is not None and (start is None or after[0] > start):
+        start = after[0]
+    return start, end
+
+
+def _sealed_values(sealed: np.ndarray) -> List[Value]:
+    """Value objects of sealed values, they belong to no session"""
+    return [
+        Value(id=value_id, time=value_time, value_type_id=value_type_id, value=value)
+        for value_id, value_time, value_type_id, value in sealed.tolist()
+    ]
+
+
+def _merge(parts: Iterable[Iterable], key: Callable, limit: int = None) -> List:
+    """Merge the values read from the tables and the sealed values, every part ordered by key"""
+    return list(islice(heapq.merge(*parts, key=key), limit))
+
+
+def _chain(fetch: Callable, sources: Sequence, limit: int = None) -> Iterator:
+    """The values of the partitions, read one partition after another up to limit values
+
+    The months of the partitions do not overlap, so their values come out ordered. The value
+    table may hold values of any time and has to be merged with them.
+
+    Args:
+        fetch (Callable): gets the ordered values of a source, at most remaining if set.
+        sources (Sequence): the partitions in the order of their values.
+        limit (int, optional): If set, at most this many values are read. Defaults to None.
+    """
+    count = 0
+    for source in sources:
+        for value in fetch(source, None if limit is None else limit - count):
+            count += 1
+            yield value
+        if limit is not None and count >= limit:
+            return
+
+
+def _aggregate(values: np.ndarray, bucket: int, aggregates: Sequence[str]) -> List[Dict]:
+    """Aggregate chunk.VALUE_DTYPE values into buckets like Crud.get_aggregated_values"""
+    if not len(values):
+        return []
+    values = values[np.lexsort((values["id"], values["time"], values["value_type_id"]))]
+    bucket_times = values["time"] // bucket * bucket
+    changes = (np.diff(values["value_type_id"]) != 0) | (np.diff(bucket_times) != 0)
+    starts = np.flatnonzero(np.concatenate(([True], changes)))
+    counts = np.diff(np.append(starts, len(values)))
+    columns = {
+        "value_type_id": values["value_type_id"][starts],
+        "time": bucket_times[starts],
+        "min": np.minimum.reduceat(values["value"], starts),
+        "max": np.maximum.reduceat(values["value"], starts),
+        "mean": np.add.reduceat(values["value"], starts) / counts,
+        "count": counts,
+        "last": values["value"][starts + counts - 1],
+    }
+    names = ["value_type_id", "time"] + [name for name in aggregates if name != "last"]
+    if "last" in aggregates:
+        names.append("last")
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
 
 
 class Crud:
-    def __init__(self, engine):
+    def __init__(
+        self,
+        engine,
+        rollups: bool = True,
+        read_engine=None,
+        partitions: MonthlyPartitions = None,
+        seal_after: int = None,
+        value_type_ttl: float = None,
+    ):
         self._engine = engine
+        self._read_engine = read_engine if read_engine is not None else engine
+        self._rollups = rollups
+        # with partitions new values go to one table per month, see MonthlyPartitions
+        self._partitions = partitions
+        # values older than seal_after seconds get compressed into chunks by apply_sealing
+        self._seal_after = seal_after
+        self._created_partitions = set()
+        self._sources = {Value.__table__: Value}
         self.IntegrityError = IntegrityError
         self.NoResultFound = NoResultFound
+        # other processes may add or rename value types, see ValueTypeCache
+        self.value_type_cache = ValueTypeCache(value_type_ttl)
 
+        inspector = inspect(self._engine)
+        upgrade = inspector.has_table(Value.__tablename__) and not inspector.has_table(
+            ValueRollup.__tablename__
+        )
         Base.metadata.create_all(self._engine)
+        self._create_indexes(Base.metadata.sorted_tables)
+        if upgrade:
+            # a database created before the rollups existed, rebuild_stale_rollups fills them
+            with self._engine.begin() as connection:
+                self._mark_rollups_stale(connection)
+        # without partitions of its own the partitions found in the database are read all the same
+        self._layout = partitions if partitions is not None else MonthlyPartitions()
+        self._found_keys: List[int] = []
+        with self._engine.connect() as connection:
+            if partitions is None:
+                self._found_keys = self._layout.keys(connection)
+            self._has_chunks = (
+                connection.execute(select(ValueChunk.id).limit(1)).first() is not None
+            )
+
+    def _create_indexes(self, tables: Sequence[Table]) -> None:
+        """Add indexes introduced after a database was created, create_all skips existing tables"""
+        with self._engine.begin() as connection:
+            for table in tables:
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+
+    def _chunked(self) -> bool:
+        """Whether the reads and writes have to look into value_chunk, skipped while nothing is
+        sealed
+
+        The process sealing the values runs with the same seal_after, a Crud without seal_after
+        knows of the chunks found on its creation or sealed by itself.
+        """
+        return self._seal_after is not None or self._has_chunks
+
+    def _read_sealed(self, connection, *args, **kwargs) -> np.ndarray:
+        """chunk.read if values may be sealed, else no values"""
+        if not self._chunked():
+            return np.empty(0, dtype=chunk.VALUE_DTYPE)
+        return chunk.read(connection, *args, **kwargs)
+
+    def _value_tables(self, connection, start: int = None, end: int = None) -> List[Table]:
+        """The tables holding the values between start and end, oldest first
+
+        The value table, which holds the values stored without partitions, is followed by the
+        partitions overlapping the range. A Crud without partitions reads the partitions found
+        in the database on its creation, e.g. rdp-rebuild-rollups run without RDP_PARTITIONING.
+        """
+        keys = self._found_keys if self._partitions is None else self._partitions.keys(connection)
+        keys = self._layout.overlapping(keys, start, end)
+        return [Value.__table__] + [self._layout.table(key) for key in keys]
+
+    def _value_sources(self, connection, start: int = None, end: int = None) -> List:
+        """Like _value_tables, but the Value entity mapped onto every table for ORM queries"""
+        sources = []
+        for table in self._value_tables(connection, start, end):
+            source = self._sources.get(table)
+            if source is None:
+                source = self._sources[table] = aliased(Value, table, adapt_on_names=True)
+            sources.append(source)
+        return sources
+
+    def _route(
+        self, connection, rows: Sequence, time_of: Callable = itemgetter("time")
+    ) -> List[Tuple[Table, Sequence]]:
+        """Split rows to be inserted by the table they belong to, creating missing partitions"""
+        if self._partitions is None:
+            return [(Value.__table__, rows)]
+        groups = []
+        for key, group in self._partitions.split(rows, time_of).items():
+            if key not in self._created_partitions:
+                self._partitions.create(connection, key)
+                self._created_partitions.add(key)
+            groups.append((self._partitions.table(key), group))
+        return groups
+
+    def load_value_types(self) -> List[ValueType]:
+        """(Re)load the value type cache from the database
+
+        Returns:
+            List[ValueType]: List of all ValueType objects.
+        """
+        with Session(self._read_engine) as session:
+            stmt = select(ValueType).order_by(ValueType.id)
+            value_types = session.scalars(stmt).all()
+        self.value_type_cache.load(value_types)
+        return value_types
+
+    def invalidate_value_type(self, value_type_id: int = None) -> None:
+        """Drop a value type from the cache, it gets reloaded on its next use
+
+        Args:
+            value_type_id (int, optional): ValueType id to be dropped (if None the whole cache is
+                dropped). Defaults to None.
+        """
+        self.value_type_cache.invalidate(value_type_id)
 
     def add_or_update_value_type(
         self,
@@ -49,7 +258,9 @@ class Crud:
                 db_type.type_unit = "UNIT_%d" % value_type_id
             session.add_all([db_type])
             session.commit()
-            return db_type
+            session.refresh(db_type)
+        self.value_type_cache.put(db_type)
+        return db_type
 
     def add_value(self, value_time: int, value_type: int, value_value: float) -> None:
         """Add a measurement point to the database.
@@ -59,27 +270,308 @@ class Crud:
             value_type (int): Valuetype id of the given value. 
             value_value (float): The measurement value as float.
         """        
+        if self._partitions is not None:
+            try:
+                self.insert_values([(value_time, value_type, value_value)])
+            except IntegrityError:
+                logging.error("Integrity")
+                raise
+            return
+        if self.value_type_cache.get(value_type) is None:
+            self.add_or_update_value_type(value_type)
         with Session(self._engine) as session:
-            stmt = select(ValueType).where(ValueType.id == value_type)
-            db_type = self.add_or_update_value_type(value_type)
-            db_value = Value(time=value_time, value=value_value, value_type=db_type)
+            db_value = Value(time=value_time, value=value_value, value_type_id=value_type)
 
-            session.add_all([db_type, db_value])
+            session.add_all([db_value])
             try:
+                session.flush()
+                self._unsealed(session.connection(), [(value_time, value_type)], itemgetter(0, 1))
+                if self._rollups:
+                    rollup.update_rollups(
+                        session.connection(), [(value_time, value_type, value_value)]
+                    )
+                else:
+                    self._mark_rollups_stale(session.connection())
+                self._record_backfill(session.connection(), value_time)
                 session.commit()
             except IntegrityError:
                 logging.error("Integrity")
                 raise
 
+    def add_values(
+        self, values: Iterable[Tuple[int, int, float]], skip_duplicates: bool = False
+    ) -> int:
+        """Add many measurement points to the database in one transaction.
+
+        Missing value types are created with default name and unit. The rows are written with
+        a single executemany insert, if one of them violates a constraint nothing is written.
+        Values with the time and value type of a sealed value count as stored already.
+
+        Args:
+            values (Iterable[Tuple[int, int, float]]): (time, value type id, value) tuples.
+            skip_duplicates (bool, optional): If set, values with an already stored time and value
+                type are skipped (ON CONFLICT DO NOTHING) instead of failing the transaction.
+                Defaults to False.
+
+        Returns:
+            int: number of values written.
+        """
+        return len(self.insert_values(values, skip_duplicates))
+
+    def _ensure_value_types(self, connection, type_ids: Iterable[int]) -> List[ValueType]:
+        """Create the value types which are neither cached nor stored, with default name and unit
+
+        Returns:
+            List[ValueType]: the uncached value types, to be put into the cache after the commit.
+        """
+        missing = {type_id for type_id in type_ids if self.value_type_cache.get(type_id) is None}
+        if not missing:
+            return []
+        stmt = select(ValueType.id, ValueType.type_name, ValueType.type_unit).where(
+            ValueType.id.in_(missing)
+        )
+        db_types = [ValueType(**row._mapping) for row in connection.execute(stmt)]
+        missing.difference_update(db_type.id for db_type in db_types)
+        if missing:
+            new_types = [
+                {"id": type_id, "type_name": "TYPE_%d" % type_id, "type_unit": "UNIT_%d" % type_id}
+                for type_id in sorted(missing)
+            ]
+            connection.execute(insert(ValueType), new_types)
+            db_types.extend(ValueType(**new_type) for new_type in new_types)
+        return db_types
+
+    def insert_values(
+        self,
+        values: Iterable[Tuple[int, int, float]],
+        skip_duplicates: bool = False,
+        backfill: bool = True,
+    ) -> List[Tuple[int, int, int, float]]:
+        """Add many measurement points like add_values and return the stored rows.
+
+        With partitions the values are routed to the partition of their month.
+
+        Args:
+            values (Iterable[Tuple[int, int, float]]): (time, value type id, value) tuples.
+            skip_duplicates (bool, optional): see add_values. Defaults to False.
+            backfill (bool, optional): If set, the write is counted as a backfill, see
+                get_backfill. The ingest clears it, its values reach the recent value buffers
+                directly. Defaults to True.
+
+        Returns:
+            List[Tuple[int, int, int, float]]: (id, time, value type id, value) of the stored
+                values in input order, skipped duplicates are left out.
+        """
+        rows = [
+            {"time": value_time, "value_type_id": value_type, "value": value_value}
+            for value_time, value_type, value_value in values
+        ]
+        if not rows:
+            return []
+        with self._engine.begin() as connection:
+            db_types = self._ensure_value_types(connection, {row["value_type_id"] for row in rows})
+            rows = self._unsealed(
+                connection, rows, itemgetter("time", "value_type_id"), skip_duplicates
+            )
+            stored = []
+            groups = self._route(connection, rows) if rows else []
+            for table, group in groups:
+                stmt = sqlite_insert(table)
+                if skip_duplicates:
+                    stmt = stmt.on_conflict_do_nothing()
+                stmt = stmt.returning(
+                    table.c.id,
+                    table.c.time,
+                    table.c.value_type_id,
+                    table.c.value,
+                    sort_by_parameter_order=True,
+                )
+                stored.extend(tuple(row) for row in connection.execute(stmt, group))
+            if len(groups) > 1:
+                order = {
+                    (row["time"], row["value_type_id"]): index for index, row in enumerate(rows)
+                }
+                stored.sort(key=lambda row: order[row[1], row[2]])
+            if self._rollups:
+                # only the stored rows count, skipped duplicates are in the rollups already
+                rollup.update_rollups(connection, (row[1:] for row in stored))
+            elif stored:
+                self._mark_rollups_stale(connection)
+            if backfill and stored:
+                self._record_backfill(connection, max(row[1] for row in stored))
+        for db_type in db_types:
+            self.value_type_cache.put(db_type)
+        return stored
+
+    def bulk_load(
+        self,
+        chunks: Iterable[Sequence[Tuple[int, int, float]]],
+        defer_indexes: bool = True,
+        progress: Callable[[int, int], None] = None,
+    ) -> int:
+        """Load large amounts of measurement points, e.g. to backfill recorded device dumps.
+
+        Every chunk is written in one transaction with a plain executemany INSERT OR IGNORE, values
+        already stored or sealed are skipped. With defer_indexes the secondary indexes are dropped
+        before and rebuilt after the load, instead of being updated row by row. The rollups of the
+        loaded time range are rebuilt once at the end.
+
+        Args:
+            chunks (Iterable[Sequence[Tuple[int, int, float]]]): chunks of (time, value type id,
+                value) tuples.
+            defer_indexes (bool, optional): If set, secondary indexes are rebuilt after the load.
+                Defaults to True.
+            progress (Callable[[int, int], None], optional): called after every chunk with the
+                number of values read and stored so far. Defaults to None.
+
+        Returns:
+            int: number of values stored.
+        """
+        deferred: List[Table] = []
+        read = stored = 0
+        start = end = None
+        try:
+            for batch in chunks:
+                if not len(batch):
+                    continue
+                with self._engine.begin() as connection:
+                    db_types = self._ensure_value_types(connection, {row[1] for row in batch})
+                    unsealed = self._unsealed(
+                        connection, batch, itemgetter(0, 1), skip_duplicates=True
+                    )
+                    for table, rows in (
+                        self._route(connection, unsealed, itemgetter(0)) if unsealed else []
+                    ):
+                        if defer_indexes and table not in deferred:
+                            for index in table.indexes:
+                                index.drop(connection, checkfirst=True)
+                            deferred.append(table)
+                        result = connection.exec_driver_sql(
+                            "INSERT OR IGNORE INTO %s (time, value_type_id, value)"
+                            " VALUES (?, ?, ?)"
+                            % table.name,
+                            rows,
+                        )
+                        stored += result.rowcount
+                    if not self._rollups:
+                        self._mark_rollups_stale(connection)
+                    self._record_backfill(connection, max(row[0] for row in batch))
+                for db_type in db_types:
+                    self.value_type_cache.put(db_type)
+                read += len(batch)
+                times = [row[0] for row in batch]
+                start = min(times) if start is None else min(start, min(times))
+                end = max(times) if end is None else max(end, max(times))
+                if progress is not None:
+                    progress(read, stored)
+        finally:
+            with self._engine.begin() as connection:
+                for table in deferred:
+                    for index in table.indexes:
+                        index.create(connection, checkfirst=True)
+        if self._rollups and stored:
+            self.rebuild_rollups(start, end)
+        return stored
+
+    def _unsealed(
+        self, connection, rows: Sequence, key: Callable, skip_duplicates: bool = False
+    ) -> Sequence:
+        """The rows to be inserted whose time and value type is not sealed, sealed values stay
+        unique
+
+        The unique constraint of the value tables does not reach into the chunks, this check
+        takes its place for them.
+
+        Raises:
+            IntegrityError: Thrown on a sealed key unless skip_duplicates is set
+        """
+        if not self._chunked():
+            return rows
+        sealed = chunk.sealed_keys(connection, map(key, rows))
+        if not sealed:
+            return rows
+        if not skip_duplicates:
+            raise IntegrityError(
+                "INSERT INTO value",
+                [key(row) for row in rows if key(row) in sealed],
+                Exception("value is sealed"),
+            )
+        return [row for row in rows if key(row) not in sealed]
+
+    @staticmethod
+    def _record_backfill(connection, end_time: int) -> None:
+        """Count a write of values which bypasses the ingest, in its transaction"""
+        stmt = sqlite_insert(ValueBackfill).values(id=1, count=1, end_time=end_time)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ValueBackfill.id],
+            set_={
+                "count": ValueBackfill.count + 1,
+                "end_time": func.max(ValueBackfill.end_time, stmt.excluded.end_time),
+            },
+        )
+        connection.execute(stmt)
+
+    @staticmethod
+    def _mark_rollups_stale(connection) -> None:
+        """Count a write of values the rollups miss, in its transaction"""
+        stmt = sqlite_insert(ValueRollupState).values(id=1, missed=1, rebuilt=0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ValueRollupState.id], set_={"missed": ValueRollupState.missed + 1}
+        )
+        connection.execute(stmt)
+
+    @staticmethod
+    def _rollup_state_stmt() -> Select:
+        return select(ValueRollupState.missed, ValueRollupState.rebuilt).where(
+            ValueRollupState.id == 1
+        )
+
+    def _rollups_current(self, connection) -> bool:
+        """Whether the last full rebuild covered every write the rollups missed"""
+        row = connection.execute(self._rollup_state_stmt()).first()
+        return row is None or row.missed <= row.rebuilt
+
+    def rollups_stale(self) -> bool:
+        """Whether values were written without updating the rollups since their last full rebuild
+
+        A Crud without rollups or a database created before them leaves the rollups stale.
+        The aggregations then read the raw values until rebuild_rollups or
+        rebuild_stale_rollups brought them up to date.
+
+        Returns:
+            bool: True if the rollups miss values.
+        """
+        with self._read_engine.connect() as connection:
+            return not self._rollups_current(connection)
+
+    def get_backfill(self) -> Tuple[int, int]:
+        """Get the number of backfills and the newest time any of them wrote
+
+        Values written by bulk_load, add_value or add_values, in this or in another process,
+        bypass the recent value buffers of the ingest. A buffer which saw a smaller count no
+        longer knows all stored values up to the returned time, see RecentValues.invalidate.
+
+        Returns:
+            Tuple[int, int]: (count, newest time), (0, None) if nothing was backfilled.
+        """
+        with self._read_engine.connect() as connection:
+            row = connection.execute(self._backfill_stmt()).first()
+        return (0, None) if row is None else tuple(row)
+
+    @staticmethod
+    def _backfill_stmt() -> Select:
+        return select(ValueBackfill.count, ValueBackfill.end_time).where(ValueBackfill.id == 1)
+
     def get_value_types(self) -> List[ValueType]:
         """Get all configured value types
 
         Returns:
             List[ValueType]: List of ValueType objects. 
         """
-        with Session(self._engine) as session:
-            stmt = select(ValueType)
-            return session.scalars(stmt).all()
+        value_types = self.value_type_cache.all()
+        if value_types is None:
+            value_types = self.load_value_types()
+        return value_types
 
     def get_value_type(self, value_type_id: int) -> ValueType:
         """Get a special ValueType
@@ -90,12 +582,64 @@ class Crud:
         Returns:
             ValueType: The ValueType object
         """
-        with Session(self._engine) as session:
-            stmt = select(ValueType).where(ValueType.id == value_type_id)
-            return session.scalars(stmt).one()
+        db_type = self.value_type_cache.get(value_type_id)
+        if db_type is None:
+            with Session(self._read_engine) as session:
+                stmt = select(ValueType).where(ValueType.id == value_type_id)
+                db_type = session.scalars(stmt).one()
+            self.value_type_cache.put(db_type)
+        return db_type
+
+    def _filter_values(
+        self,
+        stmt: Select,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        source=Value,
+    ) -> Select:
+        """Apply the common value filters to a statement selecting from the value table (or
+        source)"""
+        if value_type_id is not None:
+            stmt = stmt.where(source.value_type_id == value_type_id)
+        if start is not None:
+            stmt = stmt.where(source.time >= start)
+        if end is not None:
+            stmt = stmt.where(source.time <= end)
+        return stmt
+
+    def _values_stmt(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
+        rows: bool = False,
+        source=Value,
+    ) -> Select:
+        if rows:
+            stmt = select(source.id, source.time, source.value_type_id, source.value)
+        else:
+            stmt = select(source)
+        stmt = self._filter_values(stmt, value_type_id, start, end, source)
+        if after is not None:
+            # the plain time bound lets the cursor seek into the time indexes
+            stmt = stmt.where(
+                source.time >= after[0], tuple_(source.time, source.id) > tuple_(*after)
+            )
+        stmt = stmt.order_by(source.time, source.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
 
     def get_values(
-        self, value_type_id: int = None, start: int = None, end: int = None
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
     ) -> List[Value]:
         """Get Values from database.
 
@@ -105,20 +649,685 @@ class Crud:
             value_type_id (int, optional): If set, only value of this given type will be returned. Defaults to None.
             start (int, optional): If set, only values with a timestamp as least as big as start are returned. Defaults to None.
             end (int, optional): If set, only values with a timestamp as most as big as end are returned. Defaults to None.
+            after (Tuple[int, int], optional): Keyset cursor, if set only values ordered after this
+                (time, id) pair are returned. Defaults to None.
+            limit (int, optional): If set, at most this many values are returned. Defaults to None.
 
         Returns:
-            List[Value]: _description_
+            List[Value]: Values ordered by time and id.
         """
-        with Session(self._engine) as session:
-            stmt = select(Value)
+        with Session(self._read_engine) as session:
+
+            def fetch(source, remaining: int = None) -> List[Value]:
+                stmt = self._values_stmt(
+                    value_type_id, start, end, after, remaining, source=source
+                )
+                return session.scalars(stmt).all()
+
+            value_table, *partitions = self._value_sources(
+                session.connection(), *_range(start, end, after)
+            )
+            parts = [fetch(value_table, limit), list(_chain(fetch, partitions, limit))]
+            sealed = self._read_sealed(
+                session.connection(), value_type_id, start, end, after, limit
+            )
+            parts.append(_sealed_values(sealed))
+        return _merge(parts, VALUE_KEY, limit)
+
+    def get_value_rows(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
+    ) -> List[Tuple[int, int, int, float]]:
+        """Get values like get_values as plain tuples, without building ORM objects.
+
+        Returns:
+            List[Tuple[int, int, int, float]]: (id, time, value type id, value) tuples ordered by
+                time and id.
+        """
+        with self._read_engine.connect() as connection:
+
+            def fetch(source, remaining: int = None) -> List[Tuple[int, int, int, float]]:
+                stmt = self._values_stmt(
+                    value_type_id, start, end, after, remaining, rows=True, source=source
+                )
+                return list(map(tuple, connection.execute(stmt)))
+
+            value_table, *partitions = self._value_sources(connection, *_range(start, end, after))
+            parts = [fetch(value_table, limit), list(_chain(fetch, partitions, limit))]
+            parts.append(
+                self._read_sealed(connection, value_type_id, start, end, after, limit).tolist()
+            )
+        return _merge(parts, ROW_KEY, limit)
+
+    def iter_values(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        after: Tuple[int, int] = None,
+        limit: int = None,
+        chunk_size: int = 1000,
+    ) -> Iterator[Value]:
+        """Iterate over Values from database without loading the whole result.
+
+        The rows are fetched chunk_size at a time, the arguments are the same as for get_values.
+
+        Yields:
+            Value: Values ordered by time and id.
+        """
+        with Session(self._read_engine) as session:
+
+            def stream(source, remaining: int = None) -> Iterator[Value]:
+                stmt = self._values_stmt(
+                    value_type_id, start, end, after, remaining, source=source
+                )
+                return session.scalars(stmt.execution_options(yield_per=chunk_size))
+
+            sealed = _sealed_values(
+                self._read_sealed(session.connection(), value_type_id, start, end, after, limit)
+            )
+            value_table, *partitions = self._value_sources(
+                session.connection(), *_range(start, end, after)
+            )
+            parts = [stream(value_table, limit), _chain(stream, partitions, limit), sealed]
+            yield from islice(heapq.merge(*parts, key=VALUE_KEY), limit)
+
+    def _rollup_resolution(self, bucket: int, start: int = None, end: int = None) -> int:
+        """Find the coarsest rollup resolution which answers an aggregation exactly"""
+        if not self._rollups:
+            return None
+        for resolution in sorted(rollup.RESOLUTIONS, reverse=True):
+            if bucket % resolution:
+                continue
+            if start is not None and start % resolution:
+                continue
+            if end is not None and (end + 1) % resolution:
+                continue
+            return resolution
+        return None
+
+    def _recent_values_stmt(self, value_type_id: int, count: int, source=Value) -> Select:
+        return (
+            select(source)
+            .where(source.value_type_id == value_type_id)
+            .order_by(source.time.desc(), source.id.desc())
+            .limit(count)
+        )
+
+    def get_recent_values(self, value_type_id: int, count: int = 1) -> List[Value]:
+        """Get the newest Values of a value type.
+
+        Args:
+            value_type_id (int): the value type.
+            count (int, optional): maximum number of values. Defaults to 1.
+
+        Returns:
+            List[Value]: the newest count Values ordered by time and id.
+        """
+        with Session(self._read_engine) as session:
+
+            def fetch(source, remaining: int = None) -> List[Value]:
+                return session.scalars(
+                    self._recent_values_stmt(value_type_id, remaining, source)
+                ).all()
+
+            value_table, *partitions = self._value_sources(session.connection())
+            # newest first, the partitions from the newest month on
+            parts = [fetch(value_table, count), _chain(fetch, partitions[::-1], count)]
+            values = list(islice(heapq.merge(*parts, key=VALUE_KEY, reverse=True), count))
+            values.reverse()
+            sealed = self._recent_sealed(session.connection(), value_type_id, count, values)
+        if len(sealed):
+            values = _merge([values, _sealed_values(sealed)], VALUE_KEY)[-count:]
+        return values
+
+    def _recent_sealed(
+        self, connection, value_type_id: int, count: int, values: List[Value]
+    ) -> np.ndarray:
+        """The sealed values among the newest count, given the newest count values of the tables"""
+        if not self._chunked():
+            return np.empty(0, dtype=chunk.VALUE_DTYPE)
+        # with count values from the tables only newer sealed values can take their place
+        start = values[0].time if len(values) >= count else None
+        return chunk.read_last(connection, value_type_id, count, start)
+
+    def get_last_value_id(self) -> int:
+        """Get the highest stored value id
+
+        Returns:
+            int: the id, 0 if no value is stored.
+        """
+        with self._read_engine.connect() as connection:
+            ids = [
+                connection.execute(select(func.max(table.c.id))).scalar()
+                for table in self._value_tables(connection)
+            ]
+        return max((value_id for value_id in ids if value_id is not None), default=0)
+
+    def get_value_rows_since(
+        self, after_id: int, limit: int = None
+    ) -> List[Tuple[int, int, int, float]]:
+        """Get the values with an id above after_id, e.g. to follow the values stored by another
+        process
+
+        Args:
+            after_id (int): only values with a higher id are returned.
+            limit (int, optional): If set, at most this many values are returned. Defaults to None.
+
+        Returns:
+            List[Tuple[int, int, int, float]]: (id, time, value type id, value) tuples ordered by
+                id.
+        """
+        rows = []
+        with self._read_engine.connect() as connection:
+            for table in self._value_tables(connection):
+                stmt = select(table.c.id, table.c.time, table.c.value_type_id, table.c.value)
+                stmt = stmt.where(table.c.id > after_id).order_by(table.c.id)
+                if limit is not None:
+                    stmt = stmt.limit(limit - len(rows))
+                rows.extend(map(tuple, connection.execute(stmt)))
+                if limit is not None and len(rows) >= limit:
+                    break
+        return rows
+
+    def get_high_water_marks(self) -> Dict[int, int]:
+        """Get the time of the newest stored value of every value type
+
+        Returns:
+            Dict[int, int]: newest time by value type id, types without values are left out.
+        """
+        marks = {}
+        with self._read_engine.connect() as connection:
+            stmts = [
+                select(table.c.value_type_id, func.max(table.c.time)).group_by(
+                    table.c.value_type_id
+                )
+                for table in self._value_tables(connection)
+            ]
+            stmts.append(
+                select(ValueChunk.value_type_id, func.max(ValueChunk.end_time)).group_by(
+                    ValueChunk.value_type_id
+                )
+            )
+            for stmt in stmts:
+                for value_type_id, value_time in connection.execute(stmt):
+                    marks[value_type_id] = max(value_time, marks.get(value_type_id, value_time))
+        return marks
+
+    def _aggregated_values_stmt(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        bucket: int = 60,
+        aggregates: Sequence[str] = AGGREGATES,
+        use_rollups: bool = True,
+        tables: Sequence[Table] = None,
+    ) -> Select:
+        unknown = set(aggregates).difference(AGGREGATES)
+        if unknown:
+            raise ValueError("unknown aggregates: %s" % ", ".join(sorted(unknown)))
+        if bucket < 1:
+            raise ValueError("bucket must be at least one second")
+
+        resolution = self._rollup_resolution(bucket, start, end) if use_rollups else None
+        if resolution is None:
+            tables = [Value.__table__] if tables is None else tables
+            if len(tables) == 1:
+                source = tables[0].c
+                last = tables[0].alias("last_value")
+            else:
+                # the partitions read as one table, filtered one by one so each uses its indexes
+                parts = [
+                    self._filter_values(
+                        select(table.c.id, table.c.time, table.c.value_type_id, table.c.value),
+                        value_type_id,
+                        start,
+                        end,
+                        table.c,
+                    )
+                    for table in tables
+                ]
+                source = union_all(*parts).subquery("value").c
+                last = union_all(*parts).subquery("last_value")
+            bucket_time = (source.time // bucket) * bucket
+            columns = {
+                "min": func.min(source.value),
+                "max": func.max(source.value),
+                "mean": func.avg(source.value),
+                "count": func.count(source.id),
+                "last": func.max(source.time),
+            }
+            stmt = select(
+                source.value_type_id.label("value_type_id"),
+                bucket_time.label("time"),
+                *(columns[name].label(name) for name in aggregates),
+            )
+            stmt = self._filter_values(stmt, value_type_id, start, end, source)
+            stmt = stmt.group_by(source.value_type_id, bucket_time)
+            buckets = stmt.subquery()
+            last_conditions = []
+            last_time, last_value = last.c.time, last.c.value
+        else:
+            bucket_time = (ValueRollup.time // bucket) * bucket
+            columns = {
+                "min": func.min(ValueRollup.min),
+                "max": func.max(ValueRollup.max),
+                "mean": func.sum(ValueRollup.sum) / func.sum(ValueRollup.count),
+                "count": func.sum(ValueRollup.count),
+                "last": func.max(ValueRollup.last_time),
+            }
+            stmt = select(
+                ValueRollup.value_type_id.label("value_type_id"),
+                bucket_time.label("time"),
+                *(columns[name].label(name) for name in aggregates),
+            ).where(ValueRollup.resolution == resolution)
             if value_type_id is not None:
-                stmt = stmt.join(Value.value_type).where(ValueType.id == value_type_id)
+                stmt = stmt.where(ValueRollup.value_type_id == value_type_id)
+            if start is not None:
+                stmt = stmt.where(ValueRollup.time >= start)
+            if end is not None:
+                stmt = stmt.where(ValueRollup.time <= end)
+            stmt = stmt.group_by(ValueRollup.value_type_id, bucket_time)
+            buckets = stmt.subquery()
+            last = ValueRollup.__table__.alias("last_value")
+            last_time, last_value = last.c.last_time, last.c.last
+            # the bucket range lets the join seek the rollup key instead of scanning it
+            last_conditions = [
+                last.c.resolution == resolution,
+                last.c.time >= buckets.c.time,
+                last.c.time < buckets.c.time + bucket,
+            ]
+
+        stmt = select(*(column for column in buckets.c if column.name != "last"))
+        if "last" in aggregates:
+            # replace the time of the newest value in each bucket by its value
+            stmt = stmt.add_columns(last_value.label("last")).join(
+                last,
+                and_(
+                    last.c.value_type_id == buckets.c.value_type_id,
+                    last_time == buckets.c["last"],
+                    *last_conditions,
+                ),
+            )
+        stmt = stmt.order_by(buckets.c.value_type_id, buckets.c.time)
+        return stmt
+
+    def get_aggregated_values(
+        self,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        bucket: int = 60,
+        aggregates: Sequence[str] = AGGREGATES,
+        use_rollups: bool = True,
+    ) -> List[Dict]:
+        """Get Values aggregated into time buckets, computed by the database.
+
+        The filters are the same as for get_values. Every bucket covers bucket seconds starting
+        at a multiple of bucket. If the buckets and the range are aligned to one of the rollup
+        resolutions the coarsest such rollup is read instead of the raw values.
+
+        Args:
+            value_type_id (int, optional): If set, only value of this given type are aggregated.
+                Defaults to None.
+            start (int, optional): If set, only values with a timestamp as least as big as start
+                are aggregated. Defaults to None.
+            end (int, optional): If set, only values with a timestamp as most as big as end are
+                aggregated. Defaults to None.
+            bucket (int, optional): bucket width in seconds. Defaults to 60.
+            aggregates (Sequence[str], optional): any of "min", "max", "mean", "count" and "last".
+                Defaults to all.
+            use_rollups (bool, optional): If False, the raw values are always aggregated. Defaults
+                to True.
+
+        Raises:
+            ValueError: Thrown on an unknown aggregate or a bucket width below one second
+
+        Returns:
+            List[Dict]: one dict per value type and bucket with the keys value_type_id, time
+                (bucket start) and the requested aggregates, ordered by value type and time.
+        """
+        with self._read_engine.connect() as connection:
+            if use_rollups and self._rollups:
+                # stale rollups would miss values, the raw values are aggregated until they are
+                # rebuilt
+                use_rollups = self._rollups_current(connection)
+            tables = self._value_tables(connection, start, end)
+            stmt = self._aggregated_values_stmt(
+                value_type_id, start, end, bucket, aggregates, use_rollups, tables
+            )
+            aggregated = self._aggregate_sealed(
+                connection, value_type_id, start, end, bucket, aggregates, use_rollups, tables
+            )
+            if aggregated is not None:
+                return aggregated
+            return [dict(row._mapping) for row in connection.execute(stmt)]
+
+    def _aggregate_sealed(
+        self,
+        connection,
+        value_type_id: int = None,
+        start: int = None,
+        end: int = None,
+        bucket: int = 60,
+        aggregates: Sequence[str] = AGGREGATES,
+        use_rollups: bool = True,
+        tables: Sequence[Table] = None,
+    ) -> List[Dict]:
+        """Aggregate the raw values in numpy if sealed values are part of them, else return None
+
+        The rollups cover the sealed values, only aggregations of the raw values need them decoded.
+        """
+        if use_rollups and self._rollup_resolution(bucket, start, end) is not None:
+            return None
+        sealed = self._read_sealed(connection, value_type_id, start, end)
+        if not len(sealed):
+            return None
+        parts = [sealed]
+        for table in tables:
+            stmt = self._values_stmt(value_type_id, start, end, rows=True, source=table.c)
+            parts.append(
+                np.fromiter(map(tuple, connection.execute(stmt)), dtype=chunk.VALUE_DTYPE)
+            )
+        return _aggregate(np.concatenate(parts), bucket, aggregates)
+
+    def rebuild_rollups(self, start: int = None, end: int = None) -> None:
+        """Recompute the rollups from the stored values, e.g. after a backfill.
+
+        A full rebuild, without start and end, brings stale rollups up to date, see rollups_stale.
+
+        Args:
+            start (int, optional): If set, only buckets from this time on are rebuilt. Defaults to
+                None.
+            end (int, optional): If set, only buckets up to this time are rebuilt. Defaults to
+                None.
+        """
+        with self._engine.begin() as connection:
+            self._rebuild_rollups(connection, start, end)
+            if start is None and end is None:
+                connection.execute(
+                    update(ValueRollupState).values(rebuilt=ValueRollupState.missed)
+                )
+
+    def _rebuild_rollups(self, connection, start: int = None, end: int = None) -> None:
+        rollup.rebuild_rollups(connection, start, end, self._value_tables(connection, start, end))
+        # the sealed values are merged into the rebuilt rollups chunk by chunk
+        for sealed in chunk.scan(connection, None, *rollup.bucket_range(start, end)):
+            rollup.update_rollups(
+                connection,
+                zip(
+                    sealed["time"].tolist(),
+                    sealed["value_type_id"].tolist(),
+                    sealed["value"].tolist(),
+                ),
+            )
+
+    def rebuild_stale_rollups(self, stop: Callable[[], bool] = None) -> bool:
+        """Rebuild stale rollups one day per transaction, e.g. in the background of the ingest
+
+        The writes going on meanwhile only ever wait for one day to be rebuilt. The values
+        they write are part of the rebuilt days or update the rollups themselves. The rollups
+        count as current once the last day is done, writes they missed meanwhile leave them
+        stale for the next call.
+
+        Args:
+            stop (Callable[[], bool], optional): asked between the transactions, the rebuild ends
+                early once it returns True. Defaults to None.
+
+        Returns:
+            bool: True if stale rollups were rebuilt.
+        """
+        with self._engine.connect() as connection:
+            row = connection.execute(self._rollup_state_stmt()).first()
+            if not self._rollups or row is None or row.missed <= row.rebuilt:
+                return False
+            tables = self._value_tables(connection)
+            ranges = [select(func.min(table.c.time), func.max(table.c.time)) for table in tables]
+            ranges.append(select(func.min(ValueChunk.start_time), func.max(ValueChunk.end_time)))
+            bounds = [
+                bound for bound in connection.execute(union_all(*ranges)) if bound[0] is not None
+            ]
+        day = rollup.RESOLUTIONS[-1]
+        if bounds:
+            first = min(bound[0] for bound in bounds) // day * day
+            for start in range(first, max(bound[1] for bound in bounds) + 1, day):
+                if stop is not None and stop():
+                    return False
+                with self._engine.begin() as connection:
+                    self._rebuild_rollups(connection, start, start + day - 1)
+        with self._engine.begin() as connection:
+            connection.execute(update(ValueRollupState).values(rebuilt=row.missed))
+        logging.info("rebuilt the stale rollups")
+        return True
+
+    @staticmethod
+    def _fetch_array(connection, stmt: Select, dtype: np.dtype) -> np.ndarray:
+        """Run a statement and collect its rows from the DBAPI cursor into a structured array
+
+        The statement runs through the connection, so the engine events fire as for every other
+        query. Skipping the SQLAlchemy result rows roughly halves the cost of large column fetches.
+        """
+        result = connection.execute(stmt)
+        try:
+            return np.fromiter(result.cursor, dtype=dtype)
+        finally:
+            result.close()
+
+    def _series_stmt(
+        self, value_type_id: int, start: int = None, end: int = None, source=Value
+    ) -> Select:
+        stmt = select(source.time, source.value)
+        stmt = self._filter_values(stmt, value_type_id, start, end, source)
+        return stmt.order_by(source.time, source.id)
+
+    def get_series(
+        self, value_type_id: int, start: int = None, end: int = None, neighbors: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the times and values of one value type as numpy arrays, without building ORM
+        objects.
+
+        Args:
+            value_type_id (int): value type of the series.
+            start (int, optional): If set, only values with a timestamp as least as big as start
+                are returned. Defaults to None.
+            end (int, optional): If set, only values with a timestamp as most as big as end are
+                returned. Defaults to None.
+            neighbors (bool, optional): If set, the last value before start and the first value
+                after end are included too, e.g. to fill or interpolate up to the range borders.
+                Defaults to False.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: int64 times and float64 values ordered by time.
+        """
+        with self._read_engine.connect() as connection:
+            parts = [
+                self._fetch_array(
+                    connection, self._series_stmt(value_type_id, start, end, table.c), SERIES_DTYPE
+                )
+                for table in self._value_tables(connection, start, end)
+            ]
+            chunked = self._chunked()
+            sealed = [self._read_sealed(connection, value_type_id, start, end)]
+            if neighbors and start is not None:
+                # the value table may hold a nearer neighbor than the newest partition with one
+                value_table, *partitions = self._value_tables(connection, end=start - 1)
+                for table in [value_table] + partitions[::-1]:
+                    stmt = self._series_stmt(value_type_id, end=start - 1, source=table.c)
+                    stmt = (
+                        stmt.order_by(None)
+                        .order_by(table.c.time.desc(), table.c.id.desc())
+                        .limit(1)
+                    )
+                    parts.append(self._fetch_array(connection, stmt, SERIES_DTYPE))
+                    if table is not value_table and len(parts[-1]):
+                        break
+                if chunked:
+                    sealed.append(chunk.read_last(connection, value_type_id, 1, end=start - 1))
+            if neighbors and end is not None:
+                value_table, *partitions = self._value_tables(connection, start=end + 1)
+                for table in [value_table] + partitions:
+                    stmt = self._series_stmt(value_type_id, start=end + 1, source=table.c).limit(1)
+                    parts.append(self._fetch_array(connection, stmt, SERIES_DTYPE))
+                    if table is not value_table and len(parts[-1]):
+                        break
+                if chunked:
+                    sealed.append(chunk.read(connection, value_type_id, start=end + 1, limit=1))
+        sealed = np.concatenate(sealed)
+        parts.append(sealed[["time", "value"]].astype(SERIES_DTYPE))
+        parts = [part for part in parts if len(part)]
+        if len(parts) == 1:
+            series = parts[0]
+        else:
+            # the value table, the partitions and the chunks may all hold values of the same months
+            series = np.concatenate(parts) if parts else np.empty(0, dtype=SERIES_DTYPE)
+            series = series[np.argsort(series["time"], kind="stable")]
+        if neighbors:
+            # of the neighbors found in every source only the nearest stay
+            keep = np.ones(len(series), dtype=bool)
             if start is not None:
-                stmt = stmt.where(Value.time >= start)
+                keep[np.flatnonzero(series["time"] < start)[:-1]] = False
             if end is not None:
-                stmt = stmt.where(Value.time <= end)
-            stmt = stmt.order_by(Value.time)
-            logging.error(start)
-            logging.error(stmt)
+                keep[np.flatnonzero(series["time"] > end)[1:]] = False
+            series = series[keep]
+        return series["time"], series["value"]
+
+    def get_values_lttb(
+        self, value_type_id: int, start: int = None, end: int = None, points: int = 1000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get a downsampled series using Largest-Triangle-Three-Buckets.
+
+        The series is read with get_series, no ORM objects are built.
+
+        Args:
+            value_type_id (int): value type of the series.
+            start (int, optional): If set, only values with a timestamp as least as big as start
+                are used. Defaults to None.
+            end (int, optional): If set, only values with a timestamp as most as big as end are
+                used. Defaults to None.
+            points (int, optional): maximum number of values returned, at least 3. Defaults to
+                1000.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: times and values of at most points visually
+                representative values ordered by time.
+        """
+        times, values = self.get_series(value_type_id, start, end)
+        indices = lttb(times, values, points)
+        return times[indices], values[indices]
+
+    def drop_partitions(self, before: int) -> List[int]:
+        """Drop the partitions holding only values older than a time
+
+        Every partition goes with a DROP TABLE, which takes about the same time however many
+        values it holds. The rollups are kept, so aggregates over the dropped time stay available.
+        The sealed values of the dropped months go with them.
+
+        Args:
+            before (int): unix time stamp, partitions ending before it are dropped.
+
+        Raises:
+            RuntimeError: Thrown if the values are not partitioned
+
+        Returns:
+            List[int]: keys of the dropped partitions.
+        """
+        if self._partitions is None:
+            raise RuntimeError("the values are not partitioned")
+        with self._engine.begin() as connection:
+            dropped = [
+                key
+                for key in self._partitions.keys(connection)
+                if self._partitions.bounds(key)[1] < before
+            ]
+            for key in dropped:
+                self._partitions.drop(connection, key)
+            if dropped:
+                last = self._partitions.bounds(dropped[-1])[1]
+                connection.execute(delete(ValueChunk).where(ValueChunk.end_time <= last))
+        self._created_partitions.difference_update(dropped)
+        for key in dropped:
+            logging.info("dropped partition %d", key)
+        return dropped
 
-            return session.scalars(stmt).all()
+    def apply_retention(self, now: int = None) -> List[int]:
+        """Drop the partitions older than the retention of the partitions, see MonthlyPartitions
+
+        Args:
+            now (int, optional): unix time stamp the retention counts back from. Defaults to the
+                current time.
+
+        Returns:
+            List[int]: keys of the dropped partitions.
+        """
+        if self._partitions is None or self._partitions.retention is None:
+            return []
+        now = int(time.time()) if now is None else now
+        return self.drop_partitions(self._partitions.retention_start(now))
+
+    def seal_values(
+        self, before: int, chunk_size: int = chunk.CHUNK_SIZE, stop: Callable[[], bool] = None
+    ) -> int:
+        """Compress the values older than a time into chunks of chunk_size values, see
+        rdp.crud.chunk
+
+        The values of every type are moved from their table into value_chunk rows holding
+        their ids, times and values compressed, the reads decode the chunks overlapping their
+        range. Only full chunks are sealed, the values left over stay in their table until
+        enough older values add up. The rollups are kept as they are. The newest value of the
+        value table is never sealed, SQLite numbers new values after the highest stored id.
+        Values written later with the time and value type of a sealed value are duplicates,
+        like values already in a table.
+
+        Args:
+            before (int): unix time stamp, only older values are sealed.
+            chunk_size (int, optional): values per chunk. Defaults to chunk.CHUNK_SIZE.
+            stop (Callable[[], bool], optional): asked between the transactions, the sealing ends
+                early once it returns True. Defaults to None.
+
+        Returns:
+            int: number of sealed values.
+        """
+        with self._engine.connect() as connection:
+            tables = self._value_tables(connection, end=before - 1)
+            type_ids = connection.execute(select(ValueType.id)).scalars().all()
+            keep_id = connection.execute(select(func.max(Value.id))).scalar()
+        sealed = 0
+        for table in tables:
+            table_keep_id = keep_id if table is Value.__table__ else None
+            for type_id in type_ids:
+                count = chunk_size * chunk.SEAL_CHUNKS
+                # every transaction seals at most SEAL_CHUNKS chunks, the reads are never blocked
+                # for long
+                while count == chunk_size * chunk.SEAL_CHUNKS:
+                    if stop is not None and stop():
+                        break
+                    with self._engine.begin() as connection:
+                        count = chunk.seal(
+                            connection, table, type_id, before, chunk_size, table_keep_id
+                        )
+                    sealed += count
+                    self._has_chunks = self._has_chunks or count > 0
+        if sealed:
+            logging.info("sealed %d values older than %d", sealed, before)
+        return sealed
+
+    def apply_sealing(self, now: int = None, stop: Callable[[], bool] = None) -> int:
+        """Seal the values older than seal_after seconds, see seal_values
+
+        Args:
+            now (int, optional): unix time stamp the age counts back from. Defaults to the current
+                time.
+            stop (Callable[[], bool], optional): see seal_values. Defaults to None.
+
+        Returns:
+            int: number of sealed values.
+        """
+        if self._seal_after is None:
+            return 0
+        now = int(time.time()) if now is None else now
+        return self.seal_values(now - self._seal_after, stop=stop)
@@ -1,5 +1,140 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+from sqlalchemy import Engine, event
 from sqlalchemy import create_engine as sql_create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine as sql_create_async_engine
+
+
+@dataclass
+class EngineProfile:
+    """SQLite tuning applied to every new connection
+
+    Attributes:
+        journal_mode (str): journal mode, WAL lets readers run while the writer commits.
+        synchronous (str): fsync level, NORMAL is safe in WAL mode.
+        cache_size (int): page cache size, negative values are KiB.
+        mmap_size (int): bytes of the database file accessed through memory mapping.
+        busy_timeout (int): milliseconds to wait for a lock before failing.
+        echo (bool): log every statement.
+    """
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size: int = -65536
+    mmap_size: int = 268435456
+    busy_timeout: int = 5000
+    echo: bool = False
+
+
+def _is_memory(url) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def _apply_profile(engine: Engine, profile: EngineProfile, read_only: bool) -> None:
+    pragmas = [
+        "PRAGMA busy_timeout = %d" % profile.busy_timeout,
+        "PRAGMA cache_size = %d" % profile.cache_size,
+        "PRAGMA mmap_size = %d" % profile.mmap_size,
+        "PRAGMA synchronous = %s" % profile.synchronous,
+    ]
+    if not read_only:
+        # the journal mode is persistent, the writer is the one to set it
+        pragmas.insert(0, "PRAGMA journal_mode = %s" % profile.journal_mode)
+    else:
+        pragmas.append("PRAGMA query_only = ON")
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        if read_only:
+            # the driver never begins a transaction for a SELECT, the begin event below does
+            dbapi_connection.isolation_level = None
+
+    if read_only:
+
+        @event.listens_for(engine, "begin")
+        def begin(connection):
+            # all queries of a read see one snapshot, e.g. no values sealed between the table and
+            # the chunk reads
+            connection.exec_driver_sql("BEGIN")
+
+
+def create_engine(
+    url, profile: EngineProfile = None, read_only: bool = False, pool_size: int = None
+) -> Engine:
+    """Create a SQLite engine tuned by a profile
+
+    Args:
+        url (str): database url.
+        profile (EngineProfile, optional): tuning of the connections. Defaults to EngineProfile().
+        read_only (bool, optional): If set, the connections refuse to write. Defaults to False.
+        pool_size (int, optional): If set, the engine holds at most this many connections. Defaults
+            to None.
+
+    Returns:
+        Engine: the engine
+    """
+    profile = profile or EngineProfile()
+    kwargs = {}
+    if pool_size is not None and not _is_memory(url):
+        kwargs = {"pool_size": pool_size, "max_overflow": 0}
+    engine = sql_create_engine(url, echo=profile.echo, **kwargs)
+    _apply_profile(engine, profile, read_only)
+    return engine
+
+
+def create_engines(
+    url, profile: EngineProfile = None, read_pool_size: int = 5
+) -> Tuple[Engine, Engine]:
+    """Create a single connection writer engine and a read only engine for the same database
+
+    SQLite allows only one writer at a time. With the writer on its own connection and WAL
+    journaling, queries on the read engine keep running during heavy ingest. In memory
+    databases cannot be shared between connections, there both engines are the same.
+
+    Args:
+        url (str): database url.
+        profile (EngineProfile, optional): tuning of the connections. Defaults to EngineProfile().
+        read_pool_size (int, optional): number of read connections. Defaults to 5.
+
+    Returns:
+        Tuple[Engine, Engine]: the writer and the reader engine
+    """
+    writer = create_engine(url, profile, pool_size=1)
+    if _is_memory(url):
+        return writer, writer
+    # create the database file and switch its journal mode before readers open it
+    writer.connect().close()
+    reader = create_engine(url, profile, read_only=True, pool_size=read_pool_size)
+    return writer, reader
+
+
+def create_async_engine(
+    url, profile: EngineProfile = None, read_only: bool = True, pool_size: int = None
+) -> AsyncEngine:
+    """Create an asyncio SQLite engine (aiosqlite) tuned by a profile
 
+    Args:
+        url (str): database url, a plain sqlite url is switched to the aiosqlite driver.
+        profile (EngineProfile, optional): tuning of the connections. Defaults to EngineProfile().
+        read_only (bool, optional): If set, the connections refuse to write. Defaults to True.
+        pool_size (int, optional): If set, the engine holds at most this many connections. Defaults
+            to None.
 
-def create_engine(url):
-    return sql_create_engine(url, echo=True)
+    Returns:
+        AsyncEngine: the engine
+    """
+    profile = profile or EngineProfile()
+    url = make_url(url).set(drivername="sqlite+aiosqlite")
+    kwargs = {}
+    if pool_size is not None and not _is_memory(url):
+        kwargs = {"pool_size": pool_size, "max_overflow": 0}
+    engine = sql_create_async_engine(url, echo=profile.echo, **kwargs)
+    _apply_profile(engine.sync_engine, profile, read_only)
+    return engine
@@ -1,6 +1,6 @@
 from typing import List
 from typing import Optional
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import ForeignKey, Index, UniqueConstraint
 from sqlalchemy import String, Float, DateTime
 
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -36,7 +36,82 @@ class Value(Base):
 
     __table_args__ = (
         UniqueConstraint("time", "value_type_id", name="value integrity"),
+        # covers the common per type time range queries without touching the table
+        Index("value_type_time", "value_type_id", "time", "value"),
     )
 
     def __repr__(self) -> str:
-        return f"Value(id={self.id!r}, value_time={self.time!r} value_type={self.value_type.type_name!r}, value={self.value})"
+        # value_type_id instead of value_type.type_name, a repr must not lazy load the relationship
+        return (
+            f"Value(id={self.id!r}, value_time={self.time!r}"
+            f" value_type_id={self.value_type_id!r}, value={self.value})"
+        )
+
+
+class ValueRollup(Base):
+    __tablename__ = "value_rollup"
+    resolution: Mapped[int] = mapped_column(primary_key=True)
+    value_type_id: Mapped[int] = mapped_column(ForeignKey("value_type.id"), primary_key=True)
+    time: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column()
+    sum: Mapped[float] = mapped_column()
+    min: Mapped[float] = mapped_column()
+    max: Mapped[float] = mapped_column()
+    last_time: Mapped[int] = mapped_column()
+    last: Mapped[float] = mapped_column()
+
+    def __repr__(self) -> str:
+        return (
+            f"ValueRollup(resolution={self.resolution!r}, value_type_id={self.value_type_id!r},"
+            f" time={self.time!r}, count={self.count!r})"
+        )
+
+
+class ValueChunk(Base):
+    """Sealed values of one value type, compressed into one row, see rdp.crud.chunk"""
+
+    __tablename__ = "value_chunk"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    value_type_id: Mapped[int] = mapped_column(ForeignKey("value_type.id"))
+    start_time: Mapped[int] = mapped_column()
+    end_time: Mapped[int] = mapped_column()
+    count: Mapped[int] = mapped_column()
+    id_data: Mapped[bytes] = mapped_column()
+    time_data: Mapped[bytes] = mapped_column()
+    value_data: Mapped[bytes] = mapped_column()
+
+    __table_args__ = (
+        # the chunk index: finds the chunks overlapping a range without reading their data
+        Index("value_chunk_type_time", "value_type_id", "end_time", "start_time"),
+        Index("value_chunk_time", "end_time", "start_time"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"ValueChunk(id={self.id!r}, value_type_id={self.value_type_id!r},"
+            f" start_time={self.start_time!r}, end_time={self.end_time!r}, count={self.count!r})"
+        )
+
+
+class ValueBackfill(Base):
+    """Counts the writes of values which bypass the ingest, see Crud.get_backfill"""
+
+    __tablename__ = "value_backfill"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column()
+    end_time: Mapped[int] = mapped_column()
+
+    def __repr__(self) -> str:
+        return f"ValueBackfill(count={self.count!r}, end_time={self.end_time!r})"
+
+
+class ValueRollupState(Base):
+    """Counts the writes of values which left the rollups behind, see Crud.rollups_stale"""
+
+    __tablename__ = "value_rollup_state"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    missed: Mapped[int] = mapped_column()
+    rebuilt: Mapped[int] = mapped_column()
+
+    def __repr__(self) -> str:
+        return f"ValueRollupState(missed={self.missed!r}, rebuilt={self.rebuilt!r})"
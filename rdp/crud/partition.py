@@ -0,0 +1,158 @@
+import re
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    UniqueConstraint,
+    text,
+)
+
+# name of the partition holding the values of one UTC month, e.g. value_202401
+PARTITION_NAME = "value_%06d"
+PARTITION_PATTERN = re.compile(r"^value_(\d{6})$")
+# the ids of a partition start at its key shifted by this many bits, so they stay unique across
+# partitions
+ID_SHIFT = 32
+
+
+class MonthlyPartitions:
+    """Values split into one table per UTC month
+
+    Every partition is a table like the value table, named after its month (value_YYYYMM)
+    and living in the same database file. Dropping a partition is a DROP TABLE, which frees
+    its pages at once instead of rewriting the value indexes like a DELETE of the old rows.
+    The ids of every partition start at a range of their own, so values keep unique ids.
+
+    Attributes:
+        retention (int): number of months kept by Crud.apply_retention, including the current one,
+            None keeps everything.
+    """
+
+    def __init__(self, retention: int = None):
+        if retention is not None and retention < 1:
+            raise ValueError("retention must be at least one month")
+        self.retention = retention
+        self._metadata = MetaData()
+        self._tables: Dict[int, Table] = {}
+
+    @staticmethod
+    def key(value_time: int) -> int:
+        """The partition key (year * 100 + month) of a unix time stamp"""
+        moment = datetime.fromtimestamp(value_time, timezone.utc)
+        return moment.year * 100 + moment.month
+
+    @staticmethod
+    def bounds(key: int) -> Tuple[int, int]:
+        """First and last second of a partition"""
+        year, month = divmod(key, 100)
+        first = datetime(year, month, 1, tzinfo=timezone.utc)
+        following = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        return int(first.timestamp()), int(following.timestamp()) - 1
+
+    def table(self, key: int) -> Table:
+        """The table of a partition, it does not need to exist in the database"""
+        table = self._tables.get(key)
+        if table is None:
+            name = PARTITION_NAME % key
+            table = Table(
+                name,
+                self._metadata,
+                Column("id", Integer, primary_key=True),
+                Column("time", Integer, nullable=False),
+                Column("value", Float, nullable=False),
+                Column("value_type_id", Integer, nullable=False),
+                UniqueConstraint("time", "value_type_id", name="%s integrity" % name),
+                Index("%s_type_time" % name, "value_type_id", "time", "value"),
+                sqlite_autoincrement=True,
+            )
+            self._tables[key] = table
+        return table
+
+    def retention_start(self, now: int) -> int:
+        """First second kept by the retention, the start of the oldest month kept at time now"""
+        key = self.key(now)
+        month = key // 100 * 12 + key % 100 - 1 - (self.retention - 1)
+        return self.bounds(month // 12 * 100 + month % 12 + 1)[0]
+
+    def split(
+        self, rows: Iterable[Sequence], time_of: Callable = itemgetter("time")
+    ) -> Dict[int, List[Sequence]]:
+        """Group value rows by partition key, keeping their order
+
+        Args:
+            rows (Iterable[Sequence]): the rows.
+            time_of (Callable, optional): gets the time of a row. Defaults to the "time" item.
+
+        Returns:
+            Dict[int, List[Sequence]]: the rows by partition key.
+        """
+        groups: Dict[int, List[Sequence]] = {}
+        first, last, group = 1, 0, None
+        for row in rows:
+            value_time = time_of(row)
+            if not first <= value_time <= last:
+                key = self.key(value_time)
+                first, last = self.bounds(key)
+                group = groups.setdefault(key, [])
+            group.append(row)
+        return groups
+
+    def keys(self, connection: Connection) -> List[int]:
+        """Keys of the partitions stored in the database, ascending"""
+        names = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master"
+            " WHERE type = 'table' AND name LIKE 'value\\_%' ESCAPE '\\'"
+        ).scalars()
+        return sorted(
+            int(match.group(1)) for match in map(PARTITION_PATTERN.match, names) if match
+        )
+
+    def overlapping(self, keys: Iterable[int], start: int = None, end: int = None) -> List[int]:
+        """The keys of the partitions holding values between start and end (inclusive)"""
+        first = None if start is None else self.key(start)
+        last = None if end is None else self.key(end)
+        return [
+            key
+            for key in keys
+            if (first is None or key >= first) and (last is None or key <= last)
+        ]
+
+    def create(self, connection: Connection, key: int) -> Table:
+        """Create a partition unless it exists
+
+        Args:
+            connection (Connection): connection with an open transaction.
+            key (int): the partition key.
+
+        Returns:
+            Table: the table of the partition
+        """
+        table = self.table(key)
+        if not connection.dialect.has_table(connection, table.name):
+            table.create(connection)
+            connection.execute(
+                text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                {"name": table.name, "seq": key << ID_SHIFT},
+            )
+        return table
+
+    def drop(self, connection: Connection, key: int) -> None:
+        """Drop a partition with all its values
+
+        Args:
+            connection (Connection): connection with an open transaction.
+            key (int): the partition key.
+        """
+        table = self.table(key)
+        table.drop(connection, checkfirst=True)
+        connection.execute(
+            text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name}
+        )
@@ -0,0 +1,157 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import Connection, Table, and_, case, delete, func, literal, select, true
+from sqlalchemy.dialects.sqlite import Insert, insert
+
+from .model import Value, ValueRollup
+
+# bucket widths in seconds of the maintained rollups: one minute, one hour and one day
+RESOLUTIONS = (60, 3600, 86400)
+
+
+def rollup_rows(values: Iterable[Tuple[int, int, float]]) -> List[Dict]:
+    """Aggregate (time, value type id, value) tuples into rollup rows of every resolution"""
+    buckets: Dict[Tuple[int, int, int], Dict] = {}
+    for value_time, value_type, value_value in values:
+        for resolution in RESOLUTIONS:
+            bucket_time = value_time // resolution * resolution
+            key = (resolution, value_type, bucket_time)
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = {
+                    "resolution": resolution,
+                    "value_type_id": value_type,
+                    "time": bucket_time,
+                    "count": 1,
+                    "sum": value_value,
+                    "min": value_value,
+                    "max": value_value,
+                    "last_time": value_time,
+                    "last": value_value,
+                }
+                continue
+            row["count"] += 1
+            row["sum"] += value_value
+            if value_value < row["min"]:
+                row["min"] = value_value
+            if value_value > row["max"]:
+                row["max"] = value_value
+            if value_time >= row["last_time"]:
+                row["last_time"] = value_time
+                row["last"] = value_value
+    return list(buckets.values())
+
+
+def _merge(stmt: Insert) -> Insert:
+    """Let an insert of rollup rows merge into the rollup rows already stored"""
+    return stmt.on_conflict_do_update(
+        index_elements=[ValueRollup.resolution, ValueRollup.value_type_id, ValueRollup.time],
+        set_={
+            "count": ValueRollup.count + stmt.excluded["count"],
+            "sum": ValueRollup.sum + stmt.excluded["sum"],
+            "min": func.min(ValueRollup.min, stmt.excluded["min"]),
+            "max": func.max(ValueRollup.max, stmt.excluded["max"]),
+            "last_time": func.max(ValueRollup.last_time, stmt.excluded["last_time"]),
+            "last": case(
+                (stmt.excluded["last_time"] >= ValueRollup.last_time, stmt.excluded["last"]),
+                else_=ValueRollup.last,
+            ),
+        },
+    )
+
+
+def update_rollups(connection: Connection, values: Iterable[Tuple[int, int, float]]) -> None:
+    """Merge freshly inserted values into the rollups, within the transaction of the insert"""
+    rows = rollup_rows(values)
+    if not rows:
+        return
+    connection.execute(_merge(insert(ValueRollup)), rows)
+
+
+def bucket_range(start: int = None, end: int = None) -> Tuple[int, int]:
+    """A time range widened to whole buckets of the coarsest resolution"""
+    coarsest = max(RESOLUTIONS)
+    if start is not None:
+        start = start // coarsest * coarsest
+    if end is not None:
+        end = end // coarsest * coarsest + coarsest - 1
+    return start, end
+
+
+def rebuild_rollups(
+    connection: Connection, start: int = None, end: int = None, tables: Sequence[Table] = None
+) -> None:
+    """Recompute the rollups from the value table, e.g. after a backfill
+
+    The range is widened to whole buckets of the coarsest resolution.
+
+    Args:
+        connection (Connection): connection with an open transaction.
+        start (int, optional): If set, only buckets from this time on are rebuilt. Defaults to
+            None.
+        end (int, optional): If set, only buckets up to this time are rebuilt. Defaults to None.
+        tables (Sequence[Table], optional): tables holding the values, e.g. the partitions, their
+            buckets are merged. Defaults to the value table.
+    """
+    tables = [Value.__table__] if tables is None else tables
+    start, end = bucket_range(start, end)
+
+    stmt = delete(ValueRollup)
+    if start is not None:
+        stmt = stmt.where(ValueRollup.time >= start)
+    if end is not None:
+        stmt = stmt.where(ValueRollup.time <= end)
+    connection.execute(stmt)
+
+    for table, resolution in (
+        (table, resolution) for table in tables for resolution in RESOLUTIONS
+    ):
+        bucket_time = table.c.time // resolution * resolution
+        buckets = select(
+            table.c.value_type_id.label("value_type_id"),
+            bucket_time.label("time"),
+            func.count(table.c.id).label("count"),
+            func.sum(table.c.value).label("sum"),
+            func.min(table.c.value).label("min"),
+            func.max(table.c.value).label("max"),
+            func.max(table.c.time).label("last_time"),
+        )
+        if start is not None:
+            buckets = buckets.where(table.c.time >= start)
+        if end is not None:
+            buckets = buckets.where(table.c.time <= end)
+        buckets = buckets.group_by(table.c.value_type_id, bucket_time).subquery()
+        last = table.alias("last_value")
+        rows = select(
+            literal(resolution),
+            buckets.c.value_type_id,
+            buckets.c.time,
+            buckets.c["count"],
+            buckets.c["sum"],
+            buckets.c["min"],
+            buckets.c["max"],
+            buckets.c.last_time,
+            last.c.value,
+        ).join(
+            last,
+            and_(
+                last.c.value_type_id == buckets.c.value_type_id, last.c.time == buckets.c.last_time
+            ),
+        )
+        stmt = insert(ValueRollup).from_select(
+            [
+                "resolution",
+                "value_type_id",
+                "time",
+                "count",
+                "sum",
+                "min",
+                "max",
+                "last_time",
+                "last",
+            ],
+            # sqlite needs a WHERE to tell the ON CONFLICT of an upsert apart from a join
+            # constraint
+            rows.where(true()) if len(tables) > 1 else rows,
+        )
+        connection.execute(_merge(stmt) if len(tables) > 1 else stmt)
@@ -0,0 +1,14 @@
+from .registry import (
+    CONTENT_TYPE,
+    DEFAULT_BUCKETS,
+    FAST_BUCKETS,
+    Counter,
+    Gauge,
+    Histogram,
+    HistogramValue,
+    Metric,
+    Registry,
+    render,
+)
+from .sql import instrument_engine, statement_label
+from .profiler import SamplingProfiler
@@ -0,0 +1,92 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+
+class SamplingProfiler:
+    """Sample the call stacks of all threads at a fixed interval, on a thread of its own.
+
+    Nothing is traced, so the profiled threads run at full speed, the cost is one walk of
+    every stack per interval. The stacks are counted in the collapsed format of flame graph
+    tools: the thread name and the frames from the outermost to the innermost call, joined
+    by semicolons. The profiler can be started and stopped any number of times, the counts
+    add up until reset.
+
+    Args:
+        interval (float, optional): seconds between two samples. Defaults to 0.01.
+        max_depth (int, optional): innermost frames kept per stack. Defaults to 64.
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started: float = None
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="rdp-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def stacks(self) -> Dict[str, int]:
+        """Number of samples per collapsed stack"""
+        with self._lock:
+            return dict(self._stacks)
+
+    def collapsed(self) -> str:
+        """The samples in the collapsed format, one "stack count" line per stack, most frequent
+        first"""
+        return "".join(
+            "%s %d\n" % (stack, count) for stack, count in Counter(self.stacks()).most_common()
+        )
+
+    def _stack(self, frame) -> List[str]:
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(
+                "%s:%s" % (frame.f_globals.get("__name__", code.co_filename), code.co_name)
+            )
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopping.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = [
+                ";".join([names.get(ident, str(ident))] + self._stack(frame))
+                for ident, frame in sys._current_frames().items()
+                if ident != own
+            ]
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
@@ -0,0 +1,221 @@
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# upper bounds in seconds for request and query durations
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# upper bounds in seconds for short steps like decoding one device read
+FAST_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.1,
+)
+
+# media type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class HistogramValue:
+    """Counts of observations per bucket, the sum and the count, like a Prometheus histogram
+
+    An observation is counted in the first bucket whose upper bound is at least as big.
+    Observing takes a bisect and a lock, cheap enough for every commit or device read.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[Tuple[float, int]], float, int]:
+        """Cumulative counts per upper bound (the last one is +Inf), the sum and the count"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            running += count
+            cumulative.append((bound, running))
+        return cumulative, total, running
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+
+class Metric:
+    """A metric family of one name, with one value per combination of label values
+
+    Attributes:
+        name (str): metric name.
+        documentation (str): the HELP text.
+        labels (Sequence[str]): names of the labels.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    def _label_dict(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.labels, values))
+
+    def samples(self) -> Iterator[Sample]:
+        """(name, labels, value) of every sample"""
+        for values, value in sorted(self._values.items()):
+            yield self.name, self._label_dict(values), value
+
+
+class Counter(Metric):
+    """A total which only grows, e.g. of stored records"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    """A value which goes up and down, e.g. a queue depth"""
+
+    kind = "gauge"
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Distributions of observations, e.g. durations in seconds, see HistogramValue"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def value(self, labels: Labels = ()) -> HistogramValue:
+        """The histogram of some label values, created on first use"""
+        histogram = self._values.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = self._values.setdefault(labels, HistogramValue(self.buckets))
+        return histogram
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        self.value(labels).observe(value)
+
+    def attach(self, histogram: HistogramValue, labels: Labels = ()) -> None:
+        """Report a histogram kept elsewhere, e.g. in the stats of the reader"""
+        self._values[labels] = histogram
+
+    def samples(self) -> Iterator[Sample]:
+        for values, histogram in sorted(self._values.items(), key=lambda item: item[0]):
+            labels = self._label_dict(values)
+            cumulative, total, count = histogram.snapshot()
+            for bound, running in cumulative:
+                yield self.name + "_bucket", dict(labels, le=_format_value(bound)), running
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, count
+
+
+class Registry:
+    """The metrics served together, plus collectors building metrics at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def add(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """Add a function returning metrics, called on every render"""
+        self._collectors.append(collector)
+
+    def collect(self) -> List[Metric]:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        return metrics
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        return render(self.collect())
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return "%d" % value
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(metrics: Iterable[Metric]) -> str:
+    """Metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in metrics:
+        lines.append("# HELP %s %s" % (metric.name, metric.documentation.replace("\n", " ")))
+        lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(
+                    '%s="%s"' % (key, _escape(item)) for key, item in labels.items()
+                )
+                lines.append("%s{%s} %s" % (name, label_text, _format_value(value)))
+            else:
+                lines.append("%s %s" % (name, _format_value(value)))
+    return "\n".join(lines) + "\n"
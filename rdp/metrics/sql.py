@@ -0,0 +1,58 @@
+import re
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .registry import Histogram
+
+VERB_PATTERN = re.compile(r"^\s*(\w+)")
+TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+\"?(\w+)", re.IGNORECASE)
+# the labels of at most this many distinct statements are remembered
+LABEL_CACHE_SIZE = 1024
+
+_labels: Dict[str, str] = {}
+
+
+def statement_label(statement: str) -> str:
+    """A short label of a statement: its verb and first table, e.g. "select value"
+
+    The label keeps the number of time series small however many distinct statements run.
+    """
+    label = _labels.get(statement)
+    if label is None:
+        verb = VERB_PATTERN.match(statement)
+        table = TABLE_PATTERN.search(statement)
+        label = verb.group(1).lower() if verb else "other"
+        if table:
+            label = "%s %s" % (label, table.group(1).lower())
+        if len(_labels) < LABEL_CACHE_SIZE:
+            _labels[statement] = label
+    return label
+
+
+def instrument_engine(engine, histogram: Histogram, name: str) -> None:
+    """Time every statement an engine runs, through the cursor execute events
+
+    The durations are observed in histogram with the labels (name, statement label). Rows
+    fetched after the execute, e.g. by a streamed result, are not part of the duration.
+
+    Args:
+        engine (Engine | AsyncEngine): the engine.
+        histogram (Histogram): histogram with the labels engine and statement.
+        name (str): the engine label, e.g. "writer" or "reader".
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._rdp_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_rdp_started", None)
+        if started is not None:
+            histogram.observe(time.perf_counter() - started, (name, statement_label(statement)))
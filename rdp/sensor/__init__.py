@@ -1 +1,8 @@
-from .reader import Reader
\ No newline at end of file
+from .device import DeviceReader, DeviceStats
+from .dump import RECORD_DTYPE, dump_size, iter_csv_chunks, iter_dump_chunks
+from .election import IngestLock, IngestService
+from .follower import Follower
+from .hub import Hub, Subscription
+from .ingest import HighWaterMarks, IngestQueue, IngestStats
+from .reader import Reader, load_recent
+from .recent import RecentSeries, RecentValues
@@ -0,0 +1,133 @@
+import io
+import logging
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+
+from rdp.metrics import FAST_BUCKETS, HistogramValue
+
+from .ingest import IngestQueue
+from .record import RECORD_SIZE, decode_records
+
+logger = logging.getLogger("rdp.sensor")
+
+
+@dataclass
+class DeviceStats:
+    """Counters of one device
+
+    Attributes:
+        device (str): path of the device.
+        records (int): decoded records.
+        bytes (int): bytes read.
+        reads (int): reads returning data.
+        errors (int): failed opens or reads.
+        last_read (float): unix time of the newest read returning data, None before.
+        decode_latency (HistogramValue): distribution of the seconds spent decoding one read.
+    """
+
+    device: str
+    records: int = 0
+    bytes: int = 0
+    reads: int = 0
+    errors: int = 0
+    last_read: float = None
+    decode_latency: HistogramValue = field(
+        default_factory=lambda: HistogramValue(FAST_BUCKETS), compare=False, repr=False
+    )
+
+
+class DeviceReader:
+    """Drain one device into an IngestQueue on a thread of its own.
+
+    The device is opened non blocking and waited on with select, so a FIFO without a writer
+    or a device without data never keeps the thread from noticing stop. Regular files and
+    FIFOs can stand in for a character device. A device which cannot be opened or read is
+    retried every retry_interval seconds.
+    """
+
+    def __init__(
+        self,
+        device: str,
+        queue: IngestQueue,
+        batch_size: int = 256,
+        poll_interval: float = 0.1,
+        retry_interval: float = 1.0,
+    ):
+        self.device = device
+        self.stats = DeviceStats(device)
+        self._queue = queue
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._retry_interval = retry_interval
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="rdp-device %s" % self.device)
+        self._thread.start()
+
+    def signal_stop(self) -> None:
+        """Ask the thread to stop without waiting for it"""
+        self._stopping.set()
+
+    def stop(self) -> None:
+        self.signal_stop()
+        self.join()
+
+    def join(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._drain()
+            except OSError as error:
+                self.stats.errors += 1
+                logger.error("Reading %s failed: %s", self.device, error)
+                self._stopping.wait(self._retry_interval)
+
+    def _drain(self) -> None:
+        buffer = bytearray(self._batch_size * RECORD_SIZE)
+        view = memoryview(buffer)
+        pending = 0
+        count = 0
+        fd = os.open(self.device, os.O_RDONLY | os.O_NONBLOCK)
+        with io.FileIO(fd, "rb") as f:
+            while not self._stopping.is_set():
+                readable, _, _ = select.select([fd], [], [], self._poll_interval)
+                if not readable:
+                    continue
+                size = f.readinto(view[pending:])
+                if size is None:
+                    # woken up without data
+                    continue
+                if not size:
+                    # drained, or a FIFO without a writer which select reports as readable
+                    self._stopping.wait(self._poll_interval)
+                    continue
+                self.stats.bytes += size
+                self.stats.reads += 1
+                self.stats.last_read = time.time()
+                pending += size
+                usable = pending - pending % RECORD_SIZE
+                if not usable:
+                    continue
+                started = time.perf_counter()
+                records = decode_records(view[:usable])
+                self.stats.decode_latency.observe(time.perf_counter() - started)
+                # keep an incomplete trailing record for the next read
+                view[: pending - usable] = view[usable:pending]
+                pending -= usable
+                logger.debug("Read %d records from %s", len(records), self.device)
+                self.stats.records += len(records)
+                self._queue.put(records)
+                count += len(records)
+                if count >= 100:
+                    logger.info("read %d values from %s", count, self.device)
+                    count = 0
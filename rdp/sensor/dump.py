@@ -0,0 +1,105 @@
+import csv
+import itertools
+import logging
+import mmap
+import os
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from .record import RECORD_SIZE
+
+logger = logging.getLogger("rdp.sensor")
+
+# the device record layout, see rdp.sensor.record.RECORD
+RECORD_DTYPE = np.dtype([("time", "<u8"), ("type", "<u4"), ("value", "<f4")])
+
+CSV_COLUMNS = {"time": 0, "type": 1, "value_type_id": 1, "value": 2}
+
+
+def dump_size(path: str) -> int:
+    """Number of whole records in a dump of the device"""
+    return os.path.getsize(path) // RECORD_SIZE
+
+
+def iter_dump_chunks(
+    path: str, chunk_size: int = 100000
+) -> Iterator[List[Tuple[int, int, float]]]:
+    """Decode a raw dump of the device in chunks
+
+    The file is memory mapped and viewed as a structured array without copying, only the
+    chunk being handed out is converted to python tuples. A trailing partial record is ignored.
+
+    Args:
+        path (str): the dump file.
+        chunk_size (int, optional): number of records per chunk. Defaults to 100000.
+
+    Yields:
+        List[Tuple[int, int, float]]: (time, type, value) tuples in file order.
+    """
+    size = os.path.getsize(path)
+    count = size // RECORD_SIZE
+    if size % RECORD_SIZE:
+        logger.warning("%s ends with a partial record of %d bytes", path, size % RECORD_SIZE)
+    if not count:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        records = np.frombuffer(mapped, dtype=RECORD_DTYPE, count=count)
+        try:
+            for first in range(0, count, chunk_size):
+                yield records[first : first + chunk_size].tolist()
+        finally:
+            # the mapping cannot be closed while the array still exports its buffer
+            del records
+
+
+def iter_csv_chunks(path: str, chunk_size: int = 100000) -> Iterator[List[Tuple[int, int, float]]]:
+    """Read a csv export in chunks
+
+    The columns are time, value type id and value. A header row naming the columns time,
+    type (or value_type_id) and value may give them in any order.
+
+    Args:
+        path (str): the csv file.
+        chunk_size (int, optional): number of records per chunk. Defaults to 100000.
+
+    Raises:
+        ValueError: Thrown if a row cannot be parsed
+
+    Yields:
+        List[Tuple[int, int, float]]: (time, type, value) tuples in file order.
+    """
+    with open(path, newline="") as f:
+        rows = csv.reader(f)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = (0, 1, 2)
+        first_line = 2
+        chunk = []
+        names = [name.strip().lower() for name in header]
+        if set(names) & set(CSV_COLUMNS):
+            positions = {
+                CSV_COLUMNS[name]: index for index, name in enumerate(names) if name in CSV_COLUMNS
+            }
+            if sorted(positions) != [0, 1, 2]:
+                raise ValueError("%s: header needs time, type and value columns" % path)
+            columns = (positions[0], positions[1], positions[2])
+        else:
+            rows = itertools.chain([header], rows)
+            first_line = 1
+        time_column, type_column, value_column = columns
+        for line, row in enumerate(rows, first_line):
+            if not row:
+                continue
+            try:
+                chunk.append(
+                    (int(row[time_column]), int(row[type_column]), float(row[value_column]))
+                )
+            except (IndexError, ValueError) as error:
+                raise ValueError("%s:%d: %s" % (path, line, error))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
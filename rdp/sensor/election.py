@@ -0,0 +1,185 @@
+import fcntl
+import logging
+import os
+import threading
+from typing import Callable
+
+from .reader import Reader
+
+logger = logging.getLogger("rdp.sensor")
+
+# upper bound of the pause after failed starts of the reader, see IngestService
+MAX_RETRY_INTERVAL = 60.0
+
+
+class IngestLock:
+    """Exclusive lock on a file, held by the one process with ingest duty.
+
+    The lock is an flock on the open file, the kernel releases it when the process exits
+    or dies, so a crashed ingest process never leaves a stale lock behind. The holder writes
+    its pid into the file for the operators.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: int = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """Take the lock
+
+        Args:
+            blocking (bool, optional): If set, wait until the lock is free. Defaults to False.
+
+        Returns:
+            bool: True if the lock is held by this object now.
+        """
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+        os.ftruncate(fd, 0)
+        os.write(fd, b"%d\n" % os.getpid())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def holder(self) -> int:
+        """pid written by the newest holder, None if unknown"""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+
+class IngestService:
+    """Run a Reader only in the process holding the IngestLock.
+
+    Every process of a deployment may run an IngestService. A thread tries to take the lock
+    every retry_interval seconds, the process which gets it builds a Reader with make_reader
+    and starts it. The other processes stay candidates: once the holder stops or dies, the
+    lock is released and one of them takes over within retry_interval seconds.
+
+    If the reader cannot be built or started, the process gives the lock up again and stays
+    a candidate. It waits twice as long after every failure, up to MAX_RETRY_INTERVAL
+    seconds, so a healthy candidate takes over meanwhile.
+
+    Args:
+        make_reader (Callable[[], Reader]): builds the reader of the process once it holds the
+            lock.
+        lock (IngestLock): the lock shared by all candidates.
+        retry_interval (float, optional): seconds between two attempts to take the lock. Defaults
+            to 1.0.
+        on_leader (Callable[[], None], optional): called after taking the lock, before the reader
+            starts. Defaults to None.
+        on_resign (Callable[[], None], optional): called after giving the lock up on a failed
+            start, undoes on_leader. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        make_reader: Callable[[], Reader],
+        lock: IngestLock,
+        retry_interval: float = 1.0,
+        on_leader: Callable[[], None] = None,
+        on_resign: Callable[[], None] = None,
+    ):
+        self.reader: Reader = None
+        self._make_reader = make_reader
+        self._lock = lock
+        self._retry_interval = retry_interval
+        self._on_leader = on_leader
+        self._on_resign = on_resign
+        self._stopping = threading.Event()
+        self._leading = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def leader(self) -> bool:
+        """True while this process has ingest duty"""
+        return self._leading.is_set()
+
+    def wait_leader(self, timeout: float = None) -> bool:
+        """Wait until this process has ingest duty, return False on timeout"""
+        return self._leading.wait(timeout)
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="rdp-ingest-election", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the reader if this process leads, then give up the lock"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        self._leading.clear()
+        self._lock.release()
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                acquired = self._lock.acquire()
+            except OSError as error:
+                logger.error("Taking the ingest lock %s failed: %s", self._lock.path, error)
+                acquired = False
+            if acquired:
+                if self._lead():
+                    return
+                failures += 1
+                self._stopping.wait(min(self._retry_interval * 2**failures, MAX_RETRY_INTERVAL))
+            else:
+                self._stopping.wait(self._retry_interval)
+
+    def _lead(self) -> bool:
+        """Start the reader after taking the lock, give the lock up again if that fails"""
+        logger.info("Took the ingest lock %s, starting the reader", self._lock.path)
+        try:
+            if self._on_leader is not None:
+                self._on_leader()
+            self.reader = self._make_reader()
+            self.reader.start()
+        except Exception:
+            logger.exception(
+                "Starting the reader failed, giving up the ingest lock %s", self._lock.path
+            )
+            self._resign()
+            return False
+        self._leading.set()
+        return True
+
+    def _resign(self) -> None:
+        if self.reader is not None:
+            try:
+                self.reader.stop()
+            except Exception:
+                logger.exception("Stopping the failed reader failed")
+            self.reader = None
+        self._lock.release()
+        if self._on_resign is not None:
+            try:
+                self._on_resign()
+            except Exception:
+                logger.exception("Resigning from the ingest duty failed")
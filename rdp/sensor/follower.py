@@ -0,0 +1,103 @@
+import logging
+import threading
+from typing import Dict
+
+from rdp.crud import Crud
+
+from .hub import Hub
+from .reader import load_recent
+from .recent import RecentValues
+
+logger = logging.getLogger("rdp.sensor")
+
+
+class Follower:
+    """Follow the values stored by another process, in a worker without ingest duty.
+
+    The recent value buffers and the hub of a process are fed by its Reader. A process
+    without a Reader polls the database every poll_interval seconds for values with an id
+    above the newest one seen and hands them to its buffers and subscribers, so the value
+    streams and the recent buffers of every worker show the stored values. Values stored
+    with ids below the newest seen, e.g. by a backfill, are not followed. A value of a type
+    missing from the value type cache makes the cache reload, the type was added by the
+    other process.
+
+    Args:
+        crud (Crud): the database.
+        hub (Hub, optional): gets the new values. Defaults to None.
+        recent (RecentValues, optional): gets the new values, it is loaded on start. Defaults to
+            None.
+        poll_interval (float, optional): seconds between two polls. Defaults to 0.5.
+        batch_size (int, optional): maximum values fetched per query. Defaults to 10000.
+    """
+
+    def __init__(
+        self,
+        crud: Crud,
+        hub: Hub = None,
+        recent: RecentValues = None,
+        poll_interval: float = 0.5,
+        batch_size: int = 10000,
+    ):
+        self.last_id = 0
+        self._crud = crud
+        self._hub = hub
+        self._recent = recent
+        self._poll_interval = poll_interval
+        self._batch_size = batch_size
+        self._last_ids: Dict[int, int] = {}
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self) -> None:
+        self.last_id = self._crud.get_last_value_id()
+        if self._recent is not None:
+            # values stored while loading come again with the first poll, _last_ids skips them
+            self._last_ids = load_recent(self._crud, self._recent)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="rdp-follower", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling after handing out the values stored so far"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.poll()
+
+    def poll(self) -> int:
+        """Hand out the values stored since the last poll
+
+        Returns:
+            int: number of new values.
+        """
+        count = 0
+        while True:
+            rows = self._crud.get_value_rows_since(self.last_id, self._batch_size)
+            if not rows:
+                return count
+            complete = len(rows) < self._batch_size
+            self.last_id = rows[-1][0]
+            rows = [row for row in rows if row[0] > self._last_ids.get(row[2], 0)]
+            for row in rows:
+                self._last_ids[row[2]] = row[0]
+            unknown = {row[2] for row in rows if row[2] not in self._crud.value_type_cache}
+            for value_type_id in unknown:
+                self._crud.invalidate_value_type(value_type_id)
+            if rows:
+                if self._recent is not None:
+                    self._recent.extend(rows)
+                if self._hub is not None:
+                    self._hub.publish(rows)
+                count += len(rows)
+            if complete:
+                return count
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self._poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Following the stored values failed")
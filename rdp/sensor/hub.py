@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Iterable, List, Set, Tuple
+
+POLICIES = ("drop", "coalesce")
+
+
+class Subscription:
+    """Bounded queue of one subscriber.
+
+    Values are offered by the publishing thread and consumed by an asyncio task. When the
+    queue is full the policy decides what is lost: "drop" discards the oldest values,
+    "coalesce" keeps only the newest value of every value type. Lost values are counted in
+    dropped.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        type_id: int = None,
+        maxsize: int = 1000,
+        policy: str = "drop",
+    ):
+        if policy not in POLICIES:
+            raise ValueError("unknown policy: %s" % policy)
+        self.type_id = type_id
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._queue: Deque[Tuple[int, int, int, float]] = deque()
+        self._event = asyncio.Event()
+        self._notified = False
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def offer(self, values: Iterable[Tuple[int, int, int, float]]) -> None:
+        """Queue values, called from the publishing thread"""
+        if self.type_id is not None:
+            values = [value for value in values if value[2] == self.type_id]
+        if not values:
+            return
+        with self._lock:
+            if self.closed:
+                return
+            self._queue.extend(values)
+            if len(self._queue) > self.maxsize and self.policy == "coalesce":
+                latest = {value[2]: value for value in self._queue}
+                self.dropped += len(self._queue) - len(latest)
+                self._queue = deque(sorted(latest.values()))
+            while len(self._queue) > self.maxsize:
+                self._queue.popleft()
+                self.dropped += 1
+            notify = not self._notified
+            self._notified = True
+        if notify:
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                # the event loop of the subscriber is gone
+                self.closed = True
+
+    def drain(self) -> List[Tuple[int, int, int, float]]:
+        """Take all queued values without waiting"""
+        with self._lock:
+            values = list(self._queue)
+            self._queue.clear()
+            self._notified = False
+            self._event.clear()
+        return values
+
+    async def get(self) -> List[Tuple[int, int, int, float]]:
+        """Wait for and take all queued values
+
+        Returns:
+            List[Tuple[int, int, int, float]]: (id, time, value type id, value) tuples in
+                publishing order.
+        """
+        while True:
+            values = self.drain()
+            if values:
+                return values
+            await self._event.wait()
+
+
+class Hub:
+    """In process fan-out of freshly stored values to any number of subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Set[Subscription] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(
+        self, type_id: int = None, maxsize: int = 1000, policy: str = "drop"
+    ) -> Subscription:
+        """Subscribe the running asyncio task to new values
+
+        Args:
+            type_id (int, optional): If set, only values of this type are delivered. Defaults to
+                None.
+            maxsize (int, optional): maximum number of queued values. Defaults to 1000.
+            policy (str, optional): "drop" or "coalesce", see Subscription. Defaults to "drop".
+
+        Returns:
+            Subscription: the queue to read from, unsubscribe it when done.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), type_id, maxsize, policy)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, values: Iterable[Tuple[int, int, int, float]]) -> None:
+        """Deliver stored values to all subscribers, never blocks on slow subscribers"""
+        values = list(values)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(values)
+            if subscription.closed:
+                self.unsubscribe(subscription)
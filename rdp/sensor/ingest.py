@@ -0,0 +1,245 @@
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import BinaryIO, Deque, Dict, List, Sequence, Tuple
+
+from rdp.metrics import HistogramValue
+
+from .record import RECORD_SIZE, decode_records, encode_records
+
+POLICIES = ("block", "drop-oldest", "spill")
+
+Record = Tuple[int, int, float]
+
+
+@dataclass
+class IngestStats:
+    """Counters of the ingest pipeline
+
+    Attributes:
+        depth (int): records waiting in memory or in the spill file.
+        max_depth (int): highest depth seen.
+        enqueued (int): records handed to the queue.
+        dropped (int): records discarded because the queue was full.
+        spilled (int): records written to the spill file.
+        blocked_seconds (float): time the producer waited for room.
+        skipped (int): records of the startup replay not written because they are not newer than
+            the high-water mark of their type.
+        duplicates (int): records written but ignored by the database as already stored.
+        committed (int): records stored in the database.
+        commits (int): number of database transactions.
+        retries (int): transactions repeated after a failure.
+        failed (int): records lost because their transaction failed on every retry.
+        commit_seconds (float): total time spent in commits.
+        last_commit_seconds (float): duration of the newest commit.
+        max_commit_seconds (float): duration of the slowest commit.
+        commit_latency (HistogramValue): distribution of the commit durations in seconds.
+    """
+
+    depth: int = 0
+    max_depth: int = 0
+    enqueued: int = 0
+    dropped: int = 0
+    spilled: int = 0
+    blocked_seconds: float = 0.0
+    skipped: int = 0
+    duplicates: int = 0
+    committed: int = 0
+    commits: int = 0
+    retries: int = 0
+    failed: int = 0
+    commit_seconds: float = 0.0
+    last_commit_seconds: float = 0.0
+    max_commit_seconds: float = 0.0
+    commit_latency: HistogramValue = field(
+        default_factory=HistogramValue, compare=False, repr=False
+    )
+
+    def commit(self, count: int, seconds: float) -> None:
+        self.committed += count
+        self.commits += 1
+        self.commit_seconds += seconds
+        self.last_commit_seconds = seconds
+        self.max_commit_seconds = max(self.max_commit_seconds, seconds)
+        self.commit_latency.observe(seconds)
+
+
+class HighWaterMarks:
+    """Time of the newest stored value per value type, as loaded on startup.
+
+    A device replays its records after a restart, records not newer than the mark of their
+    type are stored already and can be skipped without asking the database. The marks only
+    cover this replay: the first record of a type newer than its mark ends the replay of the
+    type and drops its mark, every later record of the type is handed on, late ones too.
+    Replays of several devices measuring the same type may interleave, so the marks are only
+    safe if every type is measured by one device.
+    """
+
+    def __init__(self, marks: Dict[int, int] = None):
+        self._marks: Dict[int, int] = dict(marks or {})
+
+    def __getitem__(self, value_type_id: int) -> int:
+        return self._marks[value_type_id]
+
+    def __contains__(self, value_type_id: int) -> bool:
+        return value_type_id in self._marks
+
+    def __bool__(self) -> bool:
+        return bool(self._marks)
+
+    def load(self, marks: Dict[int, int]) -> None:
+        self._marks = dict(marks)
+
+    def filter(self, records: Sequence[Record]) -> List[Record]:
+        """The records newer than the mark of their type, ending the replay of their type"""
+        marks = self._marks
+        fresh = []
+        for record in records:
+            mark = marks.get(record[1])
+            if mark is not None:
+                if record[0] <= mark:
+                    continue
+                del marks[record[1]]
+            fresh.append(record)
+        return fresh
+
+
+class IngestQueue:
+    """Bounded queue between the device reader and the database writer.
+
+    put never waits for the database. When maxsize records are queued, the policy decides
+    what happens to new records: "block" makes the producer wait for room, "drop-oldest"
+    discards the oldest queued records and "spill" appends them to a file which is drained
+    after the records in memory, so the order of the records is kept.
+    """
+
+    def __init__(self, maxsize: int = 100000, policy: str = "block", spill_path: str = None):
+        if policy not in POLICIES:
+            raise ValueError("unknown policy: %s" % policy)
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least one")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.stats = IngestStats()
+        self._spill_path = spill_path
+        self._spill: BinaryIO = None
+        self._spill_read = 0
+        self._spill_end = 0
+        self._records: Deque[Record] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._records) + (self._spill_end - self._spill_read) // RECORD_SIZE
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _update_depth(self) -> None:
+        self.stats.depth = len(self)
+        self.stats.max_depth = max(self.stats.max_depth, self.stats.depth)
+
+    def _write_spill(self, records: Sequence[Record]) -> None:
+        if self._spill is None:
+            if self._spill_path is None:
+                self._spill = tempfile.TemporaryFile()
+            else:
+                self._spill = open(self._spill_path, "w+b")
+        self._spill.seek(self._spill_end)
+        self._spill.write(encode_records(records))
+        self._spill.flush()
+        self._spill_end += len(records) * RECORD_SIZE
+        self.stats.spilled += len(records)
+
+    def _read_spill(self, count: int) -> List[Record]:
+        self._spill.seek(self._spill_read)
+        data = self._spill.read(min(count * RECORD_SIZE, self._spill_end - self._spill_read))
+        self._spill_read += len(data)
+        if self._spill_read == self._spill_end:
+            # drained, start over at the beginning of the file
+            self._spill.truncate(0)
+            self._spill_read = self._spill_end = 0
+        return decode_records(data)
+
+    def put(self, records: Sequence[Record]) -> None:
+        """Queue (time, type, value) records, called by the producer
+
+        Records put after close are counted as dropped.
+        """
+        with self._condition:
+            self.stats.enqueued += len(records)
+            if self._closed:
+                self.stats.dropped += len(records)
+                return
+            if self.policy == "block":
+                index = 0
+                while index < len(records):
+                    if len(self._records) >= self.maxsize:
+                        waiting = time.monotonic()
+                        while len(self._records) >= self.maxsize and not self._closed:
+                            self._condition.wait()
+                        self.stats.blocked_seconds += time.monotonic() - waiting
+                        if self._closed:
+                            self.stats.dropped += len(records) - index
+                            break
+                    room = self.maxsize - len(self._records)
+                    self._records.extend(records[index : index + room])
+                    index += room
+                    self._update_depth()
+                    self._condition.notify_all()
+            elif self.policy == "drop-oldest":
+                self._records.extend(records)
+                overflow = len(self._records) - self.maxsize
+                for _ in range(overflow):
+                    self._records.popleft()
+                if overflow > 0:
+                    self.stats.dropped += overflow
+            else:
+                # once spilling started, new records queue up behind the spilled ones
+                room = 0 if self._spill_end else max(self.maxsize - len(self._records), 0)
+                self._records.extend(records[:room])
+                if len(records) > room:
+                    self._write_spill(records[room:])
+            self._update_depth()
+            self._condition.notify_all()
+
+    def get(self, max_items: int, timeout: float) -> List[Record]:
+        """Take a batch of records, called by the consumer
+
+        Waits for the first record, then up to timeout seconds for max_items records.
+
+        Args:
+            max_items (int): maximum number of returned records.
+            timeout (float): seconds to wait for a full batch once a record is queued.
+
+        Returns:
+            List[Record]: the oldest queued records, empty once the queue is closed and drained.
+        """
+        with self._condition:
+            while not len(self) and not self._closed:
+                self._condition.wait()
+            deadline = time.monotonic() + timeout
+            while len(self) < max_items and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            count = min(max_items, len(self._records))
+            batch = [self._records.popleft() for _ in range(count)]
+            if len(batch) < max_items and self._spill_end:
+                batch.extend(self._read_spill(max_items - len(batch)))
+            if not batch and self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            self._update_depth()
+            self._condition.notify_all()
+            return batch
+
+    def close(self) -> None:
+        """Refuse new records and wake up all waiting threads, queued records can still be taken"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
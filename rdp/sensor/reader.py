@@ -1,58 +1,222 @@
 import logging
-import struct
 import threading
 import time
+from typing import Dict, List, Sequence, Tuple
 
+from sqlalchemy.exc import OperationalError
+
+from rdp.config import Config
 from rdp.crud import Crud
 
+from .device import DeviceReader, DeviceStats
+from .hub import Hub
+from .ingest import HighWaterMarks, IngestQueue, IngestStats
+from .recent import RecentValues
+from .record import RECORD, RECORD_SIZE, decode_records  # noqa: F401, kept importable from here
+
 logger = logging.getLogger("rdp.sensor")
 
 
+def load_recent(crud: Crud, recent: RecentValues) -> Dict[int, int]:
+    """Fill the recent value buffers with the newest stored values of every type
+
+    Returns:
+        Dict[int, int]: the highest loaded value id by value type id.
+    """
+    # read first, a backfill racing the load invalidates the buffers once it is seen
+    backfill, _ = crud.get_backfill()
+    rows_by_type = {}
+    for value_type in crud.get_value_types():
+        values = crud.get_recent_values(value_type.id, recent.capacity(value_type.id))
+        rows_by_type[value_type.id] = [
+            (value.id, value.time, value.value_type_id, value.value) for value in values
+        ]
+    recent.load(rows_by_type, backfill)
+    return {type_id: max(row[0] for row in rows) for type_id, rows in rows_by_type.items() if rows}
+
+
 class Reader:
-    def __init__(self, crud: Crud, device: str = "/dev/rdp_cdev"):
+    """Read the sensor devices and store their records.
+
+    Every device is drained by a DeviceReader thread of its own, all of them feed one
+    IngestQueue, so a slow commit never stalls draining a device. The writer thread takes
+    batches of up to commit_size records, waiting at most commit_interval seconds for a
+    batch to fill, and stores each batch in one transaction. backpressure selects the
+    IngestQueue policy once queue_size records are waiting.
+
+    Records are written with ON CONFLICT DO NOTHING, so replayed records never fail a
+    transaction. A transaction failing on the database, e.g. when it is locked, is repeated up
+    to commit_retries times, waiting retry_delay seconds and twice as long after every further
+    failure, the devices keep filling the queue meanwhile. Only then the batch is lost, on
+    any other error at once. With skip_stored, the records replayed by the devices on startup
+    which are not newer than the newest stored value of their type are dropped before the
+    database is asked at all, see HighWaterMarks. Only use it if every type is measured by
+    one device.
+
+    Every retention_interval seconds the writer thread lets the Crud drop the partitions past
+    their retention, see Crud.apply_retention. Sealing the values past their age takes many
+    transactions, a sealer thread of its own runs it every retention_interval seconds, so
+    the commits only ever wait for one of them, see Crud.apply_sealing. Before sealing it
+    rebuilds stale rollups the same way, see Crud.rebuild_stale_rollups.
+    """
+
+    def __init__(
+        self,
+        crud: Crud,
+        device: str = "/dev/rdp_cdev",
+        batch_size: int = 256,
+        poll_interval: float = 0.1,
+        commit_size: int = 1000,
+        commit_interval: float = 0.5,
+        hub: Hub = None,
+        recent: RecentValues = None,
+        queue_size: int = 100000,
+        backpressure: str = "block",
+        spill_path: str = None,
+        devices: Sequence[str] = None,
+        skip_stored: bool = False,
+        retention_interval: float = 3600.0,
+        commit_retries: int = 5,
+        retry_delay: float = 0.1,
+    ):
         self._crud = crud
-        self._device = device
-        self._thread: threading.Thread = None
+        self._commit_size = commit_size
+        self._commit_interval = commit_interval
+        self._hub = hub
+        self._recent = recent
+        self._queue = IngestQueue(queue_size, backpressure, spill_path)
+        self._devices = [
+            DeviceReader(path, self._queue, batch_size, poll_interval)
+            for path in (devices if devices is not None else [device])
+        ]
+        self._marks = HighWaterMarks() if skip_stored else None
+        self._retention_interval = retention_interval
+        self._commit_retries = commit_retries
+        self._retry_delay = retry_delay
+        self._next_retention = 0.0
+        self._stopping = threading.Event()
+        self._writer_thread: threading.Thread = None
+        self._sealer_thread: threading.Thread = None
+
+    @classmethod
+    def from_config(
+        cls, crud: Crud, config: Config, hub: Hub = None, recent: RecentValues = None
+    ) -> "Reader":
+        """Build the reader of a deployment from its settings"""
+        return cls(
+            crud,
+            devices=config.devices,
+            commit_size=config.commit_size,
+            commit_interval=config.commit_interval,
+            skip_stored=config.skip_stored,
+            hub=hub,
+            recent=recent,
+            queue_size=config.queue_size,
+            backpressure=config.backpressure,
+            spill_path=config.spill_path,
+        )
+
+    @property
+    def stats(self) -> IngestStats:
+        """Counters of the queue and the writer"""
+        return self._queue.stats
+
+    @property
+    def device_stats(self) -> Dict[str, DeviceStats]:
+        """Counters of every device by path"""
+        return {device.device: device.stats for device in self._devices}
 
     def start(self) -> None:
-        self._thread = threading.Thread(target=self._run)
-        self._thread.start()
+        if self._recent is not None:
+            self.warm_recent()
+        if self._marks is not None:
+            self._marks.load(self._crud.get_high_water_marks())
+        self._stopping.clear()
+        self._writer_thread = threading.Thread(target=self._write, name="rdp-writer")
+        self._writer_thread.start()
+        self._sealer_thread = threading.Thread(target=self._seal, name="rdp-sealer", daemon=True)
+        self._sealer_thread.start()
+        for device in self._devices:
+            device.start()
 
     def stop(self):
-        thread = self._thread
-        self._thread = None
-        thread.join()
-
-    def _run(self) -> None:
-        count = 0
-        while self._thread is not None:
-            logger.info("A")
-            with open("/dev/rdp_cdev", "rb") as f:
-                test = f.read(16)
-                for i in range(16):
-                    if i % 2:
-                        print("  ", end="")
-                value_time = 0
-                for i in range(8):
-                    value_time |= test[i] << 8 * i
-                type_num = 0
-                for i in range(4):
-                    type_num |= test[i + 8] << 8 * i
-                value = 0.0
-                value = struct.unpack("f", test[-4::])
-                logger.debug(
-                    "Read one time: %d type :%d and value %f",
-                    value_time,
-                    type_num,
-                    value[0],
+        """Stop reading all devices, wait until all queued records are stored"""
+        for device in self._devices:
+            device.signal_stop()
+        for device in self._devices:
+            device.join()
+        self._queue.close()
+        self._stopping.set()
+        self._writer_thread.join()
+        self._sealer_thread.join()
+
+    def warm_recent(self) -> None:
+        """Fill the recent value buffers with the newest stored values of every type"""
+        load_recent(self._crud, self._recent)
+
+    def _committed(self, rows: List[Tuple[int, int, int, float]]) -> None:
+        if self._recent is not None:
+            self._recent.extend(rows)
+        if self._hub is not None:
+            self._hub.publish(rows)
+
+    def _apply_retention(self) -> None:
+        now = time.monotonic()
+        if now < self._next_retention:
+            return
+        self._next_retention = now + self._retention_interval
+        try:
+            self._crud.apply_retention()
+        except Exception:
+            logger.exception("Applying the retention failed")
+
+    def _seal(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._crud.rebuild_stale_rollups(stop=self._stopping.is_set)
+            except Exception:
+                logger.exception("Rebuilding the stale rollups failed")
+            try:
+                self._crud.apply_sealing(stop=self._stopping.is_set)
+            except Exception:
+                logger.exception("Sealing the values failed")
+            self._stopping.wait(self._retention_interval)
+
+    def _store(self, records: List[Tuple[int, int, float]]) -> List[Tuple[int, int, int, float]]:
+        """Store a batch, repeating transactions failed on the database with a growing delay"""
+        delay = self._retry_delay
+        for _ in range(self._commit_retries):
+            try:
+                return self._crud.insert_values(records, skip_duplicates=True, backfill=False)
+            except OperationalError as error:
+                self.stats.retries += 1
+                logger.warning(
+                    "Storing %d values failed, retrying in %.1f s: %s", len(records), delay, error
                 )
-                try:
-                    self._crud.add_value(value_time, type_num, value[0])
-                except self._crud.IntegrityError:
-                    logger.info("All Values read")
-                    break
-            time.sleep(0.1)
-            count += 1
-            if count % 100 == 0:
-                logger.info("read 100 values")
-                count = 0
+                time.sleep(delay)
+                delay *= 2
+        return self._crud.insert_values(records, skip_duplicates=True, backfill=False)
+
+    def _write(self) -> None:
+        while True:
+            self._apply_retention()
+            records = self._queue.get(self._commit_size, self._commit_interval)
+            if not records:
+                break
+            if self._marks:
+                fresh = self._marks.filter(records)
+                self.stats.skipped += len(records) - len(fresh)
+                if not fresh:
+                    continue
+                records = fresh
+            started = time.perf_counter()
+            try:
+                rows = self._store(records)
+            except Exception:
+                # losing one batch beats losing the writer thread
+                self.stats.failed += len(records)
+                logger.exception("Storing %d values failed, they are lost", len(records))
+                continue
+            self.stats.commit(len(rows), time.perf_counter() - started)
+            self.stats.duplicates += len(records) - len(rows)
+            self._committed(rows)
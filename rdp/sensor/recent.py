@@ -0,0 +1,208 @@
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Row = Tuple[int, int, int, float]
+
+
+class RecentSeries:
+    """Fixed capacity ring buffer of the newest values of one value type.
+
+    ids and times are kept in array("q"), the values in array("d"), so the memory use is
+    24 bytes per slot. covered_from is the oldest time for which the buffer is known to
+    hold every stored value, None means it is not known for any time.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least one")
+        self.capacity = capacity
+        self.covered_from: Optional[int] = None
+        self._ids = array("q", bytes(8 * capacity))
+        self._times = array("q", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+        self._ordered = True
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, index: int) -> int:
+        return (self._start + index) % self.capacity
+
+    def append(self, value_id: int, value_time: int, value: float) -> None:
+        if self._size and value_time < self._times[self._slot(self._size - 1)]:
+            self._ordered = False
+        if self._size == self.capacity:
+            evicted = self._times[self._start]
+            if self.covered_from is not None and evicted + 1 > self.covered_from:
+                self.covered_from = evicted + 1
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            slot = self._slot(self._size)
+            self._size += 1
+        self._ids[slot] = value_id
+        self._times[slot] = value_time
+        self._values[slot] = value
+
+    def covers(self, start: int = None) -> bool:
+        """Check if every stored value from start on is held"""
+        return self.covered_from is not None and start is not None and start >= self.covered_from
+
+    def latest(self) -> Optional[Tuple[int, int, float]]:
+        """(id, time, value) with the newest time or None if empty"""
+        if not self._size:
+            return None
+        if self._ordered:
+            slot = self._slot(self._size - 1)
+        else:
+            slot = max(
+                (self._slot(index) for index in range(self._size)),
+                key=lambda slot: (self._times[slot], self._ids[slot]),
+            )
+        return self._ids[slot], self._times[slot], self._values[slot]
+
+    def _first_index(self, start: int) -> int:
+        # binary search over the logical order, only valid while appends arrived in time order
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._times[self._slot(middle)] < start:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, start: int = None, end: int = None) -> List[Tuple[int, int, float]]:
+        """(id, time, value) tuples with start <= time <= end ordered by time and id"""
+        first = 0
+        if start is not None and self._ordered:
+            first = self._first_index(start)
+        result = []
+        for index in range(first, self._size):
+            slot = self._slot(index)
+            value_time = self._times[slot]
+            if start is not None and value_time < start:
+                continue
+            if end is not None and value_time > end:
+                if self._ordered:
+                    break
+                continue
+            result.append((self._ids[slot], value_time, self._values[slot]))
+        if not self._ordered:
+            result.sort(key=lambda row: (row[1], row[0]))
+        return result
+
+
+class RecentValues:
+    """Ring buffers of the newest values per value type, filled on ingest.
+
+    Answers latest value and recent window queries without touching the database. Every
+    value type gets default_capacity slots unless capacities says otherwise. A buffer claims
+    to cover the values from its oldest loaded or, for a type without loaded values, its first
+    ingested value on. Values stored past the ingest are not seen, a backfill moves the
+    covered range of every buffer past the times it wrote, see invalidate.
+    """
+
+    def __init__(self, default_capacity: int = 1000, capacities: Dict[int, int] = None):
+        self.default_capacity = default_capacity
+        self.capacities = dict(capacities or {})
+        self._lock = threading.Lock()
+        self._series: Dict[int, RecentSeries] = {}
+        # the backfill count seen, see Crud.get_backfill, and the time no buffer covers values
+        # before
+        self.backfill = 0
+        self._floor: Optional[int] = None
+
+    def __contains__(self, value_type_id) -> bool:
+        return value_type_id in self._series
+
+    def capacity(self, value_type_id: int) -> int:
+        return self.capacities.get(value_type_id, self.default_capacity)
+
+    def extend(self, rows: Iterable[Row]) -> None:
+        """Add stored (id, time, value type id, value) rows"""
+        with self._lock:
+            for value_id, value_time, value_type, value in rows:
+                series = self._series.get(value_type)
+                if series is None:
+                    series = self._series[value_type] = RecentSeries(self.capacity(value_type))
+                    # older values of the type may be stored already
+                    series.covered_from = (
+                        value_time if self._floor is None else max(value_time, self._floor)
+                    )
+                series.append(value_id, value_time, value)
+
+    def load(self, rows_by_type: Dict[int, List[Row]], backfill: int = 0) -> None:
+        """Replace all buffers with the newest rows read from the database
+
+        Args:
+            rows_by_type (Dict[int, List[Row]]): per value type the newest stored rows in ascending
+                time order, at most capacity of them.
+            backfill (int, optional): the backfill count read before the rows, see
+                Crud.get_backfill. Defaults to 0.
+        """
+        series_by_type = {}
+        for value_type_id, rows in rows_by_type.items():
+            if not rows:
+                continue
+            series = RecentSeries(self.capacity(value_type_id))
+            series.covered_from = rows[0][1]
+            for value_id, value_time, _, value in rows:
+                series.append(value_id, value_time, value)
+            series_by_type[value_type_id] = series
+        with self._lock:
+            self._series = series_by_type
+            self.backfill = backfill
+            self._floor = None
+
+    def invalidate(self, backfill: int, end_time: int) -> None:
+        """Stop covering the values up to the newest time written by the backfills
+
+        Args:
+            backfill (int): the backfill count, see Crud.get_backfill.
+            end_time (int): the newest time written by a backfill.
+        """
+        with self._lock:
+            self.backfill = backfill
+            if self._floor is None or end_time + 1 > self._floor:
+                self._floor = end_time + 1
+            for series in self._series.values():
+                series.covered_from = max(series.covered_from, self._floor)
+
+    def covers(self, value_type_id: int, start: int = None) -> bool:
+        """Check if the buffer holds every stored value of a type from start on"""
+        with self._lock:
+            series = self._series.get(value_type_id)
+            return series is not None and series.covers(start)
+
+    def latest(self, value_type_id: int = None) -> List[Row]:
+        """Newest (id, time, value type id, value) row of one or of all buffered types"""
+        with self._lock:
+            if value_type_id is None:
+                items = sorted(self._series.items())
+            else:
+                items = (
+                    [(value_type_id, self._series[value_type_id])]
+                    if value_type_id in self._series
+                    else []
+                )
+            result = []
+            for type_id, series in items:
+                latest = series.latest()
+                if latest is not None:
+                    result.append((latest[0], latest[1], type_id, latest[2]))
+            return result
+
+    def get(self, value_type_id: int, start: int = None, end: int = None) -> List[Row]:
+        """Buffered (id, time, value type id, value) rows of a type ordered by time and id"""
+        with self._lock:
+            series = self._series.get(value_type_id)
+            if series is None:
+                return []
+            return [
+                (value_id, value_time, value_type_id, value)
+                for value_id, value_time, value in series.range(start, end)
+            ]
@@ -0,0 +1,25 @@
+import struct
+from typing import List, Tuple
+
+RECORD = struct.Struct("<QIf")
+RECORD_SIZE = RECORD.size
+
+
+def decode_records(buffer) -> List[Tuple[int, int, float]]:
+    """decode a buffer of device records
+
+    Every record is 16 bytes long: a little endian uint64 unix time stamp, an uint32 value
+    type id and a float32 value.
+
+    Args:
+        buffer (bytes-like): buffer holding a whole number of records.
+
+    Returns:
+        List[Tuple[int, int, float]]: list of (time, type, value) tuples.
+    """
+    return list(RECORD.iter_unpack(buffer))
+
+
+def encode_records(records) -> bytes:
+    """encode (time, type, value) tuples in the device record format"""
+    return b"".join(RECORD.pack(*record) for record in records)
@@ -1,2 +1,2 @@
 # load fixtures
-from tests.fixtures import crud_in_memory, crud_session_in_memory
+from tests.fixtures import crud_in_memory, crud_session_in_memory, crud_file
@@ -1,7 +1,10 @@
+import time
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from rdp.crud import create_engines
 from rdp.crud.crud import Crud
 
 @pytest.fixture(scope="function")
@@ -16,3 +19,22 @@ def crud_session_in_memory():
     crud = Crud(engine)
     session = sessionmaker(bind=engine)
     yield (crud, session)
+
+@pytest.fixture(scope="function")
+def crud_file(tmp_path):
+    # a database file, the reader thread and the test thread each use connections of their own
+    engine, read_engine = create_engines("sqlite:///%s" % (tmp_path / "rdp.db"))
+    crud = Crud(engine, read_engine=read_engine)
+    yield crud
+    engine.dispose()
+    read_engine.dispose()
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    """Poll predicate until it holds, False once timeout seconds passed"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from rdp.analysis import align, align_many
+
+
+def test_align_locf():
+    times = np.array([10, 20, 30])
+    values = np.array([1.0, 2.0, 3.0])
+    grid = np.arange(5, 40, 5)
+    result = align(times, values, grid)
+    assert np.isnan(result[0])
+    assert result[1:].tolist() == [1.0, 1.0, 2.0, 2.0, 3.0, 3.0]
+
+    result = align(times, values, grid, tolerance=4)
+    assert np.isnan(result[[0, 2, 4, 6]]).all()
+    assert result[[1, 3, 5]].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_align_linear():
+    times = np.array([10, 20, 40])
+    values = np.array([1.0, 2.0, 4.0])
+    result = align(times, values, np.array([5, 10, 15, 30, 40, 45]), "linear")
+    assert np.isnan(result[[0, 5]]).all()
+    assert result[1:5].tolist() == [1.0, 1.5, 3.0, 4.0]
+
+    result = align(times, values, np.array([10, 15, 30]), "linear", tolerance=5)
+    assert result[:2].tolist() == [1.0, 1.5]
+    assert np.isnan(result[2])
+
+
+def test_align_many():
+    grid = np.array([0, 1, 2])
+    result = align_many(
+        {1: (np.array([0]), np.array([5.0])), 2: (np.array([]), np.array([]))}, grid
+    )
+    assert result[1].tolist() == [5.0, 5.0, 5.0]
+    assert np.isnan(result[2]).all()
+    with pytest.raises(ValueError):
+        align(np.array([0]), np.array([0.0]), grid, "nearest")
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from rdp.analysis import rolling, summarize
+
+
+def test_summarize():
+    values = np.arange(101, dtype=np.float64)
+    stats = summarize(values, [0, 50, 99.5], bins=4)
+    assert stats["count"] == 101
+    assert (stats["min"], stats["max"], stats["mean"]) == (0.0, 100.0, 50.0)
+    assert stats["std"] == pytest.approx(np.std(values))
+    assert stats["percentiles"] == {0.0: 0.0, 50.0: 50.0, 99.5: pytest.approx(99.5)}
+    assert stats["histogram"]["edges"] == [0.0, 25.0, 50.0, 75.0, 100.0]
+    assert stats["histogram"]["counts"] == [25, 25, 25, 26]
+
+    stats = summarize(values, [], bins=2, histogram_range=(0, 10))
+    assert stats["percentiles"] == {}
+    assert stats["histogram"]["counts"] == [5, 6]
+
+
+def test_summarize_empty():
+    stats = summarize(np.array([]), [50])
+    assert stats["count"] == 0 and stats["mean"] is None
+    assert stats["percentiles"] == {50.0: None}
+
+    with pytest.raises(ValueError):
+        summarize(np.array([1.0]), [101])
+    with pytest.raises(ValueError):
+        summarize(np.array([1.0]), bins=0)
+
+
+def test_rolling():
+    times = np.array([0, 1, 2, 5, 6])
+    values = np.array([1e9 + 1, 1e9 + 3, 1e9 + 5, 1e9 + 7, 1e9 + 9])
+    result = rolling(times, values, 3)
+    assert result["time"].tolist() == [0, 1, 2, 5, 6]
+    assert result["count"].tolist() == [1, 2, 3, 1, 2]
+    assert (result["mean"] - 1e9).tolist() == pytest.approx([1, 2, 3, 7, 8])
+    # large offsets do not cancel out the variance
+    assert result["std"].tolist() == pytest.approx([0, 1, np.std([1, 3, 5]), 0, 1])
+
+    result = rolling(times, values, 2, at=np.array([4, 6]))
+    assert result["count"].tolist() == [0, 2]
+    assert np.isnan(result["mean"][0])
+
+    assert rolling(np.array([]), np.array([]), 5)["count"].tolist() == []
+    with pytest.raises(ValueError):
+        rolling(times, values, 0)
+
+
+def test_rolling_matches_naive():
+    rng = np.random.default_rng(3)
+    times = np.sort(rng.integers(0, 1000, 500))
+    values = rng.normal(20, 5, 500)
+    result = rolling(times, values, 50)
+    for index in range(0, 500, 37):
+        window = values[(times > times[index] - 50) & (times <= times[index])]
+        assert result["count"][index] == len(window)
+        assert result["mean"][index] == pytest.approx(window.mean())
+        assert result["std"][index] == pytest.approx(window.std(), abs=1e-9)
@@ -0,0 +1,404 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from rdp.api import encoding, main
+from rdp.crud import AsyncCrud, Crud, create_async_engine, create_engines
+from rdp.sensor import Hub, IngestLock, IngestService, Reader, RecentValues
+from tests.fixtures import wait_for
+
+
+@pytest.fixture(scope="function")
+def api_crud(tmp_path):
+    url = "sqlite:///%s" % (tmp_path / "api.db")
+    engine, read_engine = create_engines(url)
+    main.crud = Crud(engine, read_engine=read_engine)
+    main.async_crud = AsyncCrud(create_async_engine(url), main.crud)
+    main.hub = Hub()
+    main.recent = RecentValues(default_capacity=100)
+    yield main.crud
+
+
+@pytest.fixture(scope="function")
+def client(api_crud: Crud):
+    # the startup event is not triggered, so no sensor reader is started
+    yield TestClient(main.app)
+
+
+def test_types(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(1, 1, 76.0), (1, 2, 180.0)])
+
+    response = client.get("/type/")
+    assert response.status_code == 200
+    assert [value_type["id"] for value_type in response.json()] == [1, 2]
+
+    response = client.get("/type/2/")
+    assert response.json() == {"id": 2, "type_name": "TYPE_2", "type_unit": "UNIT_2"}
+    assert client.get("/type/3/").status_code == 404
+
+
+def test_put_type(client: TestClient, api_crud: Crud):
+    api_crud.add_value(1, 1, 76.0)
+    assert client.get("/type/1/").json()["type_name"] == "TYPE_1"
+
+    response = client.put("/type/1/", json={"type_name": "weight", "type_unit": "kg"})
+    assert response.json() == {"id": 1, "type_name": "weight", "type_unit": "kg"}
+    assert client.get("/type/1/").json()["type_name"] == "weight"
+    assert client.get("/type/").json() == [{"id": 1, "type_name": "weight", "type_unit": "kg"}]
+    hits = api_crud.value_type_cache.hits
+    client.get("/type/")
+    assert api_crud.value_type_cache.hits == hits + 1
+
+
+def test_values(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, type_id, float(t)) for t in range(5) for type_id in (1, 2)])
+
+    response = client.get("/value/", params={"type_id": 1, "start": 1, "end": 3})
+    assert response.status_code == 200
+    assert [value["time"] for value in response.json()] == [1, 2, 3]
+    assert response.json()[0] == {"id": 3, "time": 1, "value": 1.0, "value_type_id": 1}
+    assert "X-Next-Cursor" not in response.headers
+    # the documented schema is unchanged by the fast path
+    schema = client.get("/openapi.json").json()["paths"]["/value/"]["get"]["responses"]["200"]
+    assert (
+        schema["content"]["application/json"]["schema"]["items"]["$ref"]
+        == "#/components/schemas/Value"
+    )
+
+
+def test_values_pages(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, float(t)) for t in range(10)])
+
+    times = []
+    params = {"limit": 4}
+    while True:
+        response = client.get("/value/", params=params)
+        times.extend(value["time"] for value in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["after"] = response.headers["X-Next-Cursor"]
+    assert times == list(range(10))
+
+    assert client.get("/value/", params={"after": "x"}).status_code == 400
+    assert client.get("/value/", params={"limit": 0}).status_code == 422
+
+
+def test_values_ndjson(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, float(t)) for t in range(10)])
+
+    response = client.get("/value/", params={"format": "ndjson", "start": 2, "limit": 3})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["time"] for line in lines] == [2, 3, 4]
+    assert set(lines[0]) == {"id", "time", "value", "value_type_id"}
+
+
+def test_values_columns(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, t / 2) for t in range(3)])
+
+    response = client.get("/value/", params={"format": "columns", "limit": 2})
+    assert response.json() == {
+        "id": [1, 2],
+        "time": [0, 1],
+        "value_type_id": [1, 1],
+        "value": [0.0, 0.5],
+    }
+    assert response.headers["X-Next-Cursor"] == "1,2"
+    response = client.get("/value/", params={"format": "columns", "type_id": 2})
+    assert response.json() == {"id": [], "time": [], "value_type_id": [], "value": []}
+
+def test_values_packed(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, type_id, t + type_id / 4) for t in range(10) for type_id in (1, 2)])
+
+    response = client.get("/value/", params={"type_id": 2, "format": "packed", "limit": 4})
+    assert response.headers["content-type"] == encoding.PACKED_MEDIA_TYPE
+    assert response.headers["X-Next-Cursor"] == "3,8"
+    columns = encoding.decode_packed(response.content)
+    assert columns["time"].tolist() == [0, 1, 2, 3]
+    assert columns["value"].dtype == np.float64 and columns["value"].tolist() == [
+        0.5,
+        1.5,
+        2.5,
+        3.5,
+    ]
+    assert columns["value_type_id"].tolist() == [2, 2, 2, 2]
+    assert columns["id"].tolist() == [2, 4, 6, 8]
+
+    response = client.get(
+        "/value/", params={"format": "packed", "precision": "float32", "start": 9}
+    )
+    columns = encoding.decode_packed(response.content)
+    assert len(response.content) == 16 + 2 * (8 + 8 + 4 + 4)
+    assert columns["value"].dtype == np.float32 and columns["value"].tolist() == [9.25, 9.5]
+
+    columns = encoding.decode_packed(
+        client.get("/value/", params={"format": "packed", "type_id": 3}).content
+    )
+    assert len(columns["time"]) == 0
+
+def test_values_arrow(client: TestClient, api_crud: Crud):
+    pyarrow = pytest.importorskip("pyarrow")
+    api_crud.add_values([(t, 1, t / 2) for t in range(5)])
+
+    response = client.get("/value/", params={"format": "arrow", "start": 1})
+    assert response.headers["content-type"] == encoding.ARROW_MEDIA_TYPE
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["id", "time", "value_type_id", "value"]
+    assert table.column("time").to_pylist() == [1, 2, 3, 4]
+    assert table.column("value").to_pylist() == [0.5, 1.0, 1.5, 2.0]
+
+def test_values_stats(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, float(t)) for t in range(101)] + [(0, 2, 5.0)])
+
+    response = client.get(
+        "/value/stats", params={"type_id": 1, "percentiles": "50,99.5", "bins": 4}
+    )
+    stats = response.json()
+    assert (stats["count"], stats["min"], stats["max"], stats["mean"]) == (101, 0.0, 100.0, 50.0)
+    assert stats["percentiles"] == {"50": 50.0, "99.5": 99.5}
+    assert stats["histogram"]["counts"] == [25, 25, 25, 26]
+
+    stats = client.get(
+        "/value/stats", params={"type_id": 1, "start": 10, "end": 19, "bins": 2, "hist_max": 30}
+    ).json()
+    assert stats["count"] == 10
+    assert stats["histogram"] == {"edges": [10.0, 20.0, 30.0], "counts": [10, 0]}
+
+    stats = client.get("/value/stats", params={"type_id": 3}).json()
+    assert stats["count"] == 0 and stats["std"] is None
+    assert client.get("/value/stats", params={"type_id": 1, "percentiles": "x"}).status_code == 400
+    assert (
+        client.get("/value/stats", params={"type_id": 1, "percentiles": "200"}).status_code == 400
+    )
+
+def test_values_rolling(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, float(t)) for t in range(0, 20, 2)])
+
+    result = client.get(
+        "/value/rolling", params={"type_id": 1, "window": 4, "start": 6, "end": 10}
+    ).json()
+    assert result["time"] == [6, 8, 10]
+    assert result["count"] == [2, 2, 2]
+    assert result["mean"] == [5.0, 7.0, 9.0]
+
+    result = client.get(
+        "/value/rolling", params={"type_id": 1, "window": 1, "step": 3, "start": 0, "end": 6}
+    ).json()
+    assert result["time"] == [0, 3, 6]
+    assert result["count"] == [1, 0, 1]
+    assert result["mean"] == [0.0, None, 6.0] and result["std"] == [0.0, None, 0.0]
+
+    response = client.get(
+        "/value/rolling", params={"type_id": 1, "window": 1, "step": 1, "start": 0, "end": 10**9}
+    )
+    assert response.status_code == 400
+
+def test_values_aligned(client: TestClient, api_crud: Crud):
+    api_crud.add_values(
+        [(t, 1, float(t)) for t in range(0, 100, 10)]
+        + [(t, 2, -float(t)) for t in range(5, 100, 20)]
+    )
+
+    result = client.get(
+        "/value/aligned", params={"type_ids": "1,2", "step": 10, "start": 20, "end": 50}
+    ).json()
+    assert result["time"] == [20, 30, 40, 50]
+    # type 2 is carried forward from before start
+    assert result["values"] == {"1": [20.0, 30.0, 40.0, 50.0], "2": [-5.0, -25.0, -25.0, -45.0]}
+
+    params = {"type_ids": "2", "step": 10, "start": 10, "end": 30, "method": "linear"}
+    assert client.get("/value/aligned", params=params).json()["values"]["2"] == [
+        -10.0,
+        -20.0,
+        -30.0,
+    ]
+
+    result = client.get("/value/aligned", params={"type_ids": "1,3", "step": 30}).json()
+    assert result["time"] == [0, 30, 60, 90]
+    assert result["values"]["3"] == [None, None, None, None]
+
+    assert client.get("/value/aligned", params={"type_ids": "a", "step": 1}).status_code == 400
+    assert (
+        client.get("/value/aligned", params={"type_ids": "1", "step": 1, "end": 10**9}).status_code
+        == 400
+    )
+
+def test_values_aggregate(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, float(t)) for t in range(120)])
+
+    response = client.get(
+        "/value/aggregate", params={"type_id": 1, "bucket": 60, "agg": "min,max,count"}
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"value_type_id": 1, "time": 0, "min": 0.0, "max": 59.0, "count": 60},
+        {"value_type_id": 1, "time": 60, "min": 60.0, "max": 119.0, "count": 60},
+    ]
+    assert client.get("/value/aggregate", params={"agg": "median"}).status_code == 400
+
+
+def test_values_lttb(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, 1, float(t % 10)) for t in range(120)])
+
+    response = client.get("/value/lttb", params={"type_id": 1, "points": 10})
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    assert response.json()[0] == {"value_type_id": 1, "time": 0, "value": 0.0}
+    assert client.get("/value/lttb", params={"type_id": 1, "points": 2}).status_code == 422
+
+
+def test_value_stream_websocket(client: TestClient):
+    with client.websocket_connect("/value/stream?type_id=1") as websocket:
+        main.hub.publish([(1, 1, 1, 76.0), (2, 1, 2, 180.0)])
+        assert websocket.receive_json() == {
+            "dropped": 0,
+            "values": [{"id": 1, "time": 1, "value_type_id": 1, "value": 76.0}],
+        }
+        main.hub.publish([(3, 2, 1, 77.0)])
+        assert websocket.receive_json()["values"] == [
+            {"id": 3, "time": 2, "value_type_id": 1, "value": 77.0}
+        ]
+    assert wait_for(lambda: len(main.hub) == 0)
+
+
+def test_value_stream_sse():
+    # the test client collects whole responses, so the endless event stream is read directly
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def run():
+        request = Request({"type": "http", "method": "GET", "headers": []}, receive)
+        response = await main.stream_values_sse(request, type_id=2, queue_size=1000, policy="drop")
+        assert response.media_type == "text/event-stream"
+        events = response.body_iterator
+        first = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        main.hub.publish([(1, 1, 1, 76.0), (2, 1, 2, 180.0)])
+        event = await asyncio.wait_for(first, 1)
+        await events.aclose()
+        return event
+
+    event = asyncio.run(run())
+    assert event.startswith("data: ") and event.endswith("\n\n")
+    assert json.loads(event[6:]) == {
+        "dropped": 0,
+        "values": [{"id": 2, "time": 1, "value_type_id": 2, "value": 180.0}],
+    }
+    assert len(main.hub) == 0
+
+
+def test_values_latest(client: TestClient, api_crud: Crud):
+    api_crud.add_values([(t, type_id, float(t)) for t in range(5) for type_id in (1, 2)])
+    # type 1 is buffered, type 2 is read from the database
+    main.recent.extend(api_crud.insert_values([(10, 1, 10.0)]))
+
+    response = client.get("/value/latest")
+    assert [(value["value_type_id"], value["time"]) for value in response.json()] == [
+        (1, 10),
+        (2, 4),
+    ]
+    assert client.get("/value/latest", params={"type_id": 2}).json()[0]["value"] == 4.0
+    assert client.get("/value/latest", params={"type_id": 3}).json() == []
+
+
+def test_values_from_recent(client: TestClient, api_crud: Crud):
+    # stored like the ingest does, which feeds the buffer itself
+    rows = api_crud.insert_values([(t, 1, float(t)) for t in range(150)], backfill=False)
+    main.recent.load({1: rows[-100:]})
+    # a marker only known to the buffer shows where the answer came from
+    main.recent.extend([(9999, 150, 1, -1.0)])
+
+    response = client.get("/value/", params={"type_id": 1, "start": 140})
+    assert [value["time"] for value in response.json()] == list(range(140, 151))
+    assert response.json()[-1] == {"id": 9999, "time": 150, "value": -1.0, "value_type_id": 1}
+
+    times = []
+    params = {"type_id": 1, "start": 140, "end": 149, "limit": 4}
+    while True:
+        response = client.get("/value/", params=params)
+        times.extend(value["time"] for value in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["after"] = response.headers["X-Next-Cursor"]
+    assert times == list(range(140, 150))
+
+    # older values are not buffered and come from the database
+    response = client.get("/value/", params={"type_id": 1, "start": 10, "end": 12})
+    assert [value["time"] for value in response.json()] == [10, 11, 12]
+    # without a start the buffer never claims to hold every value
+    assert len(client.get("/value/", params={"type_id": 1}).json()) == 150
+
+
+def test_values_backfilled_past_recent(client: TestClient, api_crud: Crud):
+    rows = api_crud.insert_values([(t, 1, float(t)) for t in range(100)], backfill=False)
+    main.recent.load({1: rows[-50:]})
+    # written past the ingest, e.g. by rdp-import in another process
+    api_crud.add_values([(75, 2, 1.0), (120, 1, 2.0)])
+
+    response = client.get("/value/", params={"type_id": 1, "start": 90})
+    assert [value["time"] for value in response.json()] == list(range(90, 100)) + [120]
+    assert client.get("/value/latest", params={"type_id": 1}).json()[0]["time"] == 120
+    assert not main.recent.covers(1, 120)
+
+    # values ingested after the backfill are covered again
+    main.recent.extend([(9999, 121, 1, -1.0)])
+    assert client.get("/value/", params={"type_id": 1, "start": 121}).json() == [
+        {"id": 9999, "time": 121, "value": -1.0, "value_type_id": 1}
+    ]
+
+
+def test_metrics(client: TestClient, api_crud: Crud, monkeypatch):
+    monkeypatch.setattr(main, "reader", Reader(api_crud, devices=["/dev/rdp_missing"]))
+    api_crud.add_values([(1, 1, 76.0)])
+    client.get("/type/1/")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert (
+        'rdp_http_request_duration_seconds_count{method="GET",route="/type/{id}/",status="200"}'
+        in text
+    )
+    assert 'rdp_ingest_records_total{state="committed"} 0' in text
+    assert 'rdp_device_records_total{device="/dev/rdp_missing"} 0' in text
+    assert "rdp_ingest_leader 1" in text
+    assert (
+        'rdp_value_type_cache_lookups_total{result="hit"} %d' % api_crud.value_type_cache.hits
+        in text
+    )
+    assert "rdp_value_type_cache_size 1" in text
+
+
+def test_metrics_ingest_role(client: TestClient, api_crud: Crud, tmp_path, monkeypatch):
+    # a resigned leader keeps no reader
+    def make_reader():
+        return Reader(api_crud, devices=["/dev/rdp_missing"])
+
+    service = IngestService(make_reader, IngestLock(str(tmp_path / "lock")))
+    monkeypatch.setattr(main, "ingest_service", service)
+    monkeypatch.setattr(main, "reader", make_reader())
+    text = client.get("/metrics").text
+    assert "rdp_ingest_leader 0" in text
+    assert "rdp_ingest_records_total" not in text
+
+    service.reader = make_reader()
+    service._leading.set()
+    text = client.get("/metrics").text
+    assert "rdp_ingest_leader 1" in text
+    assert 'rdp_ingest_records_total{state="committed"} 0' in text
+
+
+def test_profiler(client: TestClient, api_crud: Crud):
+    response = client.post("/metrics/profiler", params={"interval": 0.001})
+    assert response.json()["running"]
+    wait_for(lambda: main.profiler.samples > 0)
+    response = client.delete("/metrics/profiler")
+    assert not response.json()["running"]
+    assert response.json()["samples"] > 0
+    assert "rdp-profiler" not in client.get("/metrics/profiler").text
+    assert client.get("/metrics/profiler").text.strip()
@@ -0,0 +1,45 @@
+from sqlalchemy import create_engine
+
+from rdp.cli import import_main, rebuild_rollups_main
+from rdp.crud import Crud, MonthlyPartitions
+from rdp.sensor.record import encode_records
+
+
+def test_import_main(tmp_path):
+    dump = tmp_path / "rdp_cdev.dump"
+    dump.write_bytes(encode_records([(1000 + i, 1, float(i)) for i in range(20)]))
+    export = tmp_path / "export.csv"
+    export.write_text("time,type,value\n" + "".join("%d,2,%d.5\n" % (t, t) for t in range(5)))
+    url = "sqlite:///%s" % (tmp_path / "rdp.db")
+
+    import_main(["--database", url, "--chunk-size", "7", str(dump), str(export)])
+    # importing again does not duplicate anything
+    import_main(["--database", url, str(dump)])
+
+    crud = Crud(create_engine(url))
+    assert len(crud.get_values(value_type_id=1)) == 20
+    assert [value.value for value in crud.get_values(value_type_id=2)] == [0.5, 1.5, 2.5, 3.5, 4.5]
+
+
+def test_rebuild_rollups_main_partitions(tmp_path, monkeypatch):
+    url = "sqlite:///%s" % (tmp_path / "rdp.db")
+    Crud(create_engine(url), partitions=MonthlyPartitions()).add_values(
+        [(1704067200 + t, 1, 1.0) for t in range(10)]
+    )
+
+    # without RDP_PARTITIONING the partitions are found all the same
+    monkeypatch.delenv("RDP_PARTITIONING", raising=False)
+    rebuild_rollups_main(["--database", url])
+    crud = Crud(create_engine(url))
+    assert crud.get_aggregated_values(1, bucket=3600) == [
+        {
+            "value_type_id": 1,
+            "time": 1704067200,
+            "min": 1.0,
+            "max": 1.0,
+            "mean": 1.0,
+            "count": 10,
+            "last": 1.0,
+        }
+    ]
+    assert len(crud.get_values(1)) == 10
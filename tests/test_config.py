@@ -0,0 +1,71 @@
+import pytest
+
+from rdp.config import Config
+
+
+def test_config_defaults():
+    config = Config.from_env({})
+    assert config == Config()
+    assert config.devices == ["/dev/rdp_cdev"]
+
+
+def test_config_from_env():
+    config = Config.from_env(
+        {
+            "RDP_DATABASE_URL": "sqlite:///other.db",
+            "RDP_DEVICES": "/dev/rdp_cdev0, /dev/rdp_cdev1,",
+            "RDP_QUEUE_SIZE": "10",
+            "RDP_BACKPRESSURE": "spill",
+            "RDP_COMMIT_INTERVAL": "0.25",
+            "RDP_PARTITIONING": "yes",
+            "RDP_RETENTION_MONTHS": "12",
+            "RDP_SEAL_AFTER_DAYS": "7",
+        }
+    )
+    assert config.database_url == "sqlite:///other.db"
+    assert config.devices == ["/dev/rdp_cdev0", "/dev/rdp_cdev1"]
+    assert config.queue_size == 10
+    assert config.backpressure == "spill"
+    assert config.commit_size == 1000
+    assert config.commit_interval == 0.25
+    assert config.partitioning
+    assert config.retention_months == 12
+    assert config.seal_after() == 7 * 86400
+    assert Config().seal_after() is None
+
+    with pytest.raises(ValueError):
+        Config.from_env({"RDP_QUEUE_SIZE": "many"})
+
+
+def test_config_ingest():
+    assert Config.from_env({}).ingest == "embedded"
+    config = Config.from_env({"RDP_INGEST": "elect", "RDP_DATABASE_URL": "sqlite:////data/rdp.db"})
+    assert config.ingest == "elect"
+    assert config.ingest_lock_path() == "/data/rdp.db.ingest.lock"
+    config = Config.from_env({"RDP_INGEST": "external", "RDP_INGEST_LOCK": "/run/rdp.lock"})
+    assert config.ingest_lock_path() == "/run/rdp.lock"
+
+    with pytest.raises(ValueError):
+        Config.from_env({"RDP_INGEST": "sometimes"})
+
+
+def test_config_value_type_ttl():
+    assert Config.from_env({}).value_type_ttl == 10.0
+    assert Config.from_env({"RDP_VALUE_TYPE_TTL": "0.5"}).value_type_ttl == 0.5
+
+
+def test_config_skip_stored():
+    assert not Config.from_env({}).skip_stored
+    assert Config.from_env({"RDP_SKIP_STORED": "yes"}).skip_stored
+    assert not Config.from_env({"RDP_SKIP_STORED": "0"}).skip_stored
+
+
+def test_config_recent_capacities():
+    config = Config.from_env({})
+    assert config.recent_capacity == 10000 and config.recent_capacities == {}
+    config = Config.from_env(
+        {"RDP_RECENT_CAPACITY": "500", "RDP_RECENT_CAPACITIES": "1=50000, 7=20"}
+    )
+    assert config.recent_capacity == 500 and config.recent_capacities == {1: 50000, 7: 20}
+    with pytest.raises(ValueError):
+        Config.from_env({"RDP_RECENT_CAPACITIES": "1:50000"})
@@ -0,0 +1,66 @@
+import pytest
+
+from rdp.analysis import lttb
+from rdp.crud.crud import Crud
+
+
+def test_get_aggregated_values(crud_in_memory: Crud):
+    crud_in_memory.add_values(
+        [(t, type_id, float(t % 7)) for t in range(200) for type_id in (1, 2)]
+    )
+
+    result = crud_in_memory.get_aggregated_values(value_type_id=1, bucket=60)
+    assert [row["time"] for row in result] == [0, 60, 120, 180]
+    assert result[0] == {
+        "value_type_id": 1,
+        "time": 0,
+        "min": 0.0,
+        "max": 6.0,
+        "mean": pytest.approx(2.9),
+        "count": 60,
+        "last": 3.0,
+    }
+    assert result[-1]["count"] == 20
+    assert result[-1]["last"] == float(199 % 7)
+
+    result = crud_in_memory.get_aggregated_values(
+        start=50, end=149, bucket=100, aggregates=["count", "last"]
+    )
+    assert result == [
+        {"value_type_id": 1, "time": 0, "count": 50, "last": float(99 % 7)},
+        {"value_type_id": 1, "time": 100, "count": 50, "last": float(149 % 7)},
+        {"value_type_id": 2, "time": 0, "count": 50, "last": float(99 % 7)},
+        {"value_type_id": 2, "time": 100, "count": 50, "last": float(149 % 7)},
+    ]
+
+    assert crud_in_memory.get_aggregated_values(value_type_id=3) == []
+    with pytest.raises(ValueError):
+        crud_in_memory.get_aggregated_values(aggregates=["median"])
+    with pytest.raises(ValueError):
+        crud_in_memory.get_aggregated_values(bucket=0)
+
+
+def test_lttb():
+    times = list(range(100))
+    values = [0.0] * 100
+    values[42] = 10.0
+    values[77] = -5.0
+
+    result = lttb(times, values, 10)
+    assert len(result) == 10
+    assert result[0] == 0 and result[-1] == 99
+    assert result.tolist() == sorted(result)
+    assert 42 in result and 77 in result
+
+    assert lttb(times[:5], values[:5], 10).tolist() == [0, 1, 2, 3, 4]
+    with pytest.raises(ValueError):
+        lttb(times, values, 2)
+
+
+def test_get_values_lttb(crud_in_memory: Crud):
+    crud_in_memory.add_values([(t, 1, float(t % 10)) for t in range(1000)])
+
+    times, values = crud_in_memory.get_values_lttb(1, start=100, points=50)
+    assert len(times) == len(values) == 50
+    assert times[0] == 100 and times[-1] == 999
+    assert values.tolist() == [float(t % 10) for t in times.tolist()]
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from rdp.crud import AsyncCrud, Crud, create_async_engine, create_engines
+
+
+@pytest.fixture(scope="function")
+def cruds(tmp_path):
+    url = "sqlite:///%s" % (tmp_path / "async.db")
+    engine, read_engine = create_engines(url)
+    crud = Crud(engine, read_engine=read_engine)
+    async_engine = create_async_engine(url)
+    yield crud, AsyncCrud(async_engine, crud)
+    asyncio.run(async_engine.dispose())
+
+
+def test_async_value_types(cruds):
+    crud, async_crud = cruds
+    crud.add_values([(1, 1, 1.0), (1, 2, 2.0)])
+    crud.invalidate_value_type()
+
+    async def run():
+        value_types = await async_crud.get_value_types()
+        assert [value_type.id for value_type in value_types] == [1, 2]
+        assert (await async_crud.get_value_type(2)).type_name == "TYPE_2"
+        with pytest.raises(async_crud.NoResultFound):
+            await async_crud.get_value_type(3)
+
+    asyncio.run(run())
+    # the cache is shared with the synchronous crud
+    assert crud.value_type_cache.hits >= 1
+    assert crud.get_value_types() == asyncio.run(async_crud.get_value_types())
+
+
+def test_async_values(cruds):
+    crud, async_crud = cruds
+    crud.add_values([(t, type_id, float(t)) for t in range(200) for type_id in (1, 2)])
+
+    async def run():
+        values = await async_crud.get_values(1, 10, 19)
+        assert [value.time for value in values] == list(range(10, 20))
+        values = await async_crud.get_values(after=(10, 0), limit=3)
+        assert [(value.time, value.value_type_id) for value in values] == [
+            (10, 1),
+            (10, 2),
+            (11, 1),
+        ]
+        values = [value async for value in async_crud.iter_values(2, chunk_size=7)]
+        assert [value.time for value in values] == list(range(200))
+        result = await async_crud.get_aggregated_values(1, bucket=60, aggregates=["count", "last"])
+        assert result == crud.get_aggregated_values(1, bucket=60, aggregates=["count", "last"])
+        with pytest.raises(ValueError):
+            await async_crud.get_aggregated_values(aggregates=["median"])
+
+    asyncio.run(run())
@@ -0,0 +1,224 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from rdp.crud import (
+    AsyncCrud,
+    Crud,
+    MonthlyPartitions,
+    Value,
+    ValueChunk,
+    create_async_engine,
+    create_engines,
+)
+from rdp.crud import chunk
+
+START = 1704067200
+# one value every 10 seconds of 2 types for a bit over a day
+VALUES = [
+    (START + t, type_id, round(20.0 + type_id + np.sin(t / 3600.0), 2))
+    for t in range(0, 90000, 10)
+    for type_id in (1, 2)
+]
+SEAL_BEFORE = START + 60000
+
+
+def rounded(aggregated):
+    # numpy and sqlite sum in different orders
+    return [dict(row, mean=round(row["mean"], 9)) for row in aggregated]
+
+
+def dump(crud: Crud):
+    return {
+        "values": [(v.id, v.time, v.value_type_id, v.value) for v in crud.get_values()],
+        "rows": crud.get_value_rows(),
+        "range": crud.get_value_rows(2, START + 55000, START + 65000),
+        "page": crud.get_value_rows(start=START + 100, after=(START + 59990, 0), limit=7),
+        "iter": [
+            (v.id, v.time)
+            for v in crud.iter_values(1, start=START + 59000, limit=150, chunk_size=16)
+        ],
+        "recent": [(v.id, v.time) for v in crud.get_recent_values(1, 5)],
+        "marks": crud.get_high_water_marks(),
+        "series": [
+            a.tolist() for a in crud.get_series(2, START + 55005, START + 65005, neighbors=True)
+        ],
+        "aggregated": rounded(
+            crud.get_aggregated_values(1, START + 100, START + 70000, bucket=700)
+        ),
+        "rollups": crud.get_aggregated_values(bucket=3600),
+    }
+
+
+@pytest.fixture(scope="function")
+def crud():
+    crud = Crud(create_engine("sqlite:///:memory:"))
+    crud.add_values(VALUES)
+    yield crud
+
+
+def test_integer_codec():
+    times = np.arange(START, START + 10240, 10)
+    times[5] += 3
+    # first time, first delta and the one irregular interval take more than a byte
+    assert len(chunk.encode_integers(times)) == len(times) + 4
+    for integers in (
+        times,
+        np.array([7]),
+        np.array([], dtype=np.int64),
+        np.array([-5, 2**62, -(2**62), 0]),
+    ):
+        assert chunk.decode_integers(chunk.encode_integers(integers)).tolist() == integers.tolist()
+
+
+def test_float_codec():
+    values = np.round(20 + np.cumsum(np.random.default_rng(1).normal(0, 0.1, 1024)), 2)
+    values[100:200] = values[100]
+    values[3:7] = [np.nan, -0.0, np.inf, 1e-300]
+    data = chunk.encode_floats(values)
+    assert len(data) < len(values) * 8
+    assert np.array_equal(
+        chunk.decode_floats(data, len(values)).view(np.uint64), values.view(np.uint64)
+    )
+    # repeated values take one byte
+    assert len(chunk.encode_floats(np.full(100, 21.5))) == 100 + 3
+
+
+def test_seal_values(crud: Crud):
+    before = dump(crud)
+    sealed = crud.seal_values(SEAL_BEFORE, chunk_size=500)
+    # only full chunks are sealed
+    assert sealed == 12000
+    with crud._engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(ValueChunk)).scalar() == 24
+        assert (
+            connection.execute(select(func.count()).select_from(Value)).scalar()
+            == len(VALUES) - sealed
+        )
+        assert connection.execute(select(func.min(Value.time))).scalar() == START + 60000
+    assert dump(crud) == before
+    assert crud.seal_values(SEAL_BEFORE, chunk_size=500) == 0
+
+    crud.rebuild_rollups()
+    assert rounded(crud.get_aggregated_values(bucket=3600)) == rounded(before["rollups"])
+
+
+def test_seal_keeps_newest_value(crud: Crud):
+    assert crud.seal_values(START + 100000, chunk_size=1000) == 17000
+    assert crud.get_last_value_id() == len(VALUES)
+    with crud._engine.connect() as connection:
+        # the last 999 values of type 2 make no full chunk, its newest value is kept
+        ids = connection.execute(select(Value.id).order_by(Value.id)).scalars().all()
+        assert ids == list(range(len(VALUES) - 1998, len(VALUES) + 1, 2))
+    assert crud.insert_values([(START + 100000, 1, 1.0)])[0][0] == len(VALUES) + 1
+
+
+def test_sealed_late_values(crud: Crud):
+    crud.seal_values(SEAL_BEFORE, chunk_size=500)
+    # stored after sealing, within the sealed range
+    crud.add_values([(START + 5, 1, -1.0)])
+    rows = crud.get_value_rows(1, START, START + 20)
+    assert [(row[1], row[3]) for row in rows] == [
+        (START, 21.0),
+        (START + 5, -1.0),
+        (START + 10, 21.0),
+        (START + 20, 21.01),
+    ]
+
+
+def test_sealed_values_unique(crud: Crud):
+    crud.seal_values(SEAL_BEFORE, chunk_size=500)
+    before = dump(crud)
+    with pytest.raises(crud.IntegrityError):
+        crud.add_value(START + 10, 1, -1.0)
+    with pytest.raises(crud.IntegrityError):
+        crud.add_values([(START + 5, 1, -1.0), (START + 10, 2, -1.0)])
+    assert crud.insert_values(
+        [(START + 10, 2, -1.0), (START + 15, 2, -1.0)], skip_duplicates=True
+    )[0][1:] == (
+        START + 15,
+        2,
+        -1.0,
+    )
+    # loading the same values again stores nothing and the rollups count every value once
+    assert crud.bulk_load([VALUES[:5000], VALUES[5000:]]) == 0
+    crud.rebuild_rollups()
+    count = sum(row["count"] for row in before["rollups"])
+    assert sum(row["count"] for row in crud.get_aggregated_values(bucket=3600)) == count + 1
+
+
+def test_apply_sealing(tmp_path):
+    crud = Crud(create_engine("sqlite:///:memory:"), seal_after=40000)
+    crud.add_values(VALUES)
+    assert crud.apply_sealing(now=START + 100000) == 2 * 5 * 1024
+    assert Crud(create_engine("sqlite:///:memory:")).apply_sealing() == 0
+
+
+def test_seal_shrinks_database(tmp_path):
+    path = tmp_path / "size.db"
+    engine = create_engine("sqlite:///%s" % path)
+    crud = Crud(engine, rollups=False)
+    crud.add_values(VALUES)
+    raw_size = os.path.getsize(path)
+    crud.seal_values(START + 100000)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+    assert os.path.getsize(path) * 4 < raw_size
+
+
+def test_seal_partitions():
+    crud = Crud(create_engine("sqlite:///:memory:"), partitions=MonthlyPartitions(retention=1))
+    february = START + 31 * 86400
+    crud.add_values(VALUES + [(february + t, 1, 1.0) for t in range(3000)])
+    before = crud.get_value_rows()
+    assert crud.seal_values(february + 2000, chunk_size=1000) == 18000 + 2000
+    assert crud.get_value_rows() == before
+    # sealed and stored values of the same partition
+    rows = crud.get_value_rows(1, february + 1990, february + 2010)
+    assert [row[1] for row in rows] == list(range(february + 1990, february + 2011))
+
+    crud.apply_retention(now=february)
+    assert crud.get_value_rows() == before[-3000:]
+
+
+def test_async_sealed_values(tmp_path):
+    url = "sqlite:///%s" % (tmp_path / "async.db")
+    engine, read_engine = create_engines(url)
+    crud = Crud(engine, read_engine=read_engine)
+    crud.add_values(VALUES)
+    crud.seal_values(SEAL_BEFORE, chunk_size=500)
+    async_engine = create_async_engine(url)
+    async_crud = AsyncCrud(async_engine, crud)
+
+    async def run():
+        try:
+            assert [v.id for v in await async_crud.get_values(1, limit=10)] == [
+                v.id for v in crud.get_values(1, limit=10)
+            ]
+            assert await async_crud.get_value_rows(
+                start=START + 59000, limit=300
+            ) == crud.get_value_rows(start=START + 59000, limit=300)
+            streamed = [
+                v.id
+                async for v in async_crud.iter_values(start=START + 59900, limit=50, chunk_size=8)
+            ]
+            assert streamed == [
+                row[0] for row in crud.get_value_rows(start=START + 59900, limit=50)
+            ]
+            assert [v.id for v in await async_crud.get_recent_values(2, 3)] == [
+                v.id for v in crud.get_recent_values(2, 3)
+            ]
+            aggregated = await async_crud.get_aggregated_values(
+                2, START + 1, START + 70000, bucket=600
+            )
+            assert aggregated == crud.get_aggregated_values(
+                2, START + 1, START + 70000, bucket=600
+            )
+            assert aggregated[0]["count"] == 59
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError, TimeoutError
+
+from rdp.crud import Crud, EngineProfile, create_engine, create_engines
+
+
+def pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.execute(text("PRAGMA %s" % name)).scalar()
+
+
+def test_profile(tmp_path):
+    profile = EngineProfile(synchronous="FULL", cache_size=-1024, mmap_size=0, busy_timeout=1234)
+    engine = create_engine("sqlite:///%s" % (tmp_path / "test.db"), profile)
+
+    assert not engine.echo
+    assert pragma(engine, "journal_mode") == "wal"
+    assert pragma(engine, "synchronous") == 2
+    assert pragma(engine, "cache_size") == -1024
+    assert pragma(engine, "mmap_size") == 0
+    assert pragma(engine, "busy_timeout") == 1234
+
+
+def test_create_engines(tmp_path):
+    writer, reader = create_engines("sqlite:///%s" % (tmp_path / "test.db"), read_pool_size=2)
+    assert writer is not reader
+    assert pragma(reader, "journal_mode") == "wal"
+    assert pragma(reader, "query_only") == 1
+    assert pragma(writer, "query_only") == 0
+
+    with reader.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("CREATE TABLE test (id INTEGER)"))
+
+    # exactly one writer connection
+    assert writer.pool.size() == 1
+    writer.pool._timeout = 0.1
+    with writer.connect():
+        with pytest.raises(TimeoutError):
+            writer.connect()
+
+
+def test_create_engines_in_memory():
+    writer, reader = create_engines("sqlite:///:memory:")
+    assert writer is reader
+
+
+def test_crud_read_engine(tmp_path):
+    writer, reader = create_engines("sqlite:///%s" % (tmp_path / "test.db"))
+    crud = Crud(writer, read_engine=reader)
+    crud.add_values([(t, 1, float(t)) for t in range(10)])
+    crud.add_value(10, 2, 10.0)
+
+    # every read connection runs in a transaction, it keeps its snapshot while the writer commits
+    with reader.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM value")).scalar() == 11
+        crud.add_values([(t, 1, float(t)) for t in range(11, 20)])
+        assert connection.execute(text("SELECT count(*) FROM value")).scalar() == 11
+
+    assert len(crud.get_values()) == 20
+    assert len(crud.get_aggregated_values(bucket=5)) == 5
+    crud.invalidate_value_type()
+    assert [value_type.id for value_type in crud.get_value_types()] == [1, 2]
+
+
+def test_read_snapshot_while_sealing(tmp_path):
+    writer, reader = create_engines("sqlite:///%s" % (tmp_path / "test.db"))
+    crud = Crud(writer, read_engine=reader, seal_after=3600)
+    crud.add_values([(t, 1, float(t)) for t in range(100)])
+    sealed = []
+
+    @event.listens_for(reader, "after_cursor_execute")
+    def seal(conn, cursor, statement, parameters, context, executemany):
+        # the values get sealed between the table and the chunk read
+        if not sealed and "FROM value " in statement:
+            sealed.append(crud.seal_values(50, chunk_size=10))
+
+    values = crud.get_value_rows(1)
+    assert sealed == [50]
+    assert [row[1] for row in values] == list(range(100))
+    assert [row[1] for row in crud.get_value_rows(1)] == list(range(100))
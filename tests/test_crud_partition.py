@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from rdp.crud import AsyncCrud, Crud, MonthlyPartitions, create_async_engine, create_engines
+
+# 2024-01-31 23:59:00, one minute before February
+JANUARY = 1706745540
+FEBRUARY = JANUARY + 60
+MARCH = 1709251200
+
+
+@pytest.fixture(scope="function")
+def partitioned_crud():
+    engine = create_engine("sqlite:///:memory:")
+    yield Crud(engine, partitions=MonthlyPartitions(retention=2))
+
+
+def tables(crud: Crud):
+    return sorted(
+        name for name in inspect(crud._engine).get_table_names() if name.startswith("value_2")
+    )
+
+
+def test_partition_bounds():
+    partitions = MonthlyPartitions()
+    assert partitions.key(JANUARY) == 202401
+    assert partitions.key(FEBRUARY) == 202402
+    assert partitions.bounds(202401) == (1704067200, FEBRUARY - 1)
+    assert partitions.bounds(202312) == (1701388800, 1704067199)
+    assert partitions.overlapping([202312, 202401, 202402, 202403], JANUARY, FEBRUARY) == [
+        202401,
+        202402,
+    ]
+    assert MonthlyPartitions(retention=2).retention_start(MARCH) == FEBRUARY
+    assert MonthlyPartitions(retention=3).retention_start(FEBRUARY) == 1701388800
+    with pytest.raises(ValueError):
+        MonthlyPartitions(retention=0)
+
+
+def test_partitioned_insert(partitioned_crud: Crud):
+    rows = partitioned_crud.insert_values(
+        [(FEBRUARY, 1, 2.0), (JANUARY, 1, 1.0), (FEBRUARY + 1, 2, 3.0)]
+    )
+    assert tables(partitioned_crud) == ["value_202401", "value_202402"]
+    # input order, ids unique across the partitions
+    assert [row[1:] for row in rows] == [
+        (FEBRUARY, 1, 2.0),
+        (JANUARY, 1, 1.0),
+        (FEBRUARY + 1, 2, 3.0),
+    ]
+    assert len({row[0] for row in rows}) == 3
+
+    partitioned_crud.add_value(MARCH, 1, 4.0)
+    assert (
+        partitioned_crud.add_values([(JANUARY, 1, 1.0), (MARCH + 1, 1, 5.0)], skip_duplicates=True)
+        == 1
+    )
+    with pytest.raises(partitioned_crud.IntegrityError):
+        partitioned_crud.add_value(MARCH, 1, 4.0)
+    assert partitioned_crud.get_high_water_marks() == {1: MARCH + 1, 2: FEBRUARY + 1}
+
+
+def test_partitioned_get_values(partitioned_crud: Crud):
+    partitioned_crud.add_values(
+        [(t, 1, float(t - JANUARY)) for t in range(JANUARY - 2, FEBRUARY + 3)]
+    )
+
+    values = partitioned_crud.get_values(1)
+    assert [value.time for value in values] == list(range(JANUARY - 2, FEBRUARY + 3))
+    assert [
+        value.time for value in partitioned_crud.get_values(1, start=FEBRUARY, end=FEBRUARY + 1)
+    ] == [
+        FEBRUARY,
+        FEBRUARY + 1,
+    ]
+
+    # the limit and the cursor carry over from one partition to the next
+    pages = []
+    cursor = None
+    while True:
+        page = partitioned_crud.get_value_rows(1, after=cursor, limit=25)
+        pages.append(page)
+        if len(page) < 25:
+            break
+        cursor = page[-1][1], page[-1][0]
+    assert [row[1] for page in pages for row in page] == [value.time for value in values]
+    assert [
+        value.time for value in partitioned_crud.iter_values(1, start=FEBRUARY - 2, limit=4)
+    ] == list(range(FEBRUARY - 2, FEBRUARY + 2))
+    assert [value.time for value in partitioned_crud.get_recent_values(1, 4)] == list(
+        range(FEBRUARY - 1, FEBRUARY + 3)
+    )
+
+    times, _ = partitioned_crud.get_series(1, FEBRUARY, FEBRUARY + 1, neighbors=True)
+    assert times.tolist() == [FEBRUARY - 1, FEBRUARY, FEBRUARY + 1, FEBRUARY + 2]
+
+
+def test_partitioned_aggregates(partitioned_crud: Crud):
+    partitioned_crud.add_values([(t, 1, 1.0) for t in range(JANUARY - 60, FEBRUARY + 60)])
+
+    raw = partitioned_crud.get_aggregated_values(1, bucket=60, use_rollups=False)
+    assert raw == partitioned_crud.get_aggregated_values(1, bucket=60)
+    assert [row["count"] for row in raw] == [60, 60, 60]
+
+    partitioned_crud.rebuild_rollups()
+    assert partitioned_crud.get_aggregated_values(
+        1, bucket=86400
+    ) == partitioned_crud.get_aggregated_values(1, bucket=86400, use_rollups=False)
+
+
+def test_partitioned_bulk_load(partitioned_crud: Crud):
+    chunks = [[(t, 1, float(t)) for t in range(FEBRUARY - 10, FEBRUARY + 10)]]
+    assert partitioned_crud.bulk_load(chunks) == 20
+    assert len(partitioned_crud.get_values(1)) == 20
+    for name in tables(partitioned_crud):
+        assert inspect(partitioned_crud._engine).get_indexes(name)
+
+
+def test_retention(partitioned_crud: Crud):
+    partitioned_crud.add_values([(JANUARY, 1, 1.0), (FEBRUARY, 1, 2.0), (MARCH, 1, 3.0)])
+
+    assert partitioned_crud.apply_retention(now=MARCH) == [202401]
+    assert tables(partitioned_crud) == ["value_202402", "value_202403"]
+    assert [value.time for value in partitioned_crud.get_values(1)] == [FEBRUARY, MARCH]
+    # the rollups keep the dropped month
+    assert (
+        partitioned_crud.get_aggregated_values(1, end=FEBRUARY - 1, bucket=86400)[0]["count"] == 1
+    )
+    # a dropped partition comes back when values of its month arrive again
+    partitioned_crud.add_value(JANUARY, 1, 1.0)
+    assert tables(partitioned_crud) == ["value_202401", "value_202402", "value_202403"]
+
+    with pytest.raises(RuntimeError):
+        Crud(create_engine("sqlite:///:memory:")).drop_partitions(MARCH)
+
+
+def test_partitioned_async(tmp_path):
+    url = "sqlite:///%s" % (tmp_path / "partitioned.db")
+    engine, read_engine = create_engines(url)
+    crud = Crud(engine, read_engine=read_engine, partitions=MonthlyPartitions())
+    crud.add_values([(t, 1, 1.0) for t in range(JANUARY - 2, FEBRUARY + 2)])
+    async_crud = AsyncCrud(create_async_engine(url), crud)
+
+    async def read():
+        values = await async_crud.get_values(1, start=FEBRUARY - 1, limit=2)
+        rows = await async_crud.get_value_rows(1)
+        recent = await async_crud.get_recent_values(1, 3)
+        aggregated = await async_crud.get_aggregated_values(1, bucket=60, use_rollups=False)
+        return values, rows, recent, aggregated
+
+    values, rows, recent, aggregated = asyncio.run(read())
+    assert [value.time for value in values] == [FEBRUARY - 1, FEBRUARY]
+    assert [row[1] for row in rows] == list(range(JANUARY - 2, FEBRUARY + 2))
+    assert [value.time for value in recent] == [FEBRUARY - 1, FEBRUARY, FEBRUARY + 1]
+    assert sum(row["count"] for row in aggregated) == 64
+
+
+def test_legacy_and_partitions_merged(tmp_path):
+    # values of the value table stored before partitioning, then older dumps backfilled into
+    # partitions
+    url = "sqlite:///%s" % (tmp_path / "mixed.db")
+    engine, read_engine = create_engines(url)
+    Crud(engine, read_engine=read_engine).add_values(
+        [(t, 1, 2.0) for t in range(MARCH, MARCH + 5)]
+    )
+    crud = Crud(engine, read_engine=read_engine, partitions=MonthlyPartitions())
+    crud.add_values([(t, 1, 1.0) for t in (JANUARY, FEBRUARY, FEBRUARY + 1)])
+    crud.add_values([(MARCH + 10, 1, 3.0)])
+    expected = [JANUARY, FEBRUARY, FEBRUARY + 1] + list(range(MARCH, MARCH + 5)) + [MARCH + 10]
+
+    assert [value.time for value in crud.get_values(1)] == expected
+    assert [value.time for value in crud.get_values(1, limit=2)] == expected[:2]
+    assert [row[1] for row in crud.get_value_rows(1, start=FEBRUARY, limit=3)] == expected[1:4]
+    assert [value.time for value in crud.iter_values(1, limit=6, chunk_size=2)] == expected[:6]
+    assert [value.time for value in crud.get_recent_values(1, 3)] == expected[-3:]
+    assert crud.get_series(1, FEBRUARY + 1, MARCH)[0].tolist() == [FEBRUARY + 1, MARCH]
+    assert crud.get_series(1, FEBRUARY + 1, MARCH + 1, neighbors=True)[0].tolist() == expected[1:6]
+
+    # keyset paging across the tables
+    pages, after = [], None
+    while True:
+        page = crud.get_value_rows(1, after=after, limit=2)
+        if not page:
+            break
+        pages.extend(row[1] for row in page)
+        after = page[-1][1], page[-1][0]
+    assert pages == expected
+
+    async_crud = AsyncCrud(create_async_engine(url), crud)
+
+    async def read():
+        values = await async_crud.get_values(1, limit=2)
+        rows = await async_crud.get_value_rows(1, start=FEBRUARY, limit=3)
+        streamed = [value.time async for value in async_crud.iter_values(1, limit=6, chunk_size=2)]
+        recent = await async_crud.get_recent_values(1, 3)
+        return values, rows, streamed, recent
+
+    values, rows, streamed, recent = asyncio.run(read())
+    assert [value.time for value in values] == expected[:2]
+    assert [row[1] for row in rows] == expected[1:4]
+    assert streamed == expected[:6]
+    assert [value.time for value in recent] == expected[-3:]
@@ -0,0 +1,147 @@
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+
+from rdp.crud.crud import Crud
+
+TABLES = ("value", "value_type", "value_rollup", "last_value", "value_chunk")
+
+
+def collect_plans(engine) -> List[List[str]]:
+    collected: List[List[str]] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            rows = cursor.connection.execute(
+                "EXPLAIN QUERY PLAN " + statement, parameters
+            ).fetchall()
+            collected.append([row[-1] for row in rows])
+
+    return collected
+
+
+@pytest.fixture(scope="function")
+def plans():
+    engine = create_engine("sqlite:///:memory:")
+    crud = Crud(engine)
+    crud.add_values([(t, type_id, float(t)) for t in range(0, 86400, 30) for type_id in (1, 2, 3)])
+    crud.invalidate_value_type()
+    yield crud, collect_plans(engine)
+
+
+@pytest.fixture(scope="function")
+def sealed_plans():
+    engine = create_engine("sqlite:///:memory:")
+    crud = Crud(engine, seal_after=3600)
+    crud.add_values([(t, type_id, float(t)) for t in range(0, 86400, 30) for type_id in (1, 2, 3)])
+    crud.seal_values(43200, chunk_size=64)
+    crud.invalidate_value_type()
+    yield crud, collect_plans(engine)
+
+
+def assert_index_seeks(collected: List[List[str]]):
+    assert collected
+    for plan in collected:
+        for line in plan:
+            for table in TABLES:
+                assert not line.startswith("SCAN %s" % table), plan
+        assert any(line.startswith("SEARCH") for line in plan), plan
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"value_type_id": 1},
+        {"value_type_id": 1, "start": 100, "end": 2000},
+        {"start": 100},
+        {"start": 100, "end": 2000},
+        {"value_type_id": 2, "start": 100, "after": (150, 0), "limit": 10},
+        {"start": 100, "after": (150, 0), "limit": 10},
+    ],
+)
+def test_get_values_plan(plans, kwargs):
+    crud, collected = plans
+    crud.get_values(**kwargs)
+    list(crud.iter_values(**kwargs))
+    assert_index_seeks(collected)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"value_type_id": 1},
+        {"value_type_id": 1, "start": 100, "end": 2000},
+        {"start": 100, "end": 2000},
+        {"end": 2000, "limit": 10},
+        {"start": 100, "after": (150, 0), "limit": 10},
+    ],
+)
+def test_get_sealed_values_plan(sealed_plans, kwargs):
+    crud, collected = sealed_plans
+    crud.get_values(**kwargs)
+    crud.get_value_rows(**kwargs)
+    assert any("value_chunk" in line for plan in collected for line in plan)
+    assert_index_seeks(collected)
+
+
+def test_unsealed_reads_skip_chunks(plans):
+    crud, collected = plans
+    crud.get_values(1, 100, 2000)
+    crud.get_recent_values(1, 10)
+    crud.add_values([(90000, 1, 1.0)])
+    assert not any("value_chunk" in line for plan in collected for line in plan)
+
+
+def test_get_values_uses_covering_index(plans):
+    crud, collected = plans
+    crud.get_values(1, 100, 2000)
+    assert (
+        "SEARCH value USING COVERING INDEX value_type_time (value_type_id=? AND time>? AND time<?)"
+        in collected[0]
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"value_type_id": 1, "bucket": 60},
+        {"value_type_id": 1, "start": 3600, "end": 7199, "bucket": 3600},
+        {"value_type_id": 1, "start": 100, "end": 2000, "bucket": 7},
+        {"value_type_id": 1, "start": 100, "end": 2000, "bucket": 60, "use_rollups": False},
+    ],
+)
+def test_get_aggregated_values_plan(plans, kwargs):
+    crud, collected = plans
+    crud.get_aggregated_values(**kwargs)
+    assert_index_seeks(collected)
+
+
+def test_get_series_plan(plans):
+    crud, collected = plans
+    times, values = crud.get_series(1, 100, 2000, neighbors=True)
+    assert len(times) == len(values) == 65
+    # the three array fetches run through the connection, the engine events see them, nothing is
+    # sealed
+    assert len(collected) == 3
+    assert_index_seeks(collected)
+
+
+def test_get_value_type_plan(plans):
+    crud, collected = plans
+    crud.get_value_type(2)
+    assert_index_seeks(collected)
+
+
+def test_indexes_created_on_existing_database(tmp_path):
+    engine = create_engine("sqlite:///%s" % (tmp_path / "old.db"))
+    Crud(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX value_type_time")
+    assert "value_type_time" not in {
+        index["name"] for index in inspect(engine).get_indexes("value")
+    }
+
+    Crud(engine)
+    assert "value_type_time" in {index["name"] for index in inspect(engine).get_indexes("value")}
@@ -0,0 +1,148 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, delete, func, inspect, select
+from sqlalchemy.orm import Session
+
+from rdp.crud.crud import Crud
+from rdp.crud.model import Value, ValueRollup, ValueRollupState
+
+
+def fill(crud: Crud):
+    rng = random.Random(4)
+    values = [
+        (t, type_id, rng.uniform(-10, 10)) for t in range(0, 3 * 86400, 97) for type_id in (1, 2)
+    ]
+    crud.add_values(values[:-20])
+    for value in values[-20:]:
+        crud.add_value(*value)
+    return values
+
+
+def assert_same(result, expected):
+    assert len(result) == len(expected)
+    for row, expected_row in zip(result, expected):
+        assert row.keys() == expected_row.keys()
+        for key in row:
+            assert row[key] == (
+                expected_row[key] if key != "mean" else pytest.approx(expected_row[key])
+            )
+
+
+def test_rollups_match_raw(crud_in_memory: Crud):
+    fill(crud_in_memory)
+
+    for bucket, start, end in [
+        (60, None, None),
+        (600, 3600, 86400 * 2 - 1),
+        (3600, None, None),
+        (86400, None, None),
+        (2 * 86400, 0, 3 * 86400 - 1),
+    ]:
+        result = crud_in_memory.get_aggregated_values(None, start, end, bucket)
+        expected = crud_in_memory.get_aggregated_values(
+            None, start, end, bucket, use_rollups=False
+        )
+        assert_same(result, expected)
+
+
+def test_rollup_resolution(crud_in_memory: Crud):
+    assert crud_in_memory._rollup_resolution(60) == 60
+    assert crud_in_memory._rollup_resolution(7200) == 3600
+    assert crud_in_memory._rollup_resolution(86400 * 7, 0, 86400 * 7 - 1) == 86400
+    assert crud_in_memory._rollup_resolution(86400, 60) == 60
+    assert crud_in_memory._rollup_resolution(86400, 0, 100) is None
+    assert crud_in_memory._rollup_resolution(90) is None
+
+
+def test_rebuild_rollups(crud_session_in_memory):
+    crud_in_memory, session = crud_session_in_memory
+    fill(crud_in_memory)
+
+    with session() as s:
+        expected = s.scalars(
+            select(ValueRollup).order_by(
+                ValueRollup.resolution, ValueRollup.value_type_id, ValueRollup.time
+            )
+        ).all()
+        expected = [
+            (r.resolution, r.value_type_id, r.time, r.count, r.min, r.max, r.last_time, r.last)
+            for r in expected
+        ]
+        s.execute(delete(ValueRollup))
+        # a backfill written behind the back of crud
+        s.add(Value(time=3 * 86400 + 5, value=1.0, value_type_id=1))
+        s.commit()
+
+    crud_in_memory.rebuild_rollups(start=86400)
+    with session() as s:
+        result = s.scalars(select(ValueRollup)).all()
+        # only the days from the start on got rebuilt
+        assert min(r.time for r in result) == 86400
+        assert max(r.time for r in result) == 3 * 86400
+
+    crud_in_memory.rebuild_rollups()
+    with session() as s:
+        result = s.scalars(
+            select(ValueRollup).order_by(
+                ValueRollup.resolution, ValueRollup.value_type_id, ValueRollup.time
+            )
+        ).all()
+        result = [
+            (r.resolution, r.value_type_id, r.time, r.count, r.min, r.max, r.last_time, r.last)
+            for r in result
+        ]
+    assert [row for row in result if row[2] < 3 * 86400] == expected
+    assert (86400, 1, 3 * 86400, 1, 1.0, 1.0, 3 * 86400 + 5, 1.0) in result
+
+
+def test_rollups_backfilled_on_upgrade(tmp_path):
+    engine = create_engine("sqlite:///%s" % (tmp_path / "old.db"))
+    Crud(engine).add_values([(t, 1, float(t)) for t in range(0, 7200, 10)])
+    # a database created before the rollups existed
+    ValueRollup.__table__.drop(engine)
+    ValueRollupState.__table__.drop(engine)
+
+    crud = Crud(engine)
+    assert inspect(engine).has_table(ValueRollup.__tablename__)
+    assert crud.rollups_stale()
+    expected = [
+        {"value_type_id": 1, "time": 0, "count": 360, "last": 3590.0},
+        {"value_type_id": 1, "time": 3600, "count": 360, "last": 7190.0},
+    ]
+    # the raw values answer until the rollups are rebuilt in the background
+    assert crud.get_aggregated_values(1, bucket=3600, aggregates=["count", "last"]) == expected
+    assert crud.rebuild_stale_rollups()
+    assert not crud.rollups_stale() and not crud.rebuild_stale_rollups()
+    assert crud._rollup_resolution(3600) == 3600
+    assert crud.get_aggregated_values(1, bucket=3600, aggregates=["count", "last"]) == expected
+
+
+def test_rollups_stale_without_rollups(tmp_path):
+    engine = create_engine("sqlite:///%s" % (tmp_path / "mixed.db"))
+    Crud(engine).add_values([(0, 1, 1.0)])
+    # a Crud without rollups leaves them alone, but cannot keep them current
+    Crud(engine, rollups=False).add_values([(60, 1, 2.0)])
+    assert inspect(engine).has_table(ValueRollup.__tablename__)
+    crud = Crud(engine)
+    assert crud.rollups_stale()
+    expected = [
+        {"value_type_id": 1, "time": 0, "count": 1},
+        {"value_type_id": 1, "time": 60, "count": 1},
+    ]
+    assert crud.get_aggregated_values(1, bucket=60, aggregates=["count"]) == expected
+
+    # e.g. rdp-rebuild-rollups
+    crud.rebuild_rollups()
+    assert not crud.rollups_stale()
+    with Session(engine) as session:
+        assert (
+            session.scalar(select(func.sum(ValueRollup.count)).where(ValueRollup.resolution == 60))
+            == 2
+        )
+    assert crud.get_aggregated_values(1, bucket=60, aggregates=["count"]) == expected
+
+    # a partial rebuild does not bring them up to date
+    Crud(engine, rollups=False).add_values([(120, 1, 3.0)])
+    crud.rebuild_rollups(0, 86399)
+    assert crud.rollups_stale()
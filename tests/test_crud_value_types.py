@@ -4,6 +4,8 @@ import pytest
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from rdp.crud import create_engines
+from rdp.crud.cache import ValueTypeCache
 from rdp.crud.crud import Crud
 from rdp.crud.model import ValueType
 
@@ -129,3 +131,74 @@ def test_update_value_types(crud_session_in_memory: Tuple[Crud, Session]):
             assert isinstance(value_type, ValueType)
             assert value_type.id >= 0 and value_type.id <= 3
             assert value_type.type_name in ["name", "weight", "size"]
+
+def test_value_type_cache(crud_session_in_memory: Tuple[Crud, Session]):
+    crud_in_memory, session = crud_session_in_memory
+
+    with session() as s:
+        s.add(ValueType(id=1, type_name="weight", type_unit="kg"))
+        s.commit()
+
+    assert [value_type.id for value_type in crud_in_memory.load_value_types()] == [1]
+    stats = crud_in_memory.value_type_cache.stats()
+    assert stats == {"hits": 0, "misses": 0, "size": 1}
+
+    # reads are served from the cache
+    assert crud_in_memory.get_value_type(1).type_name == "weight"
+    assert [value_type.id for value_type in crud_in_memory.get_value_types()] == [1]
+    assert crud_in_memory.value_type_cache.stats() == {"hits": 2, "misses": 0, "size": 1}
+
+    # ingest of a known type is a cache hit, unknown types are created and cached
+    crud_in_memory.add_value(1, 1, 76)
+    crud_in_memory.add_value(1, 2, 180)
+    crud_in_memory.add_values([(2, 1, 77), (2, 3, 5)])
+    assert crud_in_memory.value_type_cache.stats()["size"] == 3
+    assert [value_type.id for value_type in crud_in_memory.get_value_types()] == [1, 2, 3]
+    assert crud_in_memory.get_value_type(3).type_name == "TYPE_3"
+
+    # updates are visible through the cache
+    crud_in_memory.add_or_update_value_type(
+        value_type_id=2, value_type_name="size", value_type_unit="cm"
+    )
+    assert crud_in_memory.get_value_type(2).type_name == "size"
+    assert crud_in_memory.get_value_type(2).type_unit == "cm"
+
+def test_value_type_cache_invalidate(crud_session_in_memory: Tuple[Crud, Session]):
+    crud_in_memory, session = crud_session_in_memory
+
+    crud_in_memory.add_or_update_value_type(
+        value_type_id=1, value_type_name="weight", value_type_unit="kg"
+    )
+    assert crud_in_memory.get_value_type(1).type_name == "weight"
+
+    # changes behind the back of crud are only seen after an invalidation
+    with session() as s:
+        s.get(ValueType, 1).type_name = "mass"
+        s.commit()
+    assert crud_in_memory.get_value_type(1).type_name == "weight"
+    crud_in_memory.invalidate_value_type(1)
+    assert crud_in_memory.get_value_type(1).type_name == "mass"
+    assert crud_in_memory.value_type_cache.misses >= 1
+
+def test_value_type_cache_ttl(tmp_path):
+    now = [0.0]
+    engine, read_engine = create_engines("sqlite:///%s" % (tmp_path / "types.db"))
+    writer = Crud(engine, read_engine=read_engine)
+    other = Crud(engine, read_engine=read_engine)
+    other.value_type_cache = ValueTypeCache(10, clock=lambda: now[0])
+
+    writer.add_or_update_value_type(
+        value_type_id=1, value_type_name="weight", value_type_unit="kg"
+    )
+    assert [value_type.type_name for value_type in other.get_value_types()] == ["weight"]
+    assert other.get_value_type(1).type_name == "weight"
+
+    # added and renamed by another process, seen once the cached types expired
+    writer.add_or_update_value_type(value_type_id=1, value_type_name="mass")
+    writer.add_or_update_value_type(value_type_id=2, value_type_name="size", value_type_unit="cm")
+    now[0] = 9.0
+    assert [value_type.type_name for value_type in other.get_value_types()] == ["weight"]
+    assert other.get_value_type(1).type_name == "weight"
+    now[0] = 10.0
+    assert [value_type.type_name for value_type in other.get_value_types()] == ["mass", "size"]
+    assert other.get_value_type(1).type_name == "mass"
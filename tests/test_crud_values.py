@@ -2,7 +2,7 @@ import datetime
 from typing import Tuple
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import inspect, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import InterfaceError, StatementError
 
@@ -75,3 +75,144 @@ def test_get_values(crud_session_in_memory: Tuple[Crud, Session]):
             datetime.datetime(year=2023, month=9, day=26, second=1).timestamp(),
             datetime.datetime(year=2023, month=9, day=26, second=3).timestamp()
         ]
+
+def test_add_values(crud_session_in_memory: Tuple[Crud, Session]):
+    crud_in_memory, session = crud_session_in_memory
+
+    crud_in_memory.add_or_update_value_type(
+        value_type_id=1, value_type_name="weigth", value_type_unit="kg"
+    )
+
+    assert crud_in_memory.add_values([]) == 0
+    assert crud_in_memory.add_values([(1000 + i, i % 3, float(i)) for i in range(1000)]) == 1000
+
+    with session() as s:
+        result = s.scalars(select(Value).order_by(Value.time)).all()
+        assert len(result) == 1000
+        assert [(v.time, v.value_type_id, v.value) for v in result[:3]] == [
+            (1000, 0, 0.0),
+            (1001, 1, 1.0),
+            (1002, 2, 2.0),
+        ]
+
+    # missing value types are created, existing ones are kept
+    result = {value_type.id: value_type for value_type in crud_in_memory.get_value_types()}
+    assert sorted(result) == [0, 1, 2]
+    assert result[1].type_name == "weigth"
+    assert result[2].type_name == "TYPE_2"
+    assert result[2].type_unit == "UNIT_2"
+
+def test_add_values_atomic(crud_session_in_memory: Tuple[Crud, Session]):
+    crud_in_memory, session = crud_session_in_memory
+
+    crud_in_memory.add_values([(1, 1, 1.0)])
+    with pytest.raises(crud_in_memory.IntegrityError):
+        crud_in_memory.add_values([(2, 1, 2.0), (1, 1, 3.0)])
+
+    with session() as s:
+        result = s.scalars(select(Value)).all()
+        assert [(v.time, v.value) for v in result] == [(1, 1.0)]
+
+def test_add_values_skip_duplicates(crud_in_memory: Crud):
+    crud_in_memory.add_values([(1, 1, 1.0), (2, 1, 2.0)])
+
+    stored = crud_in_memory.insert_values(
+        [(1, 1, 5.0), (3, 1, 3.0), (2, 2, 2.0), (3, 1, 6.0)], skip_duplicates=True
+    )
+    assert [row[1:] for row in stored] == [(3, 1, 3.0), (2, 2, 2.0)]
+    assert crud_in_memory.add_values([(1, 1, 1.0)], skip_duplicates=True) == 0
+    result = crud_in_memory.get_values(value_type_id=1)
+    assert [(v.time, v.value) for v in result] == [(1, 1.0), (2, 2.0), (3, 3.0)]
+    # skipped values must not be counted twice
+    aggregated = crud_in_memory.get_aggregated_values(1, bucket=60)
+    assert aggregated[0]["count"] == 3 and aggregated[0]["max"] == 3.0
+
+def test_bulk_load(crud_in_memory: Crud):
+    crud_in_memory.add_values([(0, 1, 0.0)])
+    chunks = [[(t, t % 2 + 1, float(t)) for t in range(start, start + 50)] for start in (0, 50)]
+    progress = []
+
+    stored = crud_in_memory.bulk_load(
+        iter(chunks), progress=lambda read, stored: progress.append((read, stored))
+    )
+    assert stored == 99
+    assert progress == [(50, 49), (100, 99)]
+    assert [value.time for value in crud_in_memory.get_values(value_type_id=2)] == list(
+        range(1, 100, 2)
+    )
+    assert crud_in_memory.get_value_type(2).type_name == "TYPE_2"
+    # the deferred index is back and the rollups contain the loaded values
+    assert "value_type_time" in {
+        index["name"] for index in inspect(crud_in_memory._engine).get_indexes("value")
+    }
+    aggregated = crud_in_memory.get_aggregated_values(1, bucket=60)
+    assert [row["count"] for row in aggregated] == [30, 20]
+
+def test_get_backfill(crud_in_memory: Crud):
+    assert crud_in_memory.get_backfill() == (0, None)
+    crud_in_memory.add_values([(5, 1, 1.0), (9, 1, 2.0)])
+    crud_in_memory.add_value(7, 2, 3.0)
+    assert crud_in_memory.get_backfill() == (2, 9)
+    crud_in_memory.bulk_load([[(20, 1, 1.0)], [(3, 1, 1.0)]])
+    assert crud_in_memory.get_backfill() == (4, 20)
+    # the ingest feeds the recent value buffers itself
+    crud_in_memory.insert_values([(30, 1, 1.0)], backfill=False)
+    assert crud_in_memory.get_backfill() == (4, 20)
+
+def test_get_high_water_marks(crud_in_memory: Crud):
+    assert crud_in_memory.get_high_water_marks() == {}
+    crud_in_memory.add_values([(5, 1, 1.0), (9, 1, 2.0), (7, 2, 3.0)])
+    assert crud_in_memory.get_high_water_marks() == {1: 9, 2: 7}
+
+def test_get_value_rows_since(crud_in_memory: Crud):
+    assert crud_in_memory.get_last_value_id() == 0
+    rows = crud_in_memory.insert_values([(5, 1, 1.0), (3, 2, 2.0), (9, 1, 3.0)])
+    assert crud_in_memory.get_last_value_id() == rows[-1][0]
+    assert crud_in_memory.get_value_rows_since(0) == rows
+    assert crud_in_memory.get_value_rows_since(rows[0][0], limit=1) == rows[1:2]
+
+def test_get_values_keyset(crud_in_memory: Crud):
+    crud_in_memory.add_values(
+        [(t, type_id, float(t * 10 + type_id)) for t in range(10) for type_id in (1, 2)]
+    )
+
+    pages = []
+    cursor = None
+    while True:
+        page = crud_in_memory.get_values(after=cursor, limit=3)
+        if not page:
+            break
+        pages.append(page)
+        cursor = (page[-1].time, page[-1].id)
+    assert [len(page) for page in pages] == [3, 3, 3, 3, 3, 3, 2]
+    result = [(value.time, value.value_type_id) for page in pages for value in page]
+    assert result == [(t, type_id) for t in range(10) for type_id in (1, 2)]
+
+    result = crud_in_memory.get_values(value_type_id=2, start=3, end=8, after=(4, 0), limit=2)
+    assert [(value.time, value.value_type_id) for value in result] == [(4, 2), (5, 2)]
+
+def test_get_value_rows(crud_in_memory: Crud):
+    crud_in_memory.add_values([(t, type_id, float(t)) for t in range(5) for type_id in (1, 2)])
+
+    rows = crud_in_memory.get_value_rows(value_type_id=2, start=1, after=(1, 4), limit=2)
+    assert rows == [(6, 2, 2, 2.0), (8, 3, 2, 3.0)]
+    assert all(type(row) is tuple for row in rows)
+
+def test_get_series(crud_in_memory: Crud):
+    crud_in_memory.add_values([(t, type_id, t / 2) for t in (3, 1, 2) for type_id in (1, 2)])
+
+    times, values = crud_in_memory.get_series(1, start=2)
+    assert times.dtype.name == "int64" and values.dtype.name == "float64"
+    assert times.tolist() == [2, 3] and values.tolist() == [1.0, 1.5]
+    times, values = crud_in_memory.get_series(3)
+    assert len(times) == 0 and len(values) == 0
+    times, values = crud_in_memory.get_series(1, start=2, end=2, neighbors=True)
+    assert times.tolist() == [1, 2, 3]
+
+def test_iter_values(crud_in_memory: Crud):
+    crud_in_memory.add_values([(t, 1, float(t)) for t in range(100)])
+
+    result = list(crud_in_memory.iter_values(chunk_size=7))
+    assert [value.time for value in result] == list(range(100))
+    result = list(crud_in_memory.iter_values(start=50, after=(60, 0), limit=5, chunk_size=2))
+    assert [value.time for value in result] == [60, 61, 62, 63, 64]
@@ -0,0 +1,93 @@
+import time
+
+from sqlalchemy import create_engine
+
+from rdp.crud import Crud
+from rdp.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    HistogramValue,
+    Registry,
+    SamplingProfiler,
+    instrument_engine,
+)
+from rdp.metrics import statement_label
+
+
+def test_histogram_value():
+    histogram = HistogramValue((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    cumulative, total, count = histogram.snapshot()
+    assert cumulative == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert total == 2.65
+    assert count == histogram.count == 4
+
+
+def test_render():
+    registry = Registry()
+    requests = registry.add(Counter("requests_total", "Requests", ("route",)))
+    requests.inc(labels=("/type/",))
+    requests.inc(2, ("/type/",))
+    latency = registry.add(Histogram("latency_seconds", "Latency", buckets=(0.5,)))
+    latency.observe(0.25)
+    registry.add_collector(lambda: [Gauge("depth", 'Queue "depth"')])
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/type/"} 3\n'
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.5"} 1\n'
+        'latency_seconds_bucket{le="+Inf"} 1\n'
+        "latency_seconds_sum 0.25\n"
+        "latency_seconds_count 1\n"
+        '# HELP depth Queue "depth"\n'
+        "# TYPE depth gauge\n"
+    )
+
+
+def test_statement_label():
+    assert statement_label("SELECT value.id FROM value WHERE value.time >= ?") == "select value"
+    assert (
+        statement_label("INSERT INTO value_rollup (time) SELECT time FROM value")
+        == "insert value_rollup"
+    )
+    assert statement_label("UPDATE value_type SET type_name=?") == "update value_type"
+    assert statement_label("PRAGMA query_only = ON") == "pragma"
+
+
+def test_instrument_engine():
+    engine = create_engine("sqlite:///:memory:")
+    histogram = Histogram("query_seconds", "Queries", ("engine", "statement"))
+    instrument_engine(engine, histogram, "writer")
+    crud = Crud(engine)
+    crud.add_values([(1, 1, 1.0)])
+    crud.get_values(1)
+
+    assert histogram.value(("writer", "insert value")).count == 1
+    assert histogram.value(("writer", "select value")).count >= 1
+
+
+def busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    busy(0.2)
+    profiler.stop()
+
+    assert not profiler.running
+    assert profiler.samples > 0
+    assert any("test_metrics:busy" in stack for stack in profiler.stacks())
+    line = profiler.collapsed().splitlines()[0]
+    assert line.startswith("MainThread;") and int(line.rsplit(" ", 1)[1]) > 0
+
+    profiler.reset()
+    assert profiler.stacks() == {} and profiler.samples == 0
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+from rdp.crud.crud import Crud
+from rdp.sensor.device import DeviceReader
+from rdp.sensor.ingest import IngestQueue
+from rdp.sensor.reader import Reader
+from rdp.sensor.record import encode_records
+from tests.fixtures import wait_for
+
+
+def test_device_reader_fifo(tmp_path):
+    fifo = tmp_path / "rdp_cdev"
+    os.mkfifo(fifo)
+    queue = IngestQueue()
+    device = DeviceReader(str(fifo), queue, poll_interval=0.01)
+    device.start()
+    try:
+        # opening the FIFO does not wait for a writer
+        time.sleep(0.05)
+        with open(fifo, "wb", buffering=0) as writer:
+            data = encode_records([(1000, 1, 1.0), (1001, 1, 2.0)])
+            writer.write(data[:20])
+            assert wait_for(lambda: device.stats.bytes == 20)
+            assert device.stats.records == 1
+            writer.write(data[20:])
+            assert wait_for(lambda: device.stats.records == 2)
+    finally:
+        device.stop()
+    assert queue.get(10, 0) == [(1000, 1, 1.0), (1001, 1, 2.0)]
+    assert device.stats.reads == 2 and device.stats.last_read is not None
+
+
+def test_device_reader_missing(tmp_path):
+    device = DeviceReader(str(tmp_path / "missing"), IngestQueue(), retry_interval=0.01)
+    device.start()
+    try:
+        assert wait_for(lambda: device.stats.errors >= 2)
+    finally:
+        device.stop()
+
+
+def test_reader_devices(crud_file: Crud, tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / ("rdp_cdev%d" % index)
+        path.write_bytes(encode_records([(1000 + i, index, float(i)) for i in range(50)]))
+        paths.append(str(path))
+    fifo = tmp_path / "rdp_fifo"
+    os.mkfifo(fifo)
+    paths.append(str(fifo))
+
+    reader = Reader(crud_file, devices=paths, poll_interval=0.01, commit_interval=0.05)
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.stats.committed == 150)
+    finally:
+        stopping = threading.Thread(target=reader.stop)
+        stopping.start()
+        # a FIFO without writer does not hold up the shutdown
+        stopping.join(5)
+        assert not stopping.is_alive()
+
+    stats = reader.device_stats
+    assert [stats[path].records for path in paths] == [50, 50, 50, 0]
+    assert len(crud_file.get_values()) == 150
+    assert len(crud_file.get_value_types()) == 3
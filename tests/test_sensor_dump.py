@@ -0,0 +1,39 @@
+import pytest
+
+from rdp.sensor.dump import dump_size, iter_csv_chunks, iter_dump_chunks
+from rdp.sensor.record import encode_records
+
+
+def test_iter_dump_chunks(tmp_path):
+    records = [(1695686400 + i, i % 3, i / 4) for i in range(10)]
+    dump = tmp_path / "dump.bin"
+    # a trailing partial record is ignored
+    dump.write_bytes(encode_records(records) + b"\x01\x02")
+
+    assert dump_size(str(dump)) == 10
+    chunks = list(iter_dump_chunks(str(dump), chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert [record for chunk in chunks for record in chunk] == records
+    assert isinstance(chunks[0][0][0], int) and isinstance(chunks[0][0][2], float)
+
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    assert list(iter_dump_chunks(str(empty))) == []
+
+
+def test_iter_csv_chunks(tmp_path):
+    plain = tmp_path / "plain.csv"
+    plain.write_text("1,1,1.5\n2,2,2.5\n\n3,1,3.5\n")
+    assert list(iter_csv_chunks(str(plain), chunk_size=2)) == [
+        [(1, 1, 1.5), (2, 2, 2.5)],
+        [(3, 1, 3.5)],
+    ]
+
+    header = tmp_path / "header.csv"
+    header.write_text("value,time,value_type_id\n1.5,1,1\n")
+    assert list(iter_csv_chunks(str(header))) == [[(1, 1, 1.5)]]
+
+    broken = tmp_path / "broken.csv"
+    broken.write_text("time,type,value\n1,1,1.5\n2,x,2.5\n")
+    with pytest.raises(ValueError, match="broken.csv:3"):
+        list(iter_csv_chunks(str(broken)))
@@ -0,0 +1,159 @@
+import subprocess
+import sys
+import time
+
+from rdp.crud import Crud, create_engines
+from rdp.sensor import Follower, IngestLock, IngestService, RecentValues
+from tests.fixtures import wait_for
+
+
+class FakeReader:
+    def __init__(self):
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+class Published:
+    def __init__(self):
+        self.rows = []
+
+    def publish(self, rows):
+        self.rows.extend(rows)
+
+
+def test_ingest_lock(tmp_path):
+    path = str(tmp_path / "ingest.lock")
+    first, second = IngestLock(path), IngestLock(path)
+    assert first.acquire()
+    assert first.held and first.acquire()
+    assert not second.acquire()
+    assert second.holder() is not None
+
+    first.release()
+    assert not first.held
+    assert second.acquire()
+    second.release()
+
+
+def test_ingest_lock_released_on_death(tmp_path):
+    path = str(tmp_path / "ingest.lock")
+    script = (
+        "from rdp.sensor import IngestLock; import time;"
+        " IngestLock(%r).acquire(); print(flush=True); time.sleep(60)"
+    )
+    process = subprocess.Popen([sys.executable, "-c", script % path], stdout=subprocess.PIPE)
+    try:
+        process.stdout.readline()
+        lock = IngestLock(path)
+        assert not lock.acquire()
+        assert lock.holder() == process.pid
+    finally:
+        process.kill()
+        process.wait()
+    assert lock.acquire()
+    lock.release()
+
+
+def test_ingest_service_failover(tmp_path):
+    path = str(tmp_path / "ingest.lock")
+    readers = []
+
+    def make_reader():
+        readers.append(FakeReader())
+        return readers[-1]
+
+    leaders = []
+    first = IngestService(
+        make_reader, IngestLock(path), retry_interval=0.01, on_leader=lambda: leaders.append(1)
+    )
+    second = IngestService(
+        make_reader, IngestLock(path), retry_interval=0.01, on_leader=lambda: leaders.append(2)
+    )
+    first.start()
+    assert first.wait_leader(5)
+    second.start()
+    time.sleep(0.1)
+    assert not second.leader
+    assert len(readers) == 1 and readers[0].running
+
+    first.stop()
+    assert not readers[0].running
+    assert second.wait_leader(5)
+    assert leaders == [1, 2]
+    assert readers[1].running
+    second.stop()
+    assert not readers[1].running
+
+
+def test_ingest_service_failed_start(tmp_path):
+    path = str(tmp_path / "ingest.lock")
+    readers = []
+    events = []
+
+    def broken_reader():
+        events.append("broken")
+        raise OSError("no device")
+
+    def make_reader():
+        readers.append(FakeReader())
+        return readers[-1]
+
+    first = IngestService(
+        broken_reader,
+        IngestLock(path),
+        retry_interval=0.01,
+        on_resign=lambda: events.append("resign"),
+    )
+    first.start()
+    assert wait_for(lambda: "resign" in events)
+    # the failed candidate gave up the lock, another one takes over
+    second = IngestService(make_reader, IngestLock(path), retry_interval=0.01)
+    second.start()
+    assert second.wait_leader(5)
+    assert not first.leader and first.reader is None
+    assert events[:2] == ["broken", "resign"]
+    second.stop()
+    first.stop()
+
+
+def test_follower(tmp_path):
+    engine, read_engine = create_engines("sqlite:///%s" % (tmp_path / "follow.db"))
+    crud = Crud(engine, read_engine=read_engine)
+    crud.add_values([(1, 1, 1.0), (2, 1, 2.0)])
+    recent = RecentValues(default_capacity=10)
+    published = Published()
+    follower = Follower(crud, published, recent, poll_interval=60, batch_size=2)
+    follower.start()
+    assert [row[1] for row in recent.get(1)] == [1, 2]
+
+    # stored by another process
+    crud.add_values([(3, 1, 3.0), (4, 2, 4.0), (5, 2, 5.0)])
+    assert follower.poll() == 3
+    assert [row[1] for row in published.rows] == [3, 4, 5]
+    assert [row[1] for row in recent.get(1)] == [1, 2, 3]
+    assert follower.poll() == 0
+
+    crud.add_values([(6, 1, 6.0)])
+    follower.stop()
+    assert [row[1] for row in published.rows] == [3, 4, 5, 6]
+
+
+def test_follower_unknown_value_type(tmp_path):
+    engine, read_engine = create_engines("sqlite:///%s" % (tmp_path / "follow.db"))
+    crud = Crud(engine, read_engine=read_engine)
+    crud.add_values([(1, 1, 1.0)])
+    follower_crud = Crud(engine, read_engine=read_engine)
+    assert [value_type.id for value_type in follower_crud.load_value_types()] == [1]
+    follower = Follower(follower_crud, poll_interval=60)
+    follower.start()
+
+    # a value type added by the ingest process is loaded by the follower
+    crud.add_values([(2, 2, 2.0)])
+    assert follower.poll() == 1
+    assert [value_type.id for value_type in follower_crud.get_value_types()] == [1, 2]
+    follower.stop()
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from rdp.sensor.hub import Hub
+
+
+def test_hub_publish():
+    hub = Hub()
+
+    async def run():
+        everything = hub.subscribe()
+        only_two = hub.subscribe(type_id=2)
+        assert len(hub) == 2
+
+        # published from another thread like the reader does
+        thread = threading.Thread(target=hub.publish, args=([(1, 1, 1, 1.0), (2, 1, 2, 2.0)],))
+        thread.start()
+        thread.join()
+        assert await asyncio.wait_for(everything.get(), 1) == [(1, 1, 1, 1.0), (2, 1, 2, 2.0)]
+        assert await asyncio.wait_for(only_two.get(), 1) == [(2, 1, 2, 2.0)]
+
+        hub.publish([(3, 2, 1, 3.0)])
+        assert await asyncio.wait_for(everything.get(), 1) == [(3, 2, 1, 3.0)]
+        assert len(only_two) == 0
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(only_two.get(), 0.05)
+
+        hub.unsubscribe(everything)
+        hub.unsubscribe(only_two)
+        assert len(hub) == 0
+
+    asyncio.run(run())
+
+
+def test_subscription_drop():
+    hub = Hub()
+
+    async def run():
+        subscription = hub.subscribe(maxsize=3, policy="drop")
+        hub.publish([(t, t, 1, float(t)) for t in range(5)])
+        hub.publish([(5, 5, 2, 5.0)])
+        assert await subscription.get() == [(3, 3, 1, 3.0), (4, 4, 1, 4.0), (5, 5, 2, 5.0)]
+        assert subscription.dropped == 3
+
+    asyncio.run(run())
+
+
+def test_subscription_coalesce():
+    hub = Hub()
+
+    async def run():
+        subscription = hub.subscribe(maxsize=3, policy="coalesce")
+        hub.publish([(t, t, t % 2, float(t)) for t in range(10)])
+        assert await subscription.get() == [(8, 8, 0, 8.0), (9, 9, 1, 9.0)]
+        assert subscription.dropped == 8
+        with pytest.raises(ValueError):
+            hub.subscribe(policy="lossless")
+
+    asyncio.run(run())
@@ -0,0 +1,250 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from rdp.config import Config
+from rdp.crud.crud import Crud
+from rdp.sensor.ingest import HighWaterMarks, IngestQueue
+from rdp.sensor.reader import Reader
+from rdp.sensor.record import encode_records
+from tests.fixtures import wait_for
+
+
+def records(start, count):
+    return [(start + i, 1, float(start + i)) for i in range(count)]
+
+
+def test_ingest_queue_batches():
+    queue = IngestQueue(100)
+    queue.put(records(0, 5))
+    assert len(queue) == 5
+    assert queue.get(3, 0) == records(0, 3)
+    assert queue.get(10, 0.01) == records(3, 2)
+    assert queue.stats.enqueued == 5 and queue.stats.depth == 0 and queue.stats.max_depth == 5
+
+    queue.close()
+    assert queue.get(10, 1) == []
+    queue.put(records(5, 2))
+    assert queue.stats.dropped == 2
+
+    with pytest.raises(ValueError):
+        IngestQueue(10, "wait")
+
+
+def test_ingest_queue_drop_oldest():
+    queue = IngestQueue(4, "drop-oldest")
+    queue.put(records(0, 3))
+    queue.put(records(3, 3))
+    assert queue.stats.dropped == 2
+    assert queue.get(10, 0) == records(2, 4)
+
+
+def test_ingest_queue_spill(tmp_path):
+    spill = tmp_path / "spill"
+    queue = IngestQueue(4, "spill", str(spill))
+    queue.put(records(0, 3))
+    queue.put(records(3, 3))
+    queue.put(records(6, 1))
+    assert queue.stats.spilled == 3
+    assert len(queue) == 7 and spill.stat().st_size == 3 * 16
+
+    assert queue.get(5, 0) == records(0, 5)
+    # the spill file is still not drained, new records go behind it
+    queue.put(records(7, 1))
+    assert queue.get(10, 0) == records(5, 3)
+    assert spill.stat().st_size == 0
+    queue.put(records(8, 1))
+    assert queue.stats.spilled == 4
+    assert queue.get(10, 0) == records(8, 1)
+
+
+def test_ingest_queue_block():
+    queue = IngestQueue(2)
+    done = threading.Event()
+
+    def produce():
+        queue.put(records(0, 5))
+        done.set()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    assert not done.wait(0.05)
+    taken = []
+    while len(taken) < 5:
+        taken.extend(queue.get(2, 0))
+    producer.join()
+    assert taken == records(0, 5)
+    assert queue.stats.dropped == 0 and queue.stats.blocked_seconds > 0
+    assert queue.stats.max_depth == 2
+
+
+def test_high_water_marks():
+    marks = HighWaterMarks({1: 10, 2: 5})
+    assert marks.filter([(9, 1, 0.0), (10, 1, 0.0), (4, 2, 0.0), (11, 1, 0.0), (0, 3, 0.0)]) == [
+        (11, 1, 0.0),
+        (0, 3, 0.0),
+    ]
+    # the replay of type 1 is over, late records are new data
+    assert 1 not in marks and marks[2] == 5
+    assert marks.filter([(3, 1, 0.0), (5, 2, 0.0), (6, 2, 0.0), (2, 2, 0.0)]) == [
+        (3, 1, 0.0),
+        (6, 2, 0.0),
+        (2, 2, 0.0),
+    ]
+    assert not marks
+
+
+def test_reader_resumes(crud_file: Crud, tmp_path):
+    # the device replays values which are stored already
+    crud_file.add_values(records(1000, 50))
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(encode_records(records(1000, 60)))
+
+    reader = Reader(
+        crud_file, device=str(device), poll_interval=0.01, commit_interval=0.01, skip_stored=True
+    )
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.stats.committed == 10)
+        assert reader.stats.skipped == 50
+        # the reader keeps running and picks up new records, late ones too
+        with open(device, "ab") as f:
+            f.write(encode_records(records(1060, 5) + records(990, 5)))
+        assert wait_for(lambda: reader.stats.committed == 20)
+    finally:
+        reader.stop()
+    assert reader.stats.failed == 0 and reader.stats.skipped == 50
+    assert [value.time for value in crud_file.get_values()] == list(range(990, 995)) + list(
+        range(1000, 1065)
+    )
+
+
+def test_reader_from_config_skip_stored(crud_file: Crud, tmp_path):
+    config = Config(devices=[str(tmp_path / "rdp_cdev")])
+    assert Reader.from_config(crud_file, config)._marks is None
+    config.skip_stored = True
+    assert isinstance(Reader.from_config(crud_file, config)._marks, HighWaterMarks)
+
+
+def test_reader_duplicates(crud_file: Crud, tmp_path):
+    crud_file.add_values(records(1000, 10))
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(encode_records(records(1000, 20)))
+
+    reader = Reader(crud_file, device=str(device), poll_interval=0.01, commit_interval=0.01)
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.stats.committed == 10)
+    finally:
+        reader.stop()
+    assert reader.stats.duplicates == 10 and reader.stats.skipped == 0 and reader.stats.failed == 0
+
+
+def test_reader_retries_commits(crud_file: Crud, tmp_path, monkeypatch):
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(encode_records(records(1000, 10)))
+    insert_values = crud_file.insert_values
+    failures = [OperationalError("INSERT", None, Exception("database is locked"))] * 2
+
+    def locked_insert_values(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return insert_values(*args, **kwargs)
+
+    monkeypatch.setattr(crud_file, "insert_values", locked_insert_values)
+    reader = Reader(
+        crud_file, device=str(device), poll_interval=0.01, commit_interval=0.01, retry_delay=0.01
+    )
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.stats.committed == 10)
+    finally:
+        reader.stop()
+    assert reader.stats.retries == 2 and reader.stats.failed == 0
+
+    # a batch failing on every retry is lost, the writer keeps going
+    failures.extend([OperationalError("INSERT", None, Exception("disk I/O error"))] * 3)
+    with open(device, "ab") as f:
+        f.write(encode_records(records(1010, 5)))
+    reader = Reader(
+        crud_file,
+        device=str(device),
+        poll_interval=0.01,
+        commit_size=5,
+        commit_retries=2,
+        retry_delay=0.01,
+    )
+    reader.start()
+    try:
+        assert wait_for(
+            lambda: reader.stats.failed + reader.stats.duplicates + reader.stats.committed == 15
+        )
+    finally:
+        reader.stop()
+    assert reader.stats.retries == 2 and reader.stats.failed == 5
+
+    # other errors are not repeated
+    failures.append(ValueError("not a number"))
+    with open(device, "ab") as f:
+        f.write(encode_records(records(1015, 5)))
+    reader = Reader(
+        crud_file, device=str(device), poll_interval=0.01, commit_size=5, retry_delay=0.01
+    )
+    reader.start()
+    try:
+        assert wait_for(
+            lambda: reader.stats.failed + reader.stats.duplicates + reader.stats.committed == 20
+        )
+    finally:
+        reader.stop()
+    assert reader.stats.retries == 0 and reader.stats.failed == 5
+
+
+def test_reader_slow_commits(crud_file: Crud, tmp_path):
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(encode_records(records(1000, 100)))
+    insert_values = crud_file.insert_values
+    release = threading.Event()
+
+    def slow_insert_values(values, skip_duplicates=False, backfill=True):
+        release.wait(5)
+        return insert_values(values, skip_duplicates, backfill)
+
+    crud_file.insert_values = slow_insert_values
+    reader = Reader(crud_file, device=str(device), commit_size=10, poll_interval=0.01)
+    reader.start()
+    try:
+        # the device is drained while the first commit hangs
+        deadline = time.monotonic() + 5
+        while reader.stats.enqueued < 100 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert reader.stats.enqueued == 100
+        assert reader.stats.committed == 0
+    finally:
+        release.set()
+        reader.stop()
+
+    stats = reader.stats
+    assert stats.committed == 100 and stats.commits == 10 and stats.depth == 0
+    assert stats.max_commit_seconds >= stats.last_commit_seconds > 0
+    assert len(crud_file.get_values()) == 100
+
+
+def test_reader_rebuilds_stale_rollups(crud_file: Crud, tmp_path):
+    Crud(crud_file._engine, rollups=False).add_values(records(0, 100))
+    assert crud_file.rollups_stale()
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(b"")
+
+    reader = Reader(crud_file, device=str(device), poll_interval=0.01, commit_interval=0.01)
+    reader.start()
+    try:
+        assert wait_for(lambda: not crud_file.rollups_stale())
+    finally:
+        reader.stop()
+    assert crud_file.get_aggregated_values(1, bucket=60, aggregates=["count"]) == [
+        {"value_type_id": 1, "time": 0, "count": 60},
+        {"value_type_id": 1, "time": 60, "count": 40},
+    ]
@@ -0,0 +1,92 @@
+import asyncio
+import struct
+import threading
+
+from rdp.crud.crud import Crud
+from rdp.sensor.hub import Hub
+from rdp.sensor.reader import RECORD_SIZE, Reader, decode_records
+from tests.fixtures import wait_for
+
+
+def encode(records):
+    return b"".join(struct.pack("<QIf", *record) for record in records)
+
+
+def test_record_size():
+    assert RECORD_SIZE == 16
+
+
+def test_decode_records():
+    records = [(1695686401, 1, 76.0), (1695686401, 2, 180.5), (1695686403, 0, -1.25)]
+    assert decode_records(encode(records)) == records
+    assert decode_records(memoryview(encode(records))) == records
+    assert decode_records(b"") == []
+
+
+def test_reader_batches(crud_file: Crud, tmp_path):
+    records = [(1000 + i, i % 3, float(i)) for i in range(100)]
+    device = tmp_path / "rdp_cdev"
+    # a trailing partial record must not be decoded
+    device.write_bytes(encode(records) + b"\x00" * 5)
+
+    reader = Reader(crud_file, device=str(device), batch_size=16, poll_interval=0.01)
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.stats.committed == 100)
+    finally:
+        reader.stop()
+
+    values = crud_file.get_values()
+    assert [(v.time, v.value_type_id, v.value) for v in values] == records
+    assert len(crud_file.get_value_types()) == 3
+
+
+def test_reader_publishes(crud_file: Crud, tmp_path):
+    records = [(1000 + i, 1, float(i)) for i in range(10)]
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(encode(records))
+    hub = Hub()
+
+    async def run():
+        subscription = hub.subscribe()
+        reader = Reader(crud_file, device=str(device), poll_interval=0.01, hub=hub)
+        reader.start()
+        try:
+            received = []
+            while len(received) < 10:
+                received.extend(await asyncio.wait_for(subscription.get(), 5))
+            return received
+        finally:
+            reader.stop()
+
+    assert [row[1:] for row in asyncio.run(run())] == records
+
+
+def test_reader_seals_aside(crud_file: Crud, tmp_path, monkeypatch):
+    crud_file.add_values([(1000 + i, 1, float(i)) for i in range(3000)])
+    monkeypatch.setattr(crud_file, "_seal_after", 60)
+    apply_sealing = crud_file.apply_sealing
+    threads = []
+
+    def record_thread(now=None, stop=None):
+        threads.append(threading.current_thread().name)
+        return apply_sealing(now, stop)
+
+    monkeypatch.setattr(crud_file, "apply_sealing", record_thread)
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(encode([(2000000000, 1, 1.0)]))
+
+    reader = Reader(crud_file, device=str(device), poll_interval=0.01)
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.stats.committed == 1)
+        # two chunks of 1024 values are sealed, the rest stays in the value table
+        assert wait_for(lambda: len(crud_file.get_value_rows_since(0)) == 3001 - 2048)
+    finally:
+        reader.stop()
+
+    # the writer thread never waits for a whole sealing pass
+    assert threads == ["rdp-sealer"]
+    assert [row[1] for row in crud_file.get_value_rows(1)] == [1000 + i for i in range(3000)] + [
+        2000000000
+    ]
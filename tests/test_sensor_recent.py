@@ -0,0 +1,94 @@
+import pytest
+
+from rdp.crud.crud import Crud
+from rdp.sensor.reader import Reader
+from rdp.sensor.recent import RecentSeries, RecentValues
+
+
+def test_recent_series_ring():
+    series = RecentSeries(4)
+    assert series.latest() is None
+    assert not series.covers(None) and not series.covers(0)
+    series.covered_from = 0
+
+    for t in range(6):
+        series.append(t + 100, t, float(t))
+    assert len(series) == 4
+    assert series.latest() == (105, 5, 5.0)
+    assert series.range() == [(102, 2, 2.0), (103, 3, 3.0), (104, 4, 4.0), (105, 5, 5.0)]
+    assert series.range(3, 4) == [(103, 3, 3.0), (104, 4, 4.0)]
+    assert series.range(10) == []
+
+    # the evicted values are no longer covered
+    assert series.covered_from == 2
+    assert series.covers(2)
+    assert not series.covers(1)
+    assert not series.covers(None)
+
+    with pytest.raises(ValueError):
+        RecentSeries(0)
+
+
+def test_recent_series_out_of_order():
+    series = RecentSeries(4)
+    series.covered_from = 3
+    for value_id, t in enumerate([5, 3, 7, 4]):
+        series.append(value_id, t, float(t))
+    assert series.range() == [(1, 3, 3.0), (3, 4, 4.0), (0, 5, 5.0), (2, 7, 7.0)]
+    assert series.range(4, 5) == [(3, 4, 4.0), (0, 5, 5.0)]
+    assert series.latest() == (2, 7, 7.0)
+
+    series.append(4, 6, 6.0)
+    # time 5 got evicted, 3 and 4 are still held but older than the evicted value
+    assert series.covered_from == 6
+
+
+def test_recent_values():
+    recent = RecentValues(default_capacity=3, capacities={2: 5})
+    assert recent.capacity(1) == 3 and recent.capacity(2) == 5
+
+    # before loading the buffers only cover what got ingested
+    recent.extend([(1, 10, 1, 1.0), (2, 10, 2, 2.0)])
+    assert recent.covers(1, 10)
+    assert not recent.covers(1, 9)
+    assert not recent.covers(3)
+
+    recent.load(
+        {1: [(1, 10, 1, 1.0)], 2: [(i, i, 2, float(i)) for i in range(5)], 3: []}, backfill=2
+    )
+    assert recent.backfill == 2
+    # no buffer covers values older than its oldest loaded one
+    assert recent.covers(1, 10) and not recent.covers(1, 0) and not recent.covers(1)
+    assert not recent.covers(2)
+    assert recent.covers(2, 0)
+    recent.extend([(6, 11, 1, 3.0), (7, 12, 3, 4.0)])
+    assert recent.covers(3, 12) and not recent.covers(3, 11)
+    assert recent.latest() == [(6, 11, 1, 3.0), (4, 4, 2, 4.0), (7, 12, 3, 4.0)]
+    assert recent.latest(2) == [(4, 4, 2, 4.0)]
+    assert recent.latest(4) == []
+    assert recent.get(1, 11) == [(6, 11, 1, 3.0)]
+    assert recent.get(4) == []
+
+    recent.invalidate(3, 11)
+    assert recent.backfill == 3
+    assert not recent.covers(1, 11) and recent.covers(1, 12) and recent.covers(2, 12)
+    # types ingested later start past the backfill as well
+    recent.extend([(8, 5, 4, 5.0)])
+    assert not recent.covers(4, 5) and recent.covers(4, 12)
+
+
+def test_reader_warms_recent(crud_file: Crud, tmp_path):
+    crud_file.add_values([(t, type_id, float(t)) for t in range(10) for type_id in (1, 2)])
+    device = tmp_path / "rdp_cdev"
+    device.write_bytes(b"")
+    recent = RecentValues(default_capacity=5, capacities={2: 20})
+
+    reader = Reader(crud_file, device=str(device), poll_interval=0.01, recent=recent)
+    reader.start()
+    reader.stop()
+
+    assert [row[1] for row in recent.get(1)] == [5, 6, 7, 8, 9]
+    assert not recent.covers(1, 4) and recent.covers(1, 5)
+    assert [row[1] for row in recent.get(2)] == list(range(10))
+    assert recent.covers(2, 0) and not recent.covers(2)
+    assert recent.backfill == crud_file.get_backfill()[0] == 1